@@ -5,8 +5,9 @@ from flask_migrate import Migrate
 from flask_mail import Mail
 from datetime import datetime
 
-from app.models import Camp, User, Vehicle, Warehouse
+from app.models import Camp, Vehicle, Warehouse
 from .config import Config
+from .user_context import load_user_context
 
 from .extensions import db, migrate, bcrypt
 
@@ -16,7 +17,7 @@ mail = Mail()
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return load_user_context(int(user_id))
 
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
@@ -35,6 +36,13 @@ def create_app(config_class=Config):
     login_manager.init_app(app)
     mail.init_app(app)
     
+    from .route_cache import init_route_cache
+    init_route_cache(app)
+    from .batch_allocation import init_batch_allocation
+    init_batch_allocation(app)
+    from .sensor_ingest import init_sensor_ingest
+    init_sensor_ingest(app)
+    
     with app.app_context():
         db.create_all()  # Create tables if they don't exist
 
@@ -45,6 +53,7 @@ def create_app(config_class=Config):
     from .blueprints.camp_manager import camp_manager_bp
     from .blueprints.local_auth import local_auth_bp
     from .blueprints.users import user_bp
+    from .blueprints.sensors import sensors_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp, url_prefix='/admin')
@@ -52,6 +61,7 @@ def create_app(config_class=Config):
     app.register_blueprint(camp_manager_bp)
     app.register_blueprint(local_auth_bp)
     app.register_blueprint(user_bp)
+    app.register_blueprint(sensors_bp)
     
     @app.route('/')
     @app.route('/index')
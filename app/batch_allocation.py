@@ -0,0 +1,229 @@
+from datetime import datetime
+import click
+import numpy as np
+from scipy.optimize import linprog
+from scipy.sparse import coo_matrix
+from app.models import Camp, Warehouse, ResourceRequest
+from app.extensions import db
+from app.events import publish_committed, warehouse_channel
+from app.resource_allocation import road_distance_matrix
+
+# (request quantity column, warehouse available column) for each item
+ITEMS = {
+    'food': ('food_quantity', 'food_available'),
+    'water': ('water_quantity', 'water_available'),
+    'essentials': ('essentials_quantity', 'essentials_available'),
+    'clothes': ('clothes_quantity', 'clothes_available'),
+}
+PRIORITY_WEIGHTS = {'emergency': 3, 'general': 1}
+
+def _pending_requests():
+    """Pending requests that are not yet loaded onto a vehicle."""
+    return ResourceRequest.query.filter_by(status='pending', vehicle_id=None).order_by(ResourceRequest.id).all()
+
+def _free_stock(warehouses):
+    """
+    Stock each warehouse can still promise: available stock minus what is already
+    loaded onto vehicles that have not left yet.
+    :return: Array of shape (len(warehouses), len(ITEMS))
+    """
+    committed = {}
+    rows = db.session.query(
+        ResourceRequest.warehouse_id,
+        *[db.func.sum(getattr(ResourceRequest, quantity)) for quantity, _ in ITEMS.values()]
+    ).filter(
+        ResourceRequest.status == 'pending',
+        ResourceRequest.vehicle_id.isnot(None)
+    ).group_by(ResourceRequest.warehouse_id).all()
+    for row in rows:
+        committed[row[0]] = [value or 0 for value in row[1:]]
+
+    stock = np.zeros((len(warehouses), len(ITEMS)))
+    for w, warehouse in enumerate(warehouses):
+        reserved = committed.get(warehouse.wid, [0] * len(ITEMS))
+        for k, (_, available) in enumerate(ITEMS.values()):
+            stock[w, k] = max((getattr(warehouse, available) or 0) - reserved[k], 0)
+    return stock
+
+def _solve_item(cost, demand, stock, unmet_penalty):
+    """
+    Solves one transportation problem: ship each request's demand from the warehouses
+    at minimum total cost, leaving demand unmet only when stock runs out.
+    :param cost: Array (requests, warehouses) of cost per unit shipped
+    :param demand: Array (requests,) of quantities requested
+    :param stock: Array (warehouses,) of quantities available
+    :param unmet_penalty: Array (requests,) of cost per unit left unmet
+    :return: Array (requests, warehouses) of quantities shipped
+    """
+    n_requests, n_warehouses = cost.shape
+    flow = np.zeros((n_requests, n_warehouses))
+    active = np.flatnonzero(demand > 0)
+    if len(active) == 0 or stock.sum() <= 0:
+        return flow
+
+    # Variables: one flow per (active request, warehouse), then one unmet amount per active request
+    n = len(active)
+    n_flows = n * n_warehouses
+    c = np.concatenate([cost[active].ravel(), unmet_penalty[active]])
+
+    # Every request's flows plus its unmet amount add up to its demand
+    eq_rows = np.concatenate([np.repeat(np.arange(n), n_warehouses), np.arange(n)])
+    eq_cols = np.concatenate([np.arange(n_flows), n_flows + np.arange(n)])
+    A_eq = coo_matrix((np.ones(len(eq_rows)), (eq_rows, eq_cols)), shape=(n, n_flows + n)).tocsr()
+
+    # No warehouse ships more than it has
+    ub_rows = np.tile(np.arange(n_warehouses), n)
+    A_ub = coo_matrix((np.ones(n_flows), (ub_rows, np.arange(n_flows))), shape=(n_warehouses, n_flows + n)).tocsr()
+
+    result = linprog(c, A_ub=A_ub, b_ub=stock, A_eq=A_eq, b_eq=demand[active], bounds=(0, None), method='highs')
+    if not result.success:
+        raise RuntimeError(f"Allocation solver failed: {result.message}")
+
+    # Transportation problems have integral optimal vertices; rounding only removes float noise
+    flow[active] = np.round(result.x[:n_flows]).reshape(n, n_warehouses)
+    return flow
+
+def solve_batch_allocation(requests, warehouses, distances, stock):
+    """
+    Assigns request quantities to warehouses for every item at once.
+    Shipping cost is distance times the request's priority weight, so emergency requests
+    get the closer stock; leaving a unit unmet costs more than any shipment, and more
+    for emergency requests, so scarce stock goes to emergencies first.
+    :param requests: List of ResourceRequest
+    :param warehouses: List of Warehouse
+    :param distances: Array (requests, warehouses) of distances in kilometers
+    :param stock: Array (warehouses, items) of free stock
+    :return: Array (requests, warehouses, items) of quantities to ship
+    """
+    weights = np.array([PRIORITY_WEIGHTS.get(req.priority, 1) for req in requests], dtype=float)
+    cost = distances * weights[:, np.newaxis]
+    unmet_penalty = (float(distances.max(initial=0)) + 1) * 10 * weights
+
+    plan = np.zeros((len(requests), len(warehouses), len(ITEMS)))
+    for k, (quantity, _) in enumerate(ITEMS.values()):
+        demand = np.array([getattr(req, quantity) or 0 for req in requests], dtype=float)
+        plan[:, :, k] = _solve_item(cost, demand, stock[:, k], unmet_penalty)
+    return plan
+
+def _apply_plan(requests, warehouses, plan):
+    """
+    Writes a solved plan back to the database.
+    A request served by one warehouse is moved there. A request split across several
+    warehouses keeps its row for the largest share and gets a new pending request for
+    each other share. Any unmet remainder stays with the request's original warehouse.
+    :return: (number of requests that changed, list of (warehouse id, request) whose
+             warehouse should hear about it: every share, and the warehouse a request left)
+    """
+    changed = 0
+    notify = []
+    for r, req in enumerate(requests):
+        shares = []
+        for w in np.flatnonzero(plan[r].sum(axis=1) > 0):
+            shares.append((warehouses[w].wid, [int(q) for q in plan[r, w]]))
+        shares.sort(key=lambda share: sum(share[1]), reverse=True)
+
+        requested = [getattr(req, quantity) or 0 for quantity, _ in ITEMS.values()]
+        shipped = plan[r].sum(axis=0)
+        unmet = [int(max(requested[k] - shipped[k], 0)) for k in range(len(ITEMS))]
+        if any(unmet):
+            original = next((share for share in shares if share[0] == req.warehouse_id), None)
+            if original:
+                original[1][:] = [a + b for a, b in zip(original[1], unmet)]
+            else:
+                shares.append((req.warehouse_id, unmet))
+
+        if not shares or (len(shares) == 1 and shares[0][0] == req.warehouse_id):
+            continue
+
+        changed += 1
+        if req.warehouse_id not in [warehouse_id for warehouse_id, _ in shares]:
+            notify.append((req.warehouse_id, req))
+        for i, (warehouse_id, quantities) in enumerate(shares):
+            target = req if i == 0 else ResourceRequest(
+                camp_id=req.camp_id,
+                priority=req.priority,
+                status='pending',
+                created_at=req.created_at
+            )
+            target.warehouse_id = warehouse_id
+            for (quantity, _), value in zip(ITEMS.values(), quantities):
+                setattr(target, quantity, value)
+            target.updated_at = datetime.now()
+            if i > 0:
+                db.session.add(target)
+            notify.append((warehouse_id, target))
+    return changed, notify
+
+def run_batch_allocation(apply=True):
+    """
+    Re-plans every pending, unloaded resource request against the free stock of all
+    operational warehouses in one solve.
+    :param apply: Write the assignments back and commit when True, only report when False
+    :return: Dictionary summarising the plan
+    """
+    requests = _pending_requests()
+    warehouses = Warehouse.query.filter_by(status='Operational').order_by(Warehouse.wid).all()
+    if not requests or not warehouses:
+        return {'requests': len(requests), 'warehouses': len(warehouses), 'changed': 0, 'assignments': []}
+
+    camps = {camp.cid: camp for camp in Camp.query.filter(
+        Camp.cid.in_({req.camp_id for req in requests})
+    ).all()}
+    requests = [req for req in requests if req.camp_id in camps]
+
+    # One distance row per camp, shared by all of its requests
+    camp_ids = sorted({req.camp_id for req in requests})
+    road_distances, _ = road_distance_matrix(
+        [(camps[cid].coordinates_lat, camps[cid].coordinates_lng) for cid in camp_ids],
+        [(warehouse.coordinates_lat, warehouse.coordinates_lng) for warehouse in warehouses]
+    )
+    camp_rows = {cid: i for i, cid in enumerate(camp_ids)}
+    distances = np.array([road_distances[camp_rows[req.camp_id]] for req in requests], dtype=float)
+
+    plan = solve_batch_allocation(requests, warehouses, distances, _free_stock(warehouses))
+
+    assignments = []
+    for r, req in enumerate(requests):
+        for w in np.flatnonzero(plan[r].sum(axis=1) > 0):
+            assignments.append({
+                'request_id': req.id,
+                'camp_id': req.camp_id,
+                'warehouse_id': warehouses[w].wid,
+                **{item: int(plan[r, w, k]) for k, item in enumerate(ITEMS)}
+            })
+
+    changed = 0
+    if apply:
+        try:
+            changed, notify = _apply_plan(requests, warehouses, plan)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        publish_committed([(warehouse_channel(warehouse_id), 'resource_request', {
+            'request_id': req.id,
+            'camp_id': req.camp_id,
+            'priority': req.priority
+        }) for warehouse_id, req in notify])
+
+    return {
+        'requests': len(requests),
+        'warehouses': len(warehouses),
+        'changed': changed,
+        'assignments': assignments
+    }
+
+def init_batch_allocation(app):
+    """Registers the `flask batch-allocate` command, e.g. for running from cron."""
+
+    @app.cli.command('batch-allocate')
+    @click.option('--dry-run', is_flag=True, help='Print the plan without saving it.')
+    def batch_allocate_command(dry_run):
+        """Re-plan all pending resource requests across every warehouse."""
+        result = run_batch_allocation(apply=not dry_run)
+        for assignment in result['assignments']:
+            click.echo(f"Request {assignment['request_id']} -> warehouse {assignment['warehouse_id']}: "
+                       f"food={assignment['food']} water={assignment['water']} "
+                       f"essentials={assignment['essentials']} clothes={assignment['clothes']}")
+        click.echo(f"{result['requests']} requests, {result['warehouses']} warehouses, "
+                   f"{result['changed']} requests changed")
@@ -2,6 +2,11 @@ from flask import flash, jsonify, redirect, request, url_for
 from flask_login import current_user, login_required
 from app.db_manager import UserManager, CampManager, get_user_activity, log_recent_activity
 from app.models import User, Warehouse, Camp, UserActivity
+from app.queries import camps_with_heads, query_budget, users_with_warehouses, warehouses_with_managers
+from app.route_cache import invalidate_routes
+from app.batch_allocation import run_batch_allocation
+from app.spatial_index import mark_camps_changed, mark_warehouses_changed
+from app.user_context import invalidate_user_context
 from . import admin_bp
 from app.extensions import db
 
@@ -9,12 +14,13 @@ from app.extensions import db
 
 @admin_bp.route('/get_all_users')
 @login_required
+@query_budget(1)
 def get_all_users():
     """
     List all users.
     """
     try:
-        users = User.query.all()
+        users = users_with_warehouses()
         return jsonify([{
             'uid': user.uid,
             'username': user.username,
@@ -25,7 +31,7 @@ def get_all_users():
             'managed_warehouse': {
                 'wid': user.managed_warehouse.wid,
                 'name': user.managed_warehouse.name
-            } if hasattr(user, 'managed_warehouse') and user.managed_warehouse else None
+            } if user.managed_warehouse else None
         } for user in users]), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -118,6 +124,7 @@ def update_user(uid):
 
         # Update user
         updated_user, status_code = UserManager.update_user(uid, **update_data)
+        invalidate_user_context(uid)
         return jsonify({'message': 'User updated successfully', 'user': updated_user}), status_code
 
     except Exception as e:
@@ -135,6 +142,7 @@ def delete_user(uid):
             username = user.username  # Store username before deletion
             db.session.delete(user)
             db.session.commit()
+            invalidate_user_context(uid)
             log_recent_activity(user_id=current_user.uid, action=f"Deleted user: {username} (ID: {uid})")
             return jsonify({'message': f'User {username} deleted successfully'}), 200
         else:
@@ -146,9 +154,10 @@ def delete_user(uid):
 
 @admin_bp.route('/get_all_camps')
 @login_required
+@query_budget(1)
 def get_all_camps():
     try:
-        camps = Camp.query.all()
+        camps = camps_with_heads()
         return jsonify([{
             'cid': camp.cid,
             'name': camp.name,
@@ -242,6 +251,7 @@ def add_camp():
         
         db.session.add(new_camp)
         db.session.commit()
+        mark_camps_changed()
         
         # Update the user's associated_camp_id if a camp head is assigned
         if new_camp.camp_head_id:
@@ -249,6 +259,7 @@ def add_camp():
             if user:
                 user.associated_camp_id = new_camp.cid
                 db.session.commit()
+                invalidate_user_context(user.uid)
         
         # Return the created camp with camp head name
         return jsonify({
@@ -287,6 +298,7 @@ def update_camp(camp_id):
                 return jsonify({"error": "Camp with this name already exists"}), 400
         
         # Handle camp head assignment/unassignment
+        old_head_id = camp.camp_head_id
         if "camp_head_id" in data:
             # If there's a current camp head, update their associated_camp_id to None
             if camp.camp_head_id:
@@ -306,6 +318,13 @@ def update_camp(camp_id):
                 if new_head:
                     new_head.associated_camp_id = camp_id
         
+        # Drop cached routes for the old location if the camp is being moved
+        old_location = (camp.coordinates_lat, camp.coordinates_lng)
+        moved = any(field in data and data[field] != getattr(camp, field)
+                    for field in ["coordinates_lat", "coordinates_lng"])
+        if moved:
+            invalidate_routes(old_location)
+        
         # Update camp fields
         for field in ["name", "location", "capacity", "coordinates_lat", "coordinates_lng", 
                      "contact_number", "camp_head_id", "food_capacity", "water_capacity", 
@@ -314,6 +333,10 @@ def update_camp(camp_id):
                 setattr(camp, field, data[field])
         
         db.session.commit()
+        if moved:
+            mark_camps_changed()
+        if "camp_head_id" in data:
+            invalidate_user_context(old_head_id, data["camp_head_id"])
         
         # Return the updated camp with camp head name
         return jsonify({
@@ -351,8 +374,12 @@ def delete_camp(camp_id):
             action=f"Deleted camp: {camp_name}"
         )
         
+        # Deleting the camp clears the associated_camp_id of its users
+        user_ids = [user.uid for user in camp.users]
         db.session.delete(camp)
         db.session.commit()
+        mark_camps_changed()
+        invalidate_user_context(*user_ids)
         
         return jsonify({'message': 'Camp deleted successfully'})
     except Exception as e:
@@ -364,12 +391,13 @@ def delete_camp(camp_id):
 
 @admin_bp.route('/get_all_warehouses')
 @login_required
+@query_budget(1)
 def get_all_warehouses():
     """
     List all warehouses.
     """
     try:
-        warehouses = Warehouse.query.all()
+        warehouses = warehouses_with_managers()
         warehouse_list = []
         for warehouse in warehouses:
             warehouse_data = {
@@ -424,6 +452,7 @@ def create_warehouse():
 
         db.session.add(new_warehouse)
         db.session.commit()
+        mark_warehouses_changed()
 
         # Log activity
         log_recent_activity(user_id=current_user.uid, action=f"Created warehouse: {data['name']}")
@@ -461,6 +490,13 @@ def update_warehouse(warehouse_id):
         warehouse = Warehouse.query.get_or_404(warehouse_id)
         data = request.get_json()
 
+        # Drop cached routes for the old location if the warehouse is being moved
+        old_location = (warehouse.coordinates_lat, warehouse.coordinates_lng)
+        moved = ('coordinates_lat' in data and float(data['coordinates_lat']) != warehouse.coordinates_lat or
+                 'coordinates_lng' in data and float(data['coordinates_lng']) != warehouse.coordinates_lng)
+        if moved:
+            invalidate_routes(old_location)
+
         # Update fields if provided
         if 'name' in data:
             warehouse.name = data['name']
@@ -491,6 +527,8 @@ def update_warehouse(warehouse_id):
             warehouse.status = data['status']
 
         db.session.commit()
+        if moved:
+            mark_warehouses_changed()
 
         # Log activity
         log_recent_activity(user_id=current_user.uid, action=f"Updated warehouse: {warehouse.name}")
@@ -528,8 +566,12 @@ def delete_warehouse(warehouse_id):
         warehouse = Warehouse.query.get_or_404(warehouse_id)
         warehouse_name = warehouse.name
         
+        # Deleting the warehouse clears the associated_warehouse_id of its users
+        user_ids = [user.uid for user in warehouse.associated_users]
         db.session.delete(warehouse)
         db.session.commit()
+        mark_warehouses_changed()
+        invalidate_user_context(*user_ids)
 
         # Log activity
         log_recent_activity(user_id=current_user.uid, action=f"Deleted warehouse: {warehouse_name}")
@@ -616,6 +658,29 @@ def get_camp_managers():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@admin_bp.route('/batch_allocate', methods=['POST'])
+@login_required
+def batch_allocate():
+    """
+    Re-plan all pending resource requests across every operational warehouse in one solve.
+    Send {"apply": false} to preview the plan without saving it.
+    """
+    try:
+        if current_user.role != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+
+        data = request.get_json(silent=True) or {}
+        result = run_batch_allocation(apply=data.get('apply', True))
+
+        if data.get('apply', True):
+            log_recent_activity(user_id=current_user.uid,
+                                action=f"Ran batch allocation: {result['changed']} requests reassigned")
+
+        return jsonify({'message': 'Batch allocation completed', **result}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @admin_bp.route('/get_recent_activities')
 @login_required
 def get_recent_activities():
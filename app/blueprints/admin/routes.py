@@ -2,6 +2,9 @@ from flask import render_template, request, jsonify, flash
 from flask_login import login_required
 from app.db_manager import get_table_count
 from app.data import load_sensor_configs, save_sensor_configs, generate_sensor_data, save_sensor_data_to_json
+from app.sensor_snapshot import get_snapshot
+from app.sensor_read_model import sensor_response
+from app.events import SENSOR_CHANNEL, stream_response
 from . import admin_bp
 import json
 import os
@@ -47,17 +50,16 @@ def sensor():
         
         # Get sensors from JSON file
         try:
-            with open('app/static/data/sensor_data.json', 'r') as f:
-                json_sensors = json.load(f)
-                json_sensor_list = [{
-                    'sid': sensor['id'],
-                    'name': sensor['name'],
-                    'latitude': sensor['latitude'],
-                    'longitude': sensor['longitude'],
-                    'soil_type': sensor['soil_type'],
-                    'status': sensor.get('status', 'Active'),
-                    'operational_status': sensor.get('operational_status', 'Active')
-                } for sensor in json_sensors]
+            json_sensors = get_snapshot().sensors
+            json_sensor_list = [{
+                'sid': sensor['id'],
+                'name': sensor['name'],
+                'latitude': sensor['latitude'],
+                'longitude': sensor['longitude'],
+                'soil_type': sensor['soil_type'],
+                'status': sensor.get('status', 'Active'),
+                'operational_status': sensor.get('operational_status', 'Active')
+            } for sensor in json_sensors]
         except (FileNotFoundError, json.JSONDecodeError):
             json_sensor_list = []
         
@@ -122,8 +124,7 @@ def add_sensor():
         
         # Update sensor_data.json
         try:
-            with open('app/static/data/sensor_data.json', 'r') as f:
-                sensor_data = json.load(f)
+            sensor_data = get_snapshot().sensors
         except (FileNotFoundError, json.JSONDecodeError):
             sensor_data = []
             
@@ -131,8 +132,7 @@ def add_sensor():
         sensor_data = [s for s in sensor_data if s.get('id') != sensor_id]
         sensor_data.append(fake_data)
         
-        with open('app/static/data/sensor_data.json', 'w') as f:
-            json.dump(sensor_data, f, indent=4)
+        save_sensor_data_to_json(sensor_data)
             
         # Update sensor_configs.json
         try:
@@ -299,13 +299,11 @@ def delete_sensor(sensor_id):
         
         # Remove from sensor_data.json
         try:
-            with open('app/static/data/sensor_data.json', 'r') as f:
-                sensor_data = json.load(f)
+            sensor_data = get_snapshot().sensors
             print(f"Loaded sensor_data.json with {len(sensor_data)} entries")
             sensor_data = [s for s in sensor_data if s.get('id') != sensor_sid]
             print(f"Filtered to {len(sensor_data)} entries")
-            with open('app/static/data/sensor_data.json', 'w') as f:
-                json.dump(sensor_data, f, indent=4)
+            save_sensor_data_to_json(sensor_data)
             print(f"Updated sensor_data.json")
         except Exception as e:
             print(f"Error updating sensor_data.json: {str(e)}")
@@ -331,50 +329,14 @@ def delete_sensor(sensor_id):
 @admin_bp.route('/get_sensors')
 @login_required
 def get_sensors():
+    """
+    List every sensor once, from the sensor read model.
+    Accepts status, soil_type and bbox=min_lng,min_lat,max_lng,max_lat filters.
+    """
     try:
-        # Get sensors from database
-        db_sensors = Sensor.query.all()
-        db_sensor_list = [{
-            'id': sensor.sid,
-            'name': sensor.name,
-            'latitude': sensor.latitude,
-            'longitude': sensor.longitude,
-            'soil_type': sensor.soil_type,
-            'status': sensor.status,
-            'operational_status': sensor.operational_status,
-            'source': 'database'
-        } for sensor in db_sensors]
-
-        # Get sensors from JSON file
-        try:
-            with open('app/static/data/sensor_data.json', 'r') as f:
-                json_sensors = json.load(f)
-                json_sensor_list = [{
-                    'id': sensor['id'],
-                    'name': sensor['name'],
-                    'latitude': sensor['latitude'],
-                    'longitude': sensor['longitude'],
-                    'soil_type': sensor['soil_type'],
-                    'status': sensor['status'],
-                    'operational_status': sensor.get('operational_status', 'Active'),
-                    'source': 'json'
-                } for sensor in json_sensors]
-        except (FileNotFoundError, json.JSONDecodeError):
-            json_sensor_list = []
-
-        # Combine both lists, avoiding duplicates based on sensor ID
-        all_sensors = []
-        seen_ids = set()
-        
-        for sensor in db_sensor_list + json_sensor_list:
-            if sensor['id'] not in seen_ids:
-                seen_ids.add(sensor['id'])
-                all_sensors.append(sensor)
-
-        return jsonify({
-            'success': True,
-            'sensors': all_sensors
-        })
+        return sensor_response('sensors', full=lambda sensors: {'success': True, 'sensors': sensors})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -422,16 +384,15 @@ def update_sensor(sensor_id):
 
         # Update sensor_data.json
         try:
-            with open('app/static/data/sensor_data.json', 'r') as f:
-                sensor_data = json.load(f)
+            # Copy the entries; the snapshot is shared by every request in this worker
+            sensor_data = [dict(s) for s in get_snapshot().sensors]
             for s in sensor_data:
                 if s.get('id') == sensor_id:
                     s['status'] = sensor.status
                     s['operational_status'] = sensor.status
                     # Set is_inactive flag based on status
                     s['is_inactive'] = sensor.status.lower() != 'active'
-            with open('app/static/data/sensor_data.json', 'w') as f:
-                json.dump(sensor_data, f, indent=4)
+            save_sensor_data_to_json(sensor_data)
         except Exception as e:
             print(f"Error updating sensor_data.json: {str(e)}")
 
@@ -481,8 +442,7 @@ def delete_json_sensor():
             
         # Load current sensor data
         try:
-            with open('app/static/data/sensor_data.json', 'r') as f:
-                sensors_data = json.load(f)
+            sensors_data = get_snapshot().sensors
         except (FileNotFoundError, json.JSONDecodeError):
             return jsonify({'success': False, 'message': 'No sensor data found'}), 404
             
@@ -533,93 +493,24 @@ def get_sensor_data():
     """
     Get sensor data in the same format as the user endpoint.
     This ensures consistency between admin and user maps.
+    Served from the sensor read model: accepts status, soil_type and
+    bbox=min_lng,min_lat,max_lng,max_lat filters, If-None-Match, gzip and ?since=<version>.
     """
     try:
-        # Get sensors from JSON file
-        json_sensors = []
-        try:
-            with open('app/static/data/sensor_data.json') as file:
-                json_sensors = json.load(file)
-        except (FileNotFoundError, json.JSONDecodeError):
-            pass
-        
-        # Get sensors from database
-        db_sensors = Sensor.query.all()
-        
-        # Create a dictionary to store unique sensors by ID
-        unique_sensors = {}
-        
-        # First, add JSON sensors to the dictionary
-        for sensor in json_sensors:
-            sensor_id = sensor.get('id')
-            if sensor_id and sensor_id not in unique_sensors:
-                unique_sensors[sensor_id] = sensor
-        
-        # Then, add database sensors that aren't in JSON
-        for sensor in db_sensors:
-            if sensor.sid not in unique_sensors:
-                # Create sensor data for this database sensor
-                sensor_data = {
-                    'id': sensor.sid,
-                    'name': sensor.name,
-                    'latitude': sensor.latitude,
-                    'longitude': sensor.longitude,
-                    'soil_type': sensor.soil_type,
-                    'status': sensor.status,
-                    'operational_status': sensor.operational_status,
-                    'is_inactive': sensor.operational_status.lower() != 'active'
-                }
-                unique_sensors[sensor.sid] = sensor_data
-        
-        # Process all sensors
-        result = []
-        for sensor in unique_sensors.values():
-            # Check if sensor is inactive
-            is_inactive = sensor.get('operational_status', '').lower() != 'active' or sensor.get('is_inactive', False)
-            
-            if is_inactive:
-                # For inactive sensors, return N/A values for all data fields
-                result.append({
-                    'id': sensor.get('id'),
-                    'name': sensor.get('name'),
-                    'latitude': sensor.get('latitude'),
-                    'longitude': sensor.get('longitude'),
-                    'soil_type': sensor.get('soil_type'),
-                    'rainfall': 'N/A',
-                    'forecasted_rainfall': 'N/A',
-                    'soil_saturation': 'N/A',
-                    'slope': 'N/A',
-                    'seismic_activity': 'N/A',
-                    'status': 'Inactive',
-                    'risk_level': 'N/A',
-                    'affected_radius': 'N/A',
-                    'predicted_landslide_time': 'N/A',
-                    'operational_status': 'Inactive',
-                    'timestamp': sensor.get('timestamp', ''),
-                    'is_inactive': True
-                })
-            else:
-                # For active sensors, generate new data
-                new_data = generate_fake_sensor_data(
-                    sensor_id=sensor.get('id'),
-                    name=sensor.get('name'),
-                    latitude=sensor.get('latitude'),
-                    longitude=sensor.get('longitude'),
-                    soil_type=sensor.get('soil_type')
-                )
-                if new_data:
-                    result.append(new_data)
-        
-        # Sort by ID to ensure consistent order
-        result.sort(key=lambda x: x['id'])
-        
-        return jsonify({
-            'success': True,
-            'sensors': result
-        })
+        return sensor_response('admin', full=lambda sensors: {'success': True, 'sensors': sensors})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"Error in get_sensor_data: {str(e)}")
         return jsonify({
             'success': False,
             'message': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+@admin_bp.route('/sensor_events')
+@login_required
+def sensor_events():
+    """
+    Server-Sent Events stream of sensor status changes, pushed as the sensor service publishes them.
+    """
+    return stream_response([SENSOR_CHANNEL], request.headers.get('Last-Event-ID'))
@@ -3,15 +3,17 @@ from . import camp_manager_bp
 from flask_login import current_user, login_required
 from app.db_manager import CampManager, CampNotFound
 from app.resource_allocation import (
-    allocate_resources,
-    calculate_road_distance_and_duration,
-    format_eta
+    format_eta,
+    nearest_operational_warehouse,
+    plan_request_warehouses,
+    request_road_distance_and_duration
 )
-from app.models import Camp, Vehicle, UserRequest, ResourceRequest, Warehouse, User, Request, Notification, CampNotification
+from app.user_context import get_managed_camp
+from app.events import announcement_channel, camp_channel, publish_committed, stream_response, warehouse_channel
+from app.models import Camp, Vehicle, UserRequest, ResourceRequest, User, Request, Notification, CampNotification
 from app import db
 from datetime import datetime, timedelta
 import os
-import json
 from flask import flash
 from functools import wraps
 
@@ -27,7 +29,7 @@ def camp_manager_required(f):
 @login_required
 def index():
     # Get the camp managed by the current user
-    camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+    camp = get_managed_camp()
     if not camp:
         return render_template('camp_manager/no_camp.html')
     
@@ -40,7 +42,7 @@ def get_camp_details():
         print(f"Current user ID: {current_user.uid}")  # Debug log
         
         # Get the camp managed by the current user
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             print("No camp found for user")  # Debug log
             return jsonify({'success': False, 'error': 'No camp found for this manager'}), 404
@@ -113,7 +115,7 @@ def get_people():
 def get_user_requests():
     try:
         # Get the camp managed by the current user
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             return jsonify({'success': False, 'error': 'No camp found for this manager'}), 404
 
@@ -219,7 +221,7 @@ def update_resource():
 def get_delivery_status():
     try:
         # Get the camp managed by the current camp manager
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             return jsonify({"success": False, "error": "No camp assigned"}), 404
         
@@ -229,7 +231,8 @@ def get_delivery_status():
             status='in_transit'
         ).all()
         
-        delivery_status = []
+        # Start every ETA lookup first so they run concurrently
+        lookups = []
         for request in resource_requests:
             try:
                 if request.vehicle and request.warehouse:
@@ -245,32 +248,35 @@ def get_delivery_status():
                     
                     current_location = (warehouse.coordinates_lat, warehouse.coordinates_lng)
                     camp_location = (camp.coordinates_lat, camp.coordinates_lng)
-                
-                    # Calculate ETA
-                    try:
-                        _, duration = calculate_road_distance_and_duration(current_location, camp_location)
-                        if duration:
-                            eta = datetime.now() + timedelta(seconds=duration)
-                            formatted_eta = format_eta(duration)
-                        else:
-                            # If duration is None, use a default value
-                            formatted_eta = "Calculating..."
-                    except Exception as e:
-                        print(f"Error calculating ETA: {e}")
-                        formatted_eta = "Calculating..."
-                    
-                    delivery_status.append({
-                        'request_id': request.id,
-                        'vehicle_id': request.vehicle.vid,
-                        'warehouse': warehouse.name,
-                        'eta': formatted_eta,
-                        'status': request.status
-                    })
+                    lookups.append((request, warehouse, request_road_distance_and_duration(current_location, camp_location)))
             except Exception as e:
                 print(f"Error processing request {request.id}: {e}")
                 # Continue with the next request
                 continue
         
+        delivery_status = []
+        for request, warehouse, lookup in lookups:
+            # Calculate ETA
+            try:
+                _, duration = lookup.result()
+                if duration:
+                    eta = datetime.now() + timedelta(seconds=duration)
+                    formatted_eta = format_eta(duration)
+                else:
+                    # If duration is None, use a default value
+                    formatted_eta = "Calculating..."
+            except Exception as e:
+                print(f"Error calculating ETA: {e}")
+                formatted_eta = "Calculating..."
+            
+            delivery_status.append({
+                'request_id': request.id,
+                'vehicle_id': request.vehicle.vid,
+                'warehouse': warehouse.name,
+                'eta': formatted_eta,
+                'status': request.status
+            })
+        
         return jsonify({
             'success': True,
             'deliveries': delivery_status
@@ -289,7 +295,7 @@ def send_resource_request():
     """Send a resource request from a camp to the nearest warehouse."""
     try:
         # Get the camp managed by the current camp manager
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             return jsonify({"success": False, "error": "No camp assigned"}), 404
         
@@ -312,44 +318,61 @@ def send_resource_request():
         if any(q < 0 for q in [food_quantity, water_quantity, essentials_quantity, clothes_quantity]):
             return jsonify({"success": False, "error": "Resource quantities cannot be negative"}), 400
         
-        # Find the nearest warehouse
-        warehouses = Warehouse.query.all()
-        nearest_warehouse = None
-        min_distance = float('inf')
-        
+        # Send the request to the nearest warehouse that has all of it in stock, or
+        # split it across the nearest warehouses that together have the most of it
         camp_location = (camp.coordinates_lat, camp.coordinates_lng)
+        shares, missing = plan_request_warehouses(camp_location, {
+            'food': food_quantity,
+            'water': water_quantity,
+            'essentials': essentials_quantity,
+            'clothes': clothes_quantity
+        })
         
-        for warehouse in warehouses:
-            warehouse_location = (warehouse.coordinates_lat, warehouse.coordinates_lng)
-            distance, _ = calculate_road_distance_and_duration(camp_location, warehouse_location)
-            
-            if distance and distance < min_distance:
-                min_distance = distance
-                nearest_warehouse = warehouse
-        
-        if not nearest_warehouse:
-            return jsonify({"success": False, "error": "No warehouses available"}), 404
+        # Whatever no warehouse has in stock waits as a pending request at the nearest
+        # warehouse, the way batch allocation keeps an unmet remainder pending
+        if missing:
+            backorder_warehouse = nearest_operational_warehouse(camp_location)
+            if backorder_warehouse:
+                share = next((items for warehouse, items in shares if warehouse.wid == backorder_warehouse.wid), None)
+                if share is None:
+                    shares.append((backorder_warehouse, dict(missing)))
+                else:
+                    for item, quantity in missing.items():
+                        share[item] = share.get(item, 0) + quantity
+        if not shares:
+            return jsonify({"success": False, "error": "No operational warehouse found"}), 404
         
-        # Create a new resource request
-        resource_request = ResourceRequest(
-            camp_id=camp.cid,
-            warehouse_id=nearest_warehouse.wid,  # Assign the nearest warehouse
-            food_quantity=food_quantity,
-            water_quantity=water_quantity,
-            essentials_quantity=essentials_quantity,
-            clothes_quantity=clothes_quantity,
-            priority=priority,
-            status='pending'
-        )
+        # Create a resource request for each warehouse
+        resource_requests = []
+        for warehouse, items in shares:
+            resource_requests.append((warehouse, ResourceRequest(
+                camp_id=camp.cid,
+                warehouse_id=warehouse.wid,
+                food_quantity=items.get('food', 0),
+                water_quantity=items.get('water', 0),
+                essentials_quantity=items.get('essentials', 0),
+                clothes_quantity=items.get('clothes', 0),
+                priority=priority,
+                status='pending'
+            )))
         
-        # Save the request
-        db.session.add(resource_request)
+        # Save the requests
+        db.session.add_all([resource_request for _, resource_request in resource_requests])
         db.session.commit()
+        publish_committed([(warehouse_channel(warehouse.wid), 'resource_request', {
+            'request_id': resource_request.id,
+            'camp_id': camp.cid,
+            'priority': priority
+        }) for warehouse, resource_request in resource_requests])
         
         return jsonify({
             "success": True,
-            "message": "Resource request sent successfully",
-            "request_id": resource_request.id
+            "message": "Resource request sent successfully" if not missing else
+                       "Resource request sent; part of it is waiting for stock",
+            "request_id": resource_requests[0][1].id,
+            "request_ids": [resource_request.id for _, resource_request in resource_requests],
+            "warehouses": [warehouse.name for warehouse, _ in resource_requests],
+            "missing": missing
         })
         
     except Exception as e:
@@ -364,7 +387,7 @@ def send_resource_request():
 def add_person():
     try:
         # Get the camp managed by the current user
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             return jsonify({'success': False, 'error': 'No camp found for this manager'}), 404
 
@@ -383,31 +406,14 @@ def add_person():
                 'error': f'Cannot add {number_of_people} people. This would exceed camp capacity of {camp.capacity}. Current occupancy: {camp.current_occupancy}'
             }), 400
 
-        # Create a new person entry
+        # Add the person for each slot requested and update current occupancy
+        CampManager.admit_people(camp, name, phone, count=number_of_people)
         person_data = {
             'name': name,
             'phone': phone,
             'entry_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
 
-        # Update the camp's people_list
-        if not camp.people_list:
-            people_list = []
-        else:
-            try:
-                people_list = json.loads(camp.people_list)
-            except json.JSONDecodeError:
-                people_list = []
-
-        # Add the person for each slot requested
-        for _ in range(number_of_people):
-            people_list.append(person_data)
-            
-        camp.people_list = json.dumps(people_list)
-
-        # Update current occupancy
-        camp.current_occupancy = len(people_list)
-
         # Save changes to the database
         db.session.commit()
 
@@ -425,7 +431,7 @@ def add_person():
 def get_current_camp():
     try:
         # Get the camp managed by the current user
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             return jsonify({'success': False, 'error': 'No camp found for this manager'}), 404
 
@@ -441,30 +447,16 @@ def get_current_camp():
 def get_camp_people():
     try:
         # Get the camp managed by the current user
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             return jsonify({'success': False, 'error': 'No camp found for this manager'}), 404
 
-        # Parse the people list from JSON string
-        people_list = []
-        if camp.people_list:
-            try:
-                people_list = json.loads(camp.people_list)
-                # Ensure people_list is a list
-                if not isinstance(people_list, list):
-                    people_list = []
-            except json.JSONDecodeError:
-                people_list = []
-
         # Ensure each person has all required fields
-        formatted_people = []
-        for person in people_list:
-            if isinstance(person, dict):
-                formatted_people.append({
-                    'name': person.get('name', 'Unknown'),
-                    'phone': person.get('phone', 'N/A'),
-                    'entry_date': person.get('entry_date', 'N/A')
-                })
+        formatted_people = [{
+            'name': person['name'] or 'Unknown',
+            'phone': person['phone'] or 'N/A',
+            'entry_date': person['entry_date'] or 'N/A'
+        } for person in CampManager.get_occupants(camp.cid)]
 
         return jsonify({
             'success': True,
@@ -478,7 +470,7 @@ def get_camp_people():
 def remove_people():
     try:
         # Get the camp managed by the current user
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             return jsonify({'success': False, 'error': 'No camp found for this manager'}), 404
 
@@ -488,33 +480,15 @@ def remove_people():
         if not people_to_remove:
             return jsonify({'success': False, 'error': 'No people selected for removal'}), 400
 
-        # Parse the current people list
-        if not camp.people_list:
-            people_list = []
-        else:
-            try:
-                people_list = json.loads(camp.people_list)
-            except json.JSONDecodeError:
-                people_list = []
-
-        # Remove the selected people
-        original_length = len(people_list)
-        people_list = [person for person in people_list 
-                      if not any(p['name'] == person['name'] and p['phone'] == person['phone'] 
-                               for p in people_to_remove)]
-
-        # Update the camp's people list
-        camp.people_list = json.dumps(people_list)
-        
-        # Update current occupancy
-        camp.current_occupancy = len(people_list)
+        # Remove the selected people and update current occupancy
+        removed = CampManager.remove_occupants(camp, people_to_remove)
 
         # Save changes to the database
         db.session.commit()
 
         return jsonify({
             'success': True,
-            'message': f'Successfully removed {original_length - len(people_list)} person(s) from the camp'
+            'message': f'Successfully removed {removed} person(s) from the camp'
         })
     except Exception as e:
         db.session.rollback()
@@ -556,31 +530,9 @@ def update_request_status():
         # Update the request status
         user_request.status = status
 
-        # If request is accepted, add the person to the camp's people list
+        # If request is accepted, add the person to the camp for each slot requested
         if status == 'Approved':
-            # Parse the current people list
-            if not camp.people_list:
-                people_list = []
-            else:
-                try:
-                    people_list = json.loads(camp.people_list)
-                except json.JSONDecodeError:
-                    people_list = []
-
-            # Add the person for each slot requested
-            for _ in range(user_request.number_slots):
-                person_data = {
-                    'name': user_request.name,
-                    'phone': user_request.phone,
-                    'entry_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-                people_list.append(person_data)
-
-            # Update the camp's people list
-            camp.people_list = json.dumps(people_list)
-            
-            # Update current occupancy based on the total number of people
-            camp.current_occupancy = len(people_list)
+            CampManager.admit_people(camp, user_request.name, user_request.phone, count=user_request.number_slots)
 
         # Create a notification for the user
         notification_message = f"Your slot booking request for {camp.name} has been {status.lower()}"
@@ -598,6 +550,12 @@ def update_request_status():
         db.session.add(camp_notification)
 
         db.session.commit()
+        publish_committed([(announcement_channel(camp.cid), 'announcement', {
+            'id': camp_notification.id,
+            'message': camp_notification.message,
+            'timestamp': camp_notification.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'type': 'camp_announcement'
+        })])
 
         return jsonify({
             'success': True,
@@ -614,7 +572,7 @@ def vehicle_dispatch_notification():
     """Receive notification when a vehicle is dispatched from a warehouse to a camp."""
     try:
         # Get the camp managed by the current camp manager
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             return jsonify({"success": False, "error": "No camp assigned"}), 404
         
@@ -662,7 +620,7 @@ def get_dispatch_notifications():
     """Get all vehicle dispatch notifications for the current camp."""
     try:
         # Get the camp managed by the current camp manager
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             return jsonify({"success": False, "error": "No camp assigned"}), 404
         
@@ -684,12 +642,25 @@ def get_dispatch_notifications():
             "message": f'Error retrieving notifications: {str(e)}'
         }), 500
 
+@camp_manager_bp.route('/notification_events')
+@login_required
+def notification_events():
+    """
+    Server-Sent Events stream of the current user's camp: notification events for vehicle
+    dispatches and rejected requests, and user_request events for new slot requests.
+    Clients resuming with Last-Event-ID get the events they missed, if this worker still has them.
+    """
+    camp = get_managed_camp()
+    if not camp:
+        return jsonify({'success': False, 'error': 'Camp not found'}), 404
+    return stream_response([camp_channel(camp.cid)], request.headers.get('Last-Event-ID'))
+
 @camp_manager_bp.route('/get_notifications')
 @login_required
 def get_notifications():
     try:
         # Get the camp managed by the current user
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             return jsonify({'success': False, 'error': 'Camp not found'}), 404
 
@@ -740,7 +711,7 @@ def complete_delivery():
             return jsonify({'success': False, 'error': 'Vehicle not found'}), 404
 
         # Get the camp managed by the current user
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             return jsonify({'success': False, 'error': 'Camp not found'}), 404
 
@@ -803,7 +774,7 @@ def check_request_status(request_id):
             return jsonify({'success': False, 'error': 'Request not found'}), 404
 
         # Get the camp managed by the current user
-        camp = Camp.query.filter_by(camp_head_id=current_user.uid).first()
+        camp = get_managed_camp()
         if not camp:
             return jsonify({'success': False, 'error': 'Camp not found'}), 404
 
@@ -3,7 +3,6 @@ from . import camp_manager_bp
 from flask_login import current_user, login_required
 from app.db_manager import CampManager, CampNotFound
 from app.resource_allocation import (
-    allocate_resources,
     calculate_road_distance_and_duration,
     format_eta
 )
@@ -0,0 +1,4 @@
+from flask import Blueprint
+sensors_bp = Blueprint('sensors', __name__, url_prefix='/sensors')
+
+from .routes import *
@@ -0,0 +1,116 @@
+import hmac
+import math
+import numpy as np
+from datetime import datetime, timezone
+from flask import current_app, jsonify, request
+from flask_login import login_required
+from app.models import Sensor
+from app.extensions import db
+from app.sensor_ingest import READING_FIELDS, ReadingBatch, UnsupportedFormat, parse_readings, parse_timestamp, validate_readings
+from app.sensor_rollups import DEFAULT_MAX_POINTS, MAX_POINTS_LIMIT, RESOLUTIONS, query_history
+from . import sensors_bp
+
+
+@sensors_bp.route('/ingest', methods=['POST'])
+def ingest():
+    """
+    Accepts a batch of sensor readings as JSON lines (application/x-ndjson), a JSON array
+    or msgpack. Each reading has a sensor_id, an optional timestamp (ISO 8601 or epoch
+    seconds, defaulting to now) and any of the reading fields. Valid readings are queued
+    and written to the database in bulk shortly after the response. Requires the
+    SENSOR_INGEST_TOKEN as a Bearer token, and answers 503 while none is configured.
+    :return: 202 with the number of accepted and rejected readings
+    """
+    # Ingestion stays closed until a token is configured
+    token = current_app.config.get('SENSOR_INGEST_TOKEN')
+    if not token:
+        return jsonify({'success': False, 'error': 'Sensor ingestion is not configured'}), 503
+    provided = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(provided, f'Bearer {token}'):
+        return jsonify({'success': False, 'error': 'Invalid or missing ingestion token'}), 401
+
+    try:
+        readings = parse_readings(request.get_data(), request.mimetype)
+    except UnsupportedFormat as e:
+        return jsonify({'success': False, 'error': str(e)}), 415
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid body: {str(e)}'}), 400
+    if not readings:
+        return jsonify({'success': False, 'error': 'No readings in request'}), 400
+
+    try:
+        batch = ReadingBatch.from_readings(readings)
+        # One query for every sensor named in the batch
+        requested_ids = np.unique(batch.sensor_ids[batch.sensor_ids >= 0]).tolist()
+        known_ids = {sid for (sid,) in Sensor.query.with_entities(Sensor.sid).filter(Sensor.sid.in_(requested_ids))}
+        valid, errors = validate_readings(batch, known_ids)
+
+        accepted = int(valid.sum())
+        if accepted and not current_app.extensions['sensor_ingest'].add(batch.select(valid)):
+            response = jsonify({'success': False, 'error': 'Ingestion buffer is full, retry later'})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+
+        return jsonify({
+            'success': True,
+            'accepted': accepted,
+            'rejected': len(batch) - accepted,
+            'errors': [{'index': index, 'error': error} for index, error in errors]
+        }), 202
+    except Exception as e:
+        print(f"Error ingesting sensor readings: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def _time_arg(name, default):
+    """:return: Query parameter as a POSIX timestamp, NaN if it is not one"""
+    value = request.args.get(name)
+    try:
+        return float(value) if value is not None else default
+    except ValueError:
+        return parse_timestamp(value, default)
+
+
+@sensors_bp.route('/<int:sensor_id>/history')
+@login_required
+def history(sensor_id):
+    """
+    History of one metric of a sensor for charts and trend analysis.
+    Query parameters: metric (required), start and end (ISO 8601 or epoch seconds,
+    defaulting to the last 24 hours), max_points and resolution (raw, 1m, 1h or 1d,
+    chosen from the window and max_points when omitted).
+    """
+    metric = request.args.get('metric')
+    if metric not in READING_FIELDS:
+        return jsonify({'success': False, 'error': f'metric must be one of {", ".join(READING_FIELDS)}'}), 400
+    resolution = request.args.get('resolution')
+    if resolution is not None and resolution != 'raw' and resolution not in RESOLUTIONS:
+        return jsonify({'success': False, 'error': 'resolution must be raw, 1m, 1h or 1d'}), 400
+
+    now = datetime.now(timezone.utc).timestamp()
+    end = _time_arg('end', now)
+    start = _time_arg('start', end - 86400)
+    max_points = request.args.get('max_points', DEFAULT_MAX_POINTS, type=int)
+    if not (math.isfinite(start) and math.isfinite(end)) or start >= end:
+        return jsonify({'success': False, 'error': 'start and end must be timestamps with start before end'}), 400
+    if not 0 < max_points <= MAX_POINTS_LIMIT:
+        return jsonify({'success': False, 'error': f'max_points must be between 1 and {MAX_POINTS_LIMIT}'}), 400
+
+    try:
+        if db.session.get(Sensor, sensor_id) is None:
+            return jsonify({'success': False, 'error': 'Sensor not found'}), 404
+        resolution, points = query_history(sensor_id, metric, start, end, max_points, resolution)
+        return jsonify({
+            'success': True,
+            'sensor_id': sensor_id,
+            'metric': metric,
+            'resolution': resolution,
+            'start': datetime.fromtimestamp(start, timezone.utc).replace(tzinfo=None).isoformat(),
+            'end': datetime.fromtimestamp(end, timezone.utc).replace(tzinfo=None).isoformat(),
+            'points': points
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error querying sensor history: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,14 +1,17 @@
 from . import user_bp
 from .utils import VolunteerForm
 from flask import jsonify, request
-from json import load as load_json
-from app.models import Camp, CampNotification, Donation, VolunteerHistory, Volunteer, UserRequest, User
+from app.models import Camp, CampNotification, CampOccupant, Donation, VolunteerHistory, Volunteer, UserRequest, User
 from flask_login import current_user, login_required
 from app.db_manager import CampManager, DonationManager, ForumManager, VolunteerManager
+from app.sensor_snapshot import get_snapshot
+from app.sensor_responses import PreparedBody, prepared_response
+from app.sensor_read_model import sensor_response
+from app.queries import query_budget
+from app.events import SENSOR_CHANNEL, announcement_channel, camp_channel, publish_committed, stream_response
 import razorpay
 from datetime import datetime
 from app import db
-import json
 
 
 # Initialize Razorpay client
@@ -19,35 +22,22 @@ razorpay_client = razorpay.Client(auth=("YOUR_RAZORPAY_KEY_ID", "YOUR_RAZORPAY_K
 @user_bp.route('/get_sensor_data')
 def get_sensor_data():
     try:
-        with open('app/static/data/sensor_data.json') as file:
-            data = load_json(file)
-        
-        # Create a dictionary to store the latest active sensor for each name
-        sensor_dict = {}
-        
-        # Process each sensor
-        for sensor in data:
-            name = sensor.get('name')
-            status = sensor.get('operational_status', 'Active')
-            
-            # Only process active sensors
-            if status == 'Active':
-                # If this name doesn't exist in our dictionary, or if this sensor is more recent
-                if name not in sensor_dict:
-                    sensor_dict[name] = sensor
-                else:
-                    # Compare timestamps if available, otherwise keep the first one
-                    current_time = sensor.get('last_reading', '')
-                    existing_time = sensor_dict[name].get('last_reading', '')
-                    if current_time > existing_time:
-                        sensor_dict[name] = sensor
-        
-        # Convert dictionary values back to list
-        active_sensors = list(sensor_dict.values())
-        return jsonify(active_sensors)
+        # Served from the sensor read model; accepts status, soil_type and bbox filters,
+        # If-None-Match, gzip and ?since=<version>
+        return sensor_response('user')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@user_bp.route('/sensor_events')
+def sensor_events():
+    """
+    Server-Sent Events stream of sensor status changes (status_change events).
+    Clients resuming with Last-Event-ID get the events they missed, if this worker still has them.
+    """
+    return stream_response([SENSOR_CHANNEL], request.headers.get('Last-Event-ID'))
+
 ################## Camps APIs ##################
 
 @user_bp.route('/get_camp_data/<int:cid>')
@@ -64,6 +54,7 @@ def get_camp_data(cid):
 
 @user_bp.route('/list_all_camps', methods=['GET'])
 @login_required
+@query_budget(1)
 def list_all_camps():
     """
     Fetch a list of all camps using CampManager.
@@ -71,6 +62,15 @@ def list_all_camps():
     camps = CampManager.list_all_camps()
     return jsonify(camps)
 
+@user_bp.route('/camp_events/<int:camp_id>')
+@login_required
+def camp_events(camp_id):
+    """
+    Server-Sent Events stream of a camp's announcements (announcement events).
+    Clients resuming with Last-Event-ID get the events they missed, if this worker still has them.
+    """
+    return stream_response([announcement_channel(camp_id)], request.headers.get('Last-Event-ID'))
+
 @user_bp.route('/camp_notification/<int:camp_id>', methods=['GET'])
 @login_required
 def get_announcements(camp_id):
@@ -148,35 +148,9 @@ def get_people_list(camp_id):
         if not camp:
             return jsonify({"error": "Camp not found"}), 404
 
-        # Get the people list from the camp
-        people_list = []
-        if camp.people_list:
-            try:
-                # Try to parse the JSON string
-                people_list = json.loads(camp.people_list)
-                if not isinstance(people_list, list):
-                    people_list = []
-            except json.JSONDecodeError:
-                # If the string is not valid JSON, try to parse the old format
-                people_list = []
-                raw_list = camp.people_list.split('|') if camp.people_list else []
-                for person in raw_list:
-                    if ':' in person:
-                        uid, name = person.split(':', 1)
-                        # Get user details from database
-                        user = User.query.get(uid)
-                        if user:
-                            people_list.append({
-                                "uid": uid,
-                                "name": name,
-                                "phone": user.mobile if user.mobile else "N/A"
-                            })
-                        else:
-                            people_list.append({
-                                "uid": uid,
-                                "name": name,
-                                "phone": "N/A"
-                            })
+        people_list = CampManager.get_occupants(camp_id)
+        for person in people_list:
+            person['phone'] = person['phone'] or "N/A"
 
         return jsonify(people_list), 200
     except Exception as e:
@@ -186,7 +160,7 @@ def get_people_list(camp_id):
 @login_required
 def add_person_to_camp(camp_id):
     """
-    Add a person to the camp's people_list.
+    Add a registered user to a camp.
     """
     try:
         camp = Camp.query.get(camp_id)
@@ -200,29 +174,21 @@ def add_person_to_camp(camp_id):
         if not user_id or not name:
             return jsonify({"error": "Invalid data. 'uid' and 'name' are required."}), 400
 
-        # Initialize or load existing people list
         try:
-            people_list = json.loads(camp.people_list) if camp.people_list else []
-            if not isinstance(people_list, list):
-                people_list = []
-        except json.JSONDecodeError:
-            people_list = []
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid data. 'uid' must be a user id."}), 400
 
         # Check if person already exists in camp
-        if any(person.get('uid') == user_id for person in people_list):
+        if CampOccupant.query.filter_by(camp_id=camp_id, uid=user_id).first():
             return jsonify({"error": "Person already exists in this camp"}), 400
 
-        # Add the new person
-        people_list.append({
-            'uid': user_id,
-            'name': name
-        })
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({"error": "User not found"}), 404
 
-        # Update camp's people_list with JSON string
-        camp.people_list = json.dumps(people_list)
-        
-        # Update current occupancy
-        camp.current_occupancy = len(people_list)
+        # Add the new person and update current occupancy
+        CampManager.admit_people(camp, name, user.mobile, uid=user_id)
         
         # Save changes to database
         db.session.commit()
@@ -240,6 +206,7 @@ def add_person_to_camp(camp_id):
 
 @user_bp.route('/forums/get_threads', methods=['GET'])
 @login_required
+@query_budget(2)
 def get_threads():
     """
     Retrieve all forum threads.
@@ -451,23 +418,27 @@ def get_alerts():
     Fetch current alerts from sensor data.
     """
     try:
-        with open('app/static/data/sensor_data.json') as file:
-            sensor_data = load_json(file)
+        snapshot = get_snapshot()
+        # Alerts are stamped with the time their readings were published
+        timestamp = datetime.fromisoformat(snapshot.published_at).strftime('%Y-%m-%d %H:%M:%S')
         
-        # Filter sensors with Alert or Warning status AND are Active
-        alerts = []
-        for sensor in sensor_data:
-            # Only include sensors that are Active and have Alert or Warning status
-            if (sensor['status'] in ['Alert', 'Warning'] and 
-                sensor.get('operational_status', 'Active') == 'Active'):
-                alerts.append({
-                    'message': f"{sensor['name']}: {sensor['status']} - Predicted Landslide Time: {sensor['predicted_landslide_time']}",
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'sensor_id': sensor['id'],
-                    'location': f"{sensor['latitude']}, {sensor['longitude']}"
-                })
+        def active_alerts(sensor_data):
+            # Filter sensors with Alert or Warning status AND are Active
+            alerts = []
+            for sensor in sensor_data:
+                # Only include sensors that are Active and have Alert or Warning status
+                if (sensor['status'] in ['Alert', 'Warning'] and 
+                    sensor.get('operational_status', 'Active') == 'Active'):
+                    alerts.append({
+                        'message': f"{sensor['name']}: {sensor['status']} - Predicted Landslide Time: {sensor['predicted_landslide_time']}",
+                        'timestamp': timestamp,
+                        'sensor_id': sensor['id'],
+                        'location': f"{sensor['latitude']}, {sensor['longitude']}"
+                    })
+            return alerts
         
-        return jsonify(alerts)
+        prepared = snapshot.cached('user_alerts', lambda sensor_data: PreparedBody(active_alerts(sensor_data)))
+        return prepared_response(prepared)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -534,6 +505,10 @@ def request_camp_slot():
         
         db.session.add(new_request)
         db.session.commit()
+        publish_committed([(camp_channel(new_request.camp_id), 'user_request', {
+            'request_id': new_request.id,
+            'number_slots': new_request.number_slots
+        })])
         
         return jsonify({
             'success': True,
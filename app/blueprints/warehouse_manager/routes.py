@@ -4,8 +4,16 @@ from app.models import Warehouse, Vehicle, db, ResourceRequest, Camp, User, Noti
 from app.decorators import warehouse_manager_required
 from . import warehouse_manager_bp
 from app.db_manager import VehicleManager
-from app.resource_allocation import allocate_resources, calculate_road_distance_and_duration, format_eta
-from datetime import datetime, timedelta
+from app.resource_allocation import (
+    format_eta,
+    plan_request_warehouses,
+    road_distance_matrix
+)
+from app.route_optimizer import order_stops, plan_routes as plan_delivery_routes
+from app.queries import camp_locations, query_budget, vehicles_with_loads
+from app.user_context import get_managed_warehouse
+from app.events import camp_channel, publish_committed, stream_response, warehouse_channel
+from datetime import datetime
 import json
 
 @warehouse_manager_bp.route('/')
@@ -24,7 +32,7 @@ def get_warehouse():
             return jsonify({'success': False, 'error': 'User not authenticated'}), 401
 
         # Get the warehouse managed by the current user
-        warehouse = Warehouse.query.filter_by(manager_id=current_user.uid).first()
+        warehouse = get_managed_warehouse()
         if not warehouse:
             return jsonify({'success': False, 'error': 'Warehouse not found'}), 404
 
@@ -58,13 +66,27 @@ def get_warehouse():
         current_app.logger.error(f"Error in get_warehouse: {str(e)}")
         return jsonify({'success': False, 'error': 'Internal server error'}), 500
 
+@warehouse_manager_bp.route('/request_events')
+@login_required
+@warehouse_manager_required
+def request_events():
+    """
+    Server-Sent Events stream of resource requests assigned to the current user's warehouse.
+    Clients resuming with Last-Event-ID get the events they missed, if this worker still has them.
+    """
+    warehouse = get_managed_warehouse()
+    if not warehouse:
+        return jsonify({'success': False, 'error': 'No warehouse found'}), 404
+    return stream_response([warehouse_channel(warehouse.wid)], request.headers.get('Last-Event-ID'))
+
 @warehouse_manager_bp.route('/get_resource_requests')
 @login_required
 @warehouse_manager_required
+@query_budget(5)
 def get_resource_requests():
     try:
         # Get the warehouse managed by the current user
-        warehouse = Warehouse.query.filter_by(manager_id=current_user.uid).first()
+        warehouse = get_managed_warehouse()
         if not warehouse:
             return jsonify({'success': False, 'error': 'No warehouse found'}), 404
             
@@ -76,36 +98,28 @@ def get_resource_requests():
             vehicle_id=None  # Only show requests not yet assigned to any vehicle
         ).all()
         
-        # Get all vehicles that have pending requests
-        waiting_vehicles = db.session.query(
-            Vehicle,
-            db.func.sum(
-                ResourceRequest.food_quantity +
-                ResourceRequest.water_quantity +
-                ResourceRequest.essentials_quantity +
-                ResourceRequest.clothes_quantity
-            ).label('current_load')
-        ).join(
-            ResourceRequest,
-            Vehicle.vid == ResourceRequest.vehicle_id
-        ).filter(
-            Vehicle.warehouse_id == warehouse.wid,
-            ResourceRequest.status == 'pending',  # Only count pending requests
-            Vehicle.status == 'available'  # Only show vehicles that are still available
-        ).group_by(Vehicle.vid).all()
+        # Get all available vehicles that have pending requests, with their loads
+        waiting_vehicles = vehicles_with_loads(warehouse.wid, waiting_only=True)
+        
+        # Get camp information, then every camp's distance to the warehouse with one
+        # route cache query and at most one routing request
+        warehouse_location = (warehouse.coordinates_lat, warehouse.coordinates_lng)
+        camps = camp_locations([request.camp_id for request in requests])
+        camp_ids = list(camps)
+        distances, _ = road_distance_matrix(
+            [(camps[cid].coordinates_lat, camps[cid].coordinates_lng) for cid in camp_ids],
+            [warehouse_location]
+        )
+        camp_distances = {cid: row[0] for cid, row in zip(camp_ids, distances)}
         
         # Format the response to match what the frontend expects
         formatted_requests = []
         for request in requests:
-            # Get camp information
-            camp = Camp.query.get(request.camp_id)
+            camp = camps.get(request.camp_id)
             if not camp:
                 continue
-                
-            # Calculate distance between camp and warehouse
-            camp_location = (camp.coordinates_lat, camp.coordinates_lng)
-            warehouse_location = (warehouse.coordinates_lat, warehouse.coordinates_lng)
-            distance, _ = calculate_road_distance_and_duration(camp_location, warehouse_location)
+            # Distance between camp and warehouse
+            distance = camp_distances[camp.cid]
             
             formatted_requests.append({
                 'id': request.id,
@@ -127,26 +141,15 @@ def get_resource_requests():
         
         # Format waiting vehicles information
         waiting_vehicles_info = []
-        for vehicle, current_load in waiting_vehicles:
-            # Check if the vehicle has any pending requests
-            pending_requests = ResourceRequest.query.filter_by(
-                vehicle_id=vehicle.vid,
-                status='pending'
-            ).count()
-            
-            # Calculate total load including the new request if it's being added
-            total_load = current_load or 0
-            
-            # Only include vehicles that have at least one pending request
-            if pending_requests > 0:
-                waiting_vehicles_info.append({
-                    'vehicle_id': vehicle.vehicle_id,
-                    'capacity': vehicle.capacity,
-                    'current_load': total_load,
-                    'available_capacity': vehicle.capacity - total_load,
-                    'needs_more': total_load < (vehicle.capacity * 0.9),
-                    'pending_requests': pending_requests
-                })
+        for vehicle, current_load, pending_requests in waiting_vehicles:
+            waiting_vehicles_info.append({
+                'vehicle_id': vehicle.vehicle_id,
+                'capacity': vehicle.capacity,
+                'current_load': current_load,
+                'available_capacity': vehicle.capacity - current_load,
+                'needs_more': current_load < (vehicle.capacity * 0.9),
+                'pending_requests': pending_requests
+            })
         
         return jsonify({
             'success': True,
@@ -176,6 +179,9 @@ def process_resource_request():
         if not resource_request:
             return jsonify({'success': False, 'error': 'Resource request not found'}), 404
 
+        # Pushed to the camp and warehouse managers once the changes are committed
+        events = []
+
         if action == 'accept':
             if not vehicle_id:
                 return jsonify({'success': False, 'error': 'Vehicle ID is required for accepting requests'}), 400
@@ -222,7 +228,6 @@ def process_resource_request():
                     status='pending'
                 ).all()
                 
-                # Calculate ETA once for all requests
                 camp = Camp.query.get(resource_request.camp_id)
                 if not camp:
                     return jsonify({'success': False, 'error': 'Camp not found'}), 404
@@ -231,19 +236,24 @@ def process_resource_request():
                 if not warehouse:
                     return jsonify({'success': False, 'error': 'Warehouse not found'}), 404
 
-                camp_location = (camp.coordinates_lat, camp.coordinates_lng)
+                # Order the vehicle's stops and estimate the arrival at each camp
+                camps = {c.cid: c for c in Camp.query.filter(
+                    Camp.cid.in_({req.camp_id for req in pending_requests})
+                ).all()}
+                stops = [{
+                    'id': req.id,
+                    'location': (camps[req.camp_id].coordinates_lat, camps[req.camp_id].coordinates_lng),
+                    'emergency': req.priority == 'emergency'
+                } for req in pending_requests if req.camp_id in camps]
                 warehouse_location = (warehouse.coordinates_lat, warehouse.coordinates_lng)
-                _, duration = calculate_road_distance_and_duration(camp_location, warehouse_location)
-
-                eta = None
-                if duration:
-                    eta = datetime.now() + timedelta(minutes=duration)
+                etas = {stop['id']: stop['eta'] for stop in order_stops(warehouse_location, stops)}
+                eta = etas.get(resource_request.id)
 
                 # Update all pending requests to in_transit and update warehouse resources
                 for req in pending_requests:
                     req.status = 'in_transit'
                     req.updated_at = datetime.now()
-                    req.eta = eta
+                    req.eta = etas.get(req.id)
                     
                     # Update warehouse resources
                     warehouse.food_available -= req.food_quantity
@@ -276,6 +286,8 @@ def process_resource_request():
                     data=notification_data
                 )
                 db.session.add(notification)
+                db.session.flush()
+                events.append((camp_channel(resource_request.camp_id), 'notification', notification.to_dict()))
             else:
                 # Vehicle is still waiting for more requests
                 vehicle.status = 'available'
@@ -292,65 +304,70 @@ def process_resource_request():
             if not current_warehouse:
                 return jsonify({'success': False, 'error': 'Current warehouse not found'}), 404
                 
-            # Find the next nearest warehouse
-            warehouses = Warehouse.query.filter(
-                Warehouse.wid != current_warehouse.wid,
-                Warehouse.status == 'Operational'
-            ).all()
-            
-            next_warehouse = None
-            min_distance = float('inf')
-            
+            # Forward to the next nearest warehouse that has the request in stock, or
+            # split it across the nearest other warehouses that together have the most of it
             camp_location = (camp.coordinates_lat, camp.coordinates_lng)
+            shares, missing = plan_request_warehouses(camp_location, {
+                'food': resource_request.food_quantity,
+                'water': resource_request.water_quantity,
+                'essentials': resource_request.essentials_quantity,
+                'clothes': resource_request.clothes_quantity
+            }, Warehouse.wid != current_warehouse.wid)
             
-            for warehouse in warehouses:
-                warehouse_location = (warehouse.coordinates_lat, warehouse.coordinates_lng)
-                distance, _ = calculate_road_distance_and_duration(camp_location, warehouse_location)
-                
-                if distance and distance < min_distance:
-                    min_distance = distance
-                    next_warehouse = warehouse
-            
-            if next_warehouse:
-                # Create a new resource request for the next warehouse
-                new_request = ResourceRequest(
-                    camp_id=resource_request.camp_id,
-                    warehouse_id=next_warehouse.wid,
-                    food_quantity=resource_request.food_quantity,
-                    water_quantity=resource_request.water_quantity,
-                    essentials_quantity=resource_request.essentials_quantity,
-                    clothes_quantity=resource_request.clothes_quantity,
-                    priority=resource_request.priority,
-                    status='pending'
-                )
+            if shares:
+                # Create a new resource request for each of the next warehouses
+                new_requests = []
+                for next_warehouse, items in shares:
+                    new_requests.append((next_warehouse, ResourceRequest(
+                        camp_id=resource_request.camp_id,
+                        warehouse_id=next_warehouse.wid,
+                        food_quantity=items.get('food', 0),
+                        water_quantity=items.get('water', 0),
+                        essentials_quantity=items.get('essentials', 0),
+                        clothes_quantity=items.get('clothes', 0),
+                        priority=resource_request.priority,
+                        status='pending'
+                    )))
+                next_warehouses = ', '.join(next_warehouse.name for next_warehouse, _ in new_requests)
                 
                 # Update the original request status to rejected
                 resource_request.status = 'rejected'
                 resource_request.updated_at = datetime.now()
                 
-                # Add the new request to the database
-                db.session.add(new_request)
+                # Add the new requests to the database
+                db.session.add_all([new_request for _, new_request in new_requests])
                 
                 # Create notification for camp manager about rejection and forwarding
                 notification = Notification(
                     user_id=resource_request.camp_id,
                     type='request_rejected_and_forwarded',
-                    message=f'Your resource request has been rejected by {current_warehouse.name} and forwarded to {next_warehouse.name}',
+                    message=f'Your resource request has been rejected by {current_warehouse.name} and forwarded to {next_warehouses}',
                     data={
                         'request_id': resource_request.id,
-                        'forwarded_to': next_warehouse.name
+                        'forwarded_to': next_warehouses,
+                        'missing': missing
                     }
                 )
                 db.session.add(notification)
+                db.session.flush()
+                events.append((camp_channel(resource_request.camp_id), 'notification', notification.to_dict()))
+                for next_warehouse, new_request in new_requests:
+                    events.append((warehouse_channel(next_warehouse.wid), 'resource_request', {
+                        'request_id': new_request.id,
+                        'camp_id': new_request.camp_id,
+                        'priority': new_request.priority
+                    }))
                 
                 # Commit changes before returning response
                 db.session.commit()
+                publish_committed(events)
                 
                 # Return success with next warehouse info
                 return jsonify({
                     'success': True,
                     'message': 'Resource request rejected and forwarded to next nearest warehouse',
-                    'next_warehouse': next_warehouse.name,
+                    'next_warehouse': next_warehouses,
+                    'missing': missing,
                     'status': 'rejected_and_forwarded'
                 })
             else:
@@ -366,18 +383,22 @@ def process_resource_request():
                     data={'request_id': resource_request.id}
                 )
                 db.session.add(notification)
+                db.session.flush()
+                events.append((camp_channel(resource_request.camp_id), 'notification', notification.to_dict()))
                 
                 # Commit changes before returning response
                 db.session.commit()
+                publish_committed(events)
                 
                 return jsonify({
                     'success': True,
-                    'message': 'Resource request rejected (no other warehouses available)',
+                    'message': 'Resource request rejected (no other warehouse has the resources in stock)',
                     'status': 'rejected'
                 })
 
         # Commit all changes for accept action
         db.session.commit()
+        publish_committed(events)
 
         return jsonify({
             'success': True,
@@ -402,7 +423,7 @@ def update_warehouse_status():
         if not new_status:
             return jsonify({'error': 'Status is required'}), 400
 
-        warehouse = Warehouse.query.filter_by(manager_id=current_user.uid).first()
+        warehouse = get_managed_warehouse()
         if not warehouse:
             return jsonify({'error': 'No warehouse found'}), 404
 
@@ -424,7 +445,7 @@ def update_warehouse_status():
 def list_vehicles():
     try:
         # Get the warehouse managed by the current user
-        warehouse = Warehouse.query.filter_by(manager_id=current_user.uid).first()
+        warehouse = get_managed_warehouse()
         if not warehouse:
             return jsonify({'error': 'No warehouse found'}), 404
 
@@ -457,7 +478,7 @@ def add_vehicle():
         if not vehicle_id or not capacity:
             return jsonify({'error': 'Missing required fields'}), 400
 
-        warehouse = Warehouse.query.filter_by(manager_id=current_user.uid).first()
+        warehouse = get_managed_warehouse()
         if not warehouse:
             return jsonify({'error': 'No warehouse found'}), 404
 
@@ -494,7 +515,7 @@ def update_vehicle(vid):
             return jsonify({'error': 'Vehicle not found'}), 404
 
         # Verify the vehicle belongs to the user's warehouse
-        warehouse = Warehouse.query.filter_by(manager_id=current_user.uid).first()
+        warehouse = get_managed_warehouse()
         if not warehouse or vehicle.warehouse_id != warehouse.wid:
             return jsonify({'error': 'Unauthorized access'}), 403
 
@@ -531,7 +552,7 @@ def delete_vehicle(vid):
             return jsonify({'error': 'Vehicle not found'}), 404
 
         # Verify the vehicle belongs to the user's warehouse
-        warehouse = Warehouse.query.filter_by(manager_id=current_user.uid).first()
+        warehouse = get_managed_warehouse()
         if not warehouse or vehicle.warehouse_id != warehouse.wid:
             return jsonify({'error': 'Unauthorized access'}), 403
 
@@ -573,7 +594,7 @@ def update_resources():
         data = request.get_json()
         
         # Get the warehouse managed by the current user
-        warehouse = Warehouse.query.filter_by(manager_id=current_user.uid).first()
+        warehouse = get_managed_warehouse()
         if not warehouse:
             return jsonify({'success': False, 'error': 'Warehouse not found'}), 404
             
@@ -629,7 +650,7 @@ def update_available_resources():
         data = request.get_json()
         
         # Get the warehouse managed by the current user
-        warehouse = Warehouse.query.filter_by(manager_id=current_user.uid).first()
+        warehouse = get_managed_warehouse()
         if not warehouse:
             return jsonify({'success': False, 'error': 'Warehouse not found'}), 404
             
@@ -672,7 +693,7 @@ def update_used_resources():
         data = request.get_json()
         
         # Get the warehouse managed by the current user
-        warehouse = Warehouse.query.filter_by(manager_id=current_user.uid).first()
+        warehouse = get_managed_warehouse()
         if not warehouse:
             return jsonify({'success': False, 'error': 'Warehouse not found'}), 404
             
@@ -700,11 +721,12 @@ def update_used_resources():
 @warehouse_manager_bp.route('/get_available_vehicles/<int:request_id>')
 @login_required
 @warehouse_manager_required
+@query_budget(3)
 def get_available_vehicles(request_id):
     """Get available vehicles for a resource request."""
     try:
         # Get the warehouse managed by the current user
-        warehouse = Warehouse.query.filter_by(manager_id=current_user.uid).first()
+        warehouse = get_managed_warehouse()
         if not warehouse:
             return jsonify({'success': False, 'error': 'No warehouse found'}), 404
             
@@ -723,41 +745,19 @@ def get_available_vehicles(request_id):
             resource_request.clothes_quantity
         )
         
-        # Get available vehicles
-        vehicles = Vehicle.query.filter_by(
-            warehouse_id=warehouse.wid,
-            status='available'
-        ).all()
-        
+        # Get available vehicles with their current load from other pending requests
         available_vehicles = []
-        for vehicle in vehicles:
-            try:
-                # Get current vehicle load from other pending requests
-                current_load = db.session.query(
-                    db.func.sum(
-                        ResourceRequest.food_quantity +
-                        ResourceRequest.water_quantity +
-                        ResourceRequest.essentials_quantity +
-                        ResourceRequest.clothes_quantity
-                    )
-                ).filter(
-                    ResourceRequest.vehicle_id == vehicle.vid,
-                    ResourceRequest.status == 'pending'
-                ).scalar() or 0
-                
-                # Check if vehicle can accommodate the request
-                if (current_load + total_weight) <= vehicle.capacity:
-                    available_vehicles.append({
-                        'vid': vehicle.vid,
-                        'vehicle_id': vehicle.vehicle_id,
-                        'capacity': vehicle.capacity,
-                        'current_load': current_load,
-                        'available_capacity': vehicle.capacity - current_load,
-                        'will_reach_90_percent': (current_load + total_weight) >= (vehicle.capacity * 0.9)
-                    })
-            except Exception as e:
-                current_app.logger.error(f"Error processing vehicle {vehicle.vid}: {str(e)}")
-                continue
+        for vehicle, current_load, _ in vehicles_with_loads(warehouse.wid):
+            # Check if vehicle can accommodate the request
+            if (current_load + total_weight) <= vehicle.capacity:
+                available_vehicles.append({
+                    'vid': vehicle.vid,
+                    'vehicle_id': vehicle.vehicle_id,
+                    'capacity': vehicle.capacity,
+                    'current_load': current_load,
+                    'available_capacity': vehicle.capacity - current_load,
+                    'will_reach_90_percent': (current_load + total_weight) >= (vehicle.capacity * 0.9)
+                })
         
         return jsonify({
             'success': True,
@@ -768,3 +768,71 @@ def get_available_vehicles(request_id):
     except Exception as e:
         current_app.logger.error(f"Error getting available vehicles: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
+
+@warehouse_manager_bp.route('/plan_routes')
+@login_required
+@warehouse_manager_required
+def plan_routes():
+    """Plan delivery routes for the warehouse's unassigned pending requests over its available vehicles."""
+    try:
+        warehouse = get_managed_warehouse()
+        if not warehouse:
+            return jsonify({'success': False, 'error': 'No warehouse found'}), 404
+
+        pending_requests = ResourceRequest.query.filter_by(
+            warehouse_id=warehouse.wid,
+            status='pending',
+            vehicle_id=None
+        ).all()
+        camps = {camp.cid: camp for camp in Camp.query.filter(
+            Camp.cid.in_({req.camp_id for req in pending_requests})
+        ).all()}
+
+        # Vehicles that are already collecting requests only have their remaining space
+        vehicles = vehicles_with_loads(warehouse.wid)
+
+        stops = [{
+            'id': req.id,
+            'camp_id': req.camp_id,
+            'camp_name': camps[req.camp_id].name,
+            'location': (camps[req.camp_id].coordinates_lat, camps[req.camp_id].coordinates_lng),
+            'demand': req.food_quantity + req.water_quantity + req.essentials_quantity + req.clothes_quantity,
+            'emergency': req.priority == 'emergency'
+        } for req in pending_requests if req.camp_id in camps]
+        vehicle_capacities = [{
+            'id': vehicle.vid,
+            'capacity': vehicle.capacity - current_load
+        } for vehicle, current_load, _ in vehicles]
+        vehicle_names = {vehicle.vid: vehicle.vehicle_id for vehicle, _, _ in vehicles}
+
+        plan = plan_delivery_routes((warehouse.coordinates_lat, warehouse.coordinates_lng), stops, vehicle_capacities)
+
+        routes = []
+        for route in plan['routes']:
+            routes.append({
+                'vid': route['vehicle_id'],
+                'vehicle_id': vehicle_names[route['vehicle_id']],
+                'available_capacity': route['capacity'],
+                'load': route['load'],
+                'total_duration': route['total_duration'],
+                'stops': [{
+                    'request_id': stop['id'],
+                    'camp_id': stop['camp_id'],
+                    'camp_name': stop['camp_name'],
+                    'demand': stop['demand'],
+                    'priority': 'emergency' if stop['emergency'] else 'general',
+                    'leg_duration': stop['leg_duration'],
+                    'leg_eta': format_eta(stop['leg_duration']),
+                    'eta': stop['eta'].strftime('%Y-%m-%d %H:%M:%S')
+                } for stop in route['stops']]
+            })
+
+        return jsonify({
+            'success': True,
+            'routes': routes,
+            'unassigned': plan['unassigned']
+        })
+
+    except Exception as e:
+        current_app.logger.error(f"Error planning routes: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
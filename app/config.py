@@ -4,3 +4,15 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your_secret_key'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///site.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    ROUTE_CACHE_TTL = int(os.environ.get('ROUTE_CACHE_TTL') or 7 * 24 * 60 * 60)  # in seconds
+    SPATIAL_INDEX_TTL = int(os.environ.get('SPATIAL_INDEX_TTL') or 60)  # in seconds
+    USER_CONTEXT_TTL = int(os.environ.get('USER_CONTEXT_TTL') or 10)  # in seconds, current user's cached row
+    ROUTING_CANDIDATES = int(os.environ.get('ROUTING_CANDIDATES') or 5)  # nearest warehouses sent to road routing
+    ROUTING_MAX_WORKERS = int(os.environ.get('ROUTING_MAX_WORKERS') or 8)  # concurrent routing server requests per process
+    ROUTING_TIMEOUT = int(os.environ.get('ROUTING_TIMEOUT') or 5)  # in seconds
+    ROUTING_FAILURE_THRESHOLD = int(os.environ.get('ROUTING_FAILURE_THRESHOLD') or 5)  # failures before falling back to straight-line
+    ROUTING_RESET_TIMEOUT = int(os.environ.get('ROUTING_RESET_TIMEOUT') or 30)  # in seconds
+    SENSOR_INGEST_TOKEN = os.environ.get('SENSOR_INGEST_TOKEN')  # Bearer token for /sensors/ingest; ingestion is disabled while unset
+    SENSOR_INGEST_FLUSH_MS = int(os.environ.get('SENSOR_INGEST_FLUSH_MS') or 200)  # in milliseconds
+    SENSOR_INGEST_FLUSH_ROWS = int(os.environ.get('SENSOR_INGEST_FLUSH_ROWS') or 5000)  # readings that trigger an early flush
+    SENSOR_INGEST_MAX_PENDING = int(os.environ.get('SENSOR_INGEST_MAX_PENDING') or 200000)  # readings buffered before rejecting with 503
@@ -1,38 +1,32 @@
 import json
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
-from sklearn.model_selection import GridSearchCV
-from sklearn.metrics import confusion_matrix, classification_report, accuracy_score, precision_score, recall_score, f1_score
 import datetime
 import time
 import os
-from collections import defaultdict
 import logging
 import math
 from typing import Dict, List, Optional
-import seaborn as sns
-import matplotlib.pyplot as plt
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app/static/data/sensor_service.log'),
-        logging.StreamHandler()
-    ]
-)
-
-# Label Encoders for soil types and sensors
-label_encoder = LabelEncoder()
-soil_types_categories = ['clay', 'sand', 'loam', 'silt']
-label_encoder.fit(soil_types_categories)
+
+try:
+    from app.sensor_history import METRICS, STATIC_FIELDS, SensorHistoryStore
+    from app.history_segments import SegmentStore
+    from app.sensor_snapshot import SENSOR_DATA_FILE, publish_snapshot
+    from app.events import SENSOR_CHANNEL, publish_events
+except ImportError:
+    # Running as a script (python app/data.py) puts app/ itself on the path
+    from sensor_history import METRICS, STATIC_FIELDS, SensorHistoryStore
+    from history_segments import SegmentStore
+    from sensor_snapshot import SENSOR_DATA_FILE, publish_snapshot
+    from events import SENSOR_CHANNEL, publish_events
+
+SERVICE_LOG_FILE = os.path.join('app', 'static', 'data', 'sensor_service.log')
 
 # Historical data storage
-historical_data = defaultdict(list)
 MAX_HISTORY_SIZE = 1000  # Store last 1000 readings per sensor
+historical_data = SensorHistoryStore(MAX_HISTORY_SIZE)
+# Readings are persisted as append-only binary segments; historical_data.json is only read once to import it
+HISTORY_DIR = os.environ.get('SENSOR_HISTORY_DIR') or os.path.join('app', 'static', 'data', 'history')
+history_segments = SegmentStore(HISTORY_DIR, MAX_HISTORY_SIZE)
 
 # Soil-specific thresholds with enhanced values
 soil_thresholds = {
@@ -90,6 +84,28 @@ soil_thresholds = {
     }
 }
 
+# Unit weight (kN/m3) and dry void ratio of each soil type
+soil_unit_weights = {
+    'clay': 18,
+    'sand': 16,
+    'loam': 17,
+    'silt': 17
+}
+base_void_ratios = {
+    'clay': 0.8,
+    'sand': 0.6,
+    'loam': 0.7,
+    'silt': 0.7
+}
+
+# Range of generated soil saturation for each soil type
+soil_saturation_ranges = {
+    'clay': (50, 60),
+    'sand': (60, 75),
+    'loam': (45, 55),
+    'silt': (55, 65)
+}
+
 def generate_rainfall():
     """Generate rainfall value aligned with global standards."""
     rainfall = np.random.normal(loc=100, scale=40)
@@ -102,16 +118,8 @@ def generate_forecasted_rainfall():
 
 def generate_soil_saturation(soil_type):
     """Generate soil saturation value based on soil type and global standards."""
-    if soil_type == "clay":
-        return round(np.random.uniform(50, 60), 2)
-    elif soil_type == "sand":
-        return round(np.random.uniform(60, 75), 2)
-    elif soil_type == "loam":
-        return round(np.random.uniform(45, 55), 2)
-    elif soil_type == "silt":
-        return round(np.random.uniform(55, 65), 2)
-    else:
-        return round(np.random.uniform(60, 90), 2)  
+    low, high = soil_saturation_ranges.get(soil_type, (60, 90))
+    return round(np.random.uniform(low, high), 2)
 
 def generate_slope():
     """Generate slope value aligned with global standards."""
@@ -158,20 +166,20 @@ def calculate_soil_stability(soil_data):
     }
 
 def analyze_trends(sensor_id: str, metric: str) -> Dict:
-    """Analyze trends in historical data for a specific metric."""
-    if not historical_data[sensor_id]:
+    """Analyze trends in historical data for a specific metric using running statistics."""
+    count, slope, mean, std = historical_data.trend_summary(sensor_id, metric)
+    if count < 2:
         return {"trend": "stable", "change_rate": 0, "volatility": 0}
     
-    values = [data[metric] for data in historical_data[sensor_id]]
-    if len(values) < 2:
-        return {"trend": "stable", "change_rate": 0, "volatility": 0}
+    # Running sums leave tiny residues where an exact mean would be zero
+    if abs(mean) < 1e-9:
+        mean = 0
     
     # Calculate trend
-    slope = np.polyfit(range(len(values)), values, 1)[0]
-    change_rate = slope / np.mean(values) if np.mean(values) != 0 else 0
+    change_rate = slope / mean if mean != 0 else 0
     
     # Calculate volatility
-    volatility = np.std(values) / np.mean(values) if np.mean(values) != 0 else 0
+    volatility = std / mean if mean != 0 else 0
     
     return {
         "trend": "increasing" if change_rate > 0.1 else "decreasing" if change_rate < -0.1 else "stable",
@@ -385,23 +393,14 @@ def generate_sensor_data(sensor_config):
     })
     
     # Update historical data
-    historical_data[sensor_config['id']].append(sensor_data)
-    if len(historical_data[sensor_config['id']]) > MAX_HISTORY_SIZE:
-        historical_data[sensor_config['id']].pop(0)
+    historical_data.append(sensor_config['id'], sensor_data)
     
     return sensor_data
 
 def calculate_effective_stress(soil_type, soil_saturation):
     """Calculate effective stress based on soil type and saturation."""
-    unit_weights = {
-        'clay': 18,
-        'sand': 16,
-        'loam': 17,
-        'silt': 17
-    }
-    
     depth = 1
-    unit_weight = unit_weights.get(soil_type, 17)
+    unit_weight = soil_unit_weights.get(soil_type, 17)
     total_stress = unit_weight * depth
     saturation_factor = soil_saturation / 100
     effective_stress = total_stress * (1 - saturation_factor)
@@ -414,13 +413,6 @@ def calculate_pore_pressure(soil_saturation):
 
 def calculate_void_ratio(soil_type, soil_saturation):
     """Calculate void ratio based on soil type and saturation."""
-    base_void_ratios = {
-        'clay': 0.8,
-        'sand': 0.6,
-        'loam': 0.7,
-        'silt': 0.7
-    }
-    
     saturation_factor = soil_saturation / 100
     void_ratio = base_void_ratios.get(soil_type, 0.7) * (1 + saturation_factor)
     
@@ -430,13 +422,338 @@ def calculate_shear_stress(slope, soil_saturation):
     """Calculate shear stress based on slope and saturation."""
     return (slope / 45) * (soil_saturation / 100) * 100
 
+# Batch evaluation: the same model as generate_sensor_data, applied to every sensor at once
+# with whole-array operations. Soil-specific values become lookup arrays indexed by soil code.
+
+SOIL_TYPES = tuple(soil_thresholds)
+TREND_METRICS = ('rainfall', 'soil_saturation', 'slope', 'seismic_activity')
+STATUS_LEVELS = (("Normal", "Low"), ("Warning", "Medium"), ("Alert", "High"))
+
+soil_lookup = {key: np.array([soil_thresholds[soil][key] for soil in SOIL_TYPES], dtype=float)
+               for key in soil_thresholds['clay']}
+soil_lookup['unit_weight'] = np.array([soil_unit_weights[soil] for soil in SOIL_TYPES], dtype=float)
+soil_lookup['base_void_ratio'] = np.array([base_void_ratios[soil] for soil in SOIL_TYPES])
+soil_lookup['saturation_low'] = np.array([soil_saturation_ranges[soil][0] for soil in SOIL_TYPES], dtype=float)
+soil_lookup['saturation_high'] = np.array([soil_saturation_ranges[soil][1] for soil in SOIL_TYPES], dtype=float)
+# Friction angles are per soil type, so their tangents are computed once with math like the scalar path
+soil_lookup['tan_friction_angle'] = np.array([math.tan(math.radians(round(soil_thresholds[soil]['friction_angle'], 2)))
+                                              for soil in SOIL_TYPES])
+
+def round_array(values, decimals):
+    """
+    Rounds an array exactly like the built-in round().
+    np.round scales by a power of ten first, which can land on the other side of a .5
+    boundary; the few values that end up next to one are rounded with round() instead.
+    """
+    values = np.asarray(values, dtype=float)
+    scale = 10.0 ** decimals
+    with np.errstate(invalid='ignore'):
+        scaled = values * scale
+        rounded = np.round(scaled) / scale
+        near_half = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6
+    if near_half.any():
+        rounded[near_half] = [round(float(value), decimals) for value in values[near_half]]
+    return rounded
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+class SensorFrame:
+    """
+    Sensor configurations stored as columns for batch evaluation.
+    Configurations with an unknown soil type or missing fields are left out and logged,
+    as the scalar path cannot evaluate them either.
+    """
+
+    def __init__(self, sensor_configs):
+        self.configs = []
+        for config in sensor_configs:
+            if config.get('soil_type') not in soil_thresholds or config.get('id') is None or config.get('name') is None:
+                logging.error(f"Invalid sensor configuration: {config}")
+                continue
+            self.configs.append(config)
+        self.ids = [config['id'] for config in self.configs]
+        self.latitude = np.array([_to_float(config.get('latitude')) for config in self.configs])
+        self.longitude = np.array([_to_float(config.get('longitude')) for config in self.configs])
+        self.soil_code = np.array([SOIL_TYPES.index(config['soil_type']) for config in self.configs], dtype=int)
+
+    def __len__(self):
+        return len(self.configs)
+
+    def soil(self, key):
+        """:return: Soil-specific value for every sensor"""
+        return soil_lookup[key][self.soil_code]
+
+def sample_sensor_readings(frame):
+    """Draw one reading of every metric for every sensor, with the distributions of the generate_* functions."""
+    n = len(frame)
+    return {
+        'rainfall': np.clip(round_array(np.random.normal(loc=100, scale=40, size=n), 2), 0, 300),
+        'forecasted_rainfall': np.clip(round_array(np.random.normal(loc=75, scale=30, size=n), 2), 0, 200),
+        'soil_saturation': round_array(np.random.uniform(frame.soil('saturation_low'), frame.soil('saturation_high')), 2),
+        'slope': np.clip(round_array(np.random.normal(loc=25, scale=10, size=n), 2), 0, 90),
+        'seismic_activity': np.clip(round_array(np.random.normal(loc=3.0, scale=2.0, size=n), 2), 0, 10)
+    }
+
+def validate_sensor_batch(frame, readings):
+    """:return: Boolean array, True where a reading passes validate_sensor_data"""
+    with np.errstate(invalid='ignore'):
+        valid = ((0 <= readings['rainfall']) & (readings['rainfall'] <= 300) &
+                 (0 <= readings['soil_saturation']) & (readings['soil_saturation'] <= 100) &
+                 (0 <= readings['slope']) & (readings['slope'] <= 90) &
+                 (0 <= readings['seismic_activity']) & (readings['seismic_activity'] <= 10) &
+                 (-90 <= frame.latitude) & (frame.latitude <= 90) &
+                 (-180 <= frame.longitude) & (frame.longitude <= 180))
+    for i in np.flatnonzero(~valid):
+        logging.error(f"Invalid sensor data generated for sensor {frame.ids[i]}")
+    return valid
+
+def analyze_trends_batch(sensor_ids):
+    """
+    Vectorized analyze_trends for TREND_METRICS of many sensors.
+    :return: Dictionary of arrays of shape (sensors, len(TREND_METRICS)): 'direction'
+             (1 increasing, -1 decreasing, 0 stable), 'change_rate', 'volatility' and
+             'defined' (False where analyze_trends returns integer zeros)
+    """
+    counts, slopes, means, stds = historical_data.trend_summaries(sensor_ids, TREND_METRICS)
+    means = np.where(np.abs(means) < 1e-9, 0, means)
+    defined = (counts[:, np.newaxis] >= 2) & (means != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change_rate = np.where(defined, slopes / means, 0.0)
+        volatility = np.where(defined, stds / means, 0.0)
+    return {
+        'direction': np.where(change_rate > 0.1, 1, np.where(change_rate < -0.1, -1, 0)),
+        'change_rate': round_array(change_rate, 3),
+        'volatility': round_array(volatility, 3),
+        'defined': defined
+    }
+
+def _trend_factor(trends, increasing_factor, decreasing_factor):
+    """Product of per-metric factors for strong trends, multiplied in TREND_METRICS order."""
+    factor = np.ones(len(trends['direction']))
+    for k in range(len(TREND_METRICS)):
+        increasing = (trends['direction'][:, k] == 1) & (trends['change_rate'][:, k] > 0.2)
+        decreasing = (trends['direction'][:, k] == -1) & (trends['change_rate'][:, k] < -0.2)
+        factor = np.where(increasing, factor * increasing_factor, np.where(decreasing, factor * decreasing_factor, factor))
+    return factor
+
+def calculate_soil_stability_batch(frame, readings):
+    """Vectorized calculate_soil_stability for the soil data built in generate_sensor_data."""
+    saturation = readings['soil_saturation']
+    slope_angle = round_array(readings['slope'], 2)
+    cohesion = round_array(frame.soil('cohesion'), 2)
+    effective_stress = round_array(frame.soil('unit_weight') * 1 * (1 - saturation / 100), 2)
+    pore_pressure = round_array(saturation * 0.1, 2)
+    soil_density = round_array(frame.soil('density'), 2)
+    void_ratio = round_array(frame.soil('base_void_ratio') * (1 + saturation / 100), 2)
+
+    shear_strength = round_array(cohesion + (effective_stress - pore_pressure) * frame.soil('tan_friction_angle'), 2)
+    driving_force = round_array(soil_density * 9.81 * np.sin(np.radians(slope_angle)), 2)
+    resisting_force = round_array(shear_strength * np.cos(np.radians(slope_angle)), 2)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor_of_safety = round_array(np.where(driving_force > 0, resisting_force / driving_force, np.inf), 2)
+        stability_index = (factor_of_safety / 2.0) * (1 - (pore_pressure / effective_stress)) * (1 - (void_ratio / 1.5))
+        stability_index = round_array(np.where(stability_index < 1.0, stability_index, 1.0), 2)
+        pore_pressure_ratio = round_array(np.where(effective_stress > 0, pore_pressure / effective_stress, 0), 2)
+
+    return {
+        'shear_strength': shear_strength,
+        'factor_of_safety': factor_of_safety,
+        'stability_index': stability_index,
+        'driving_force': driving_force,
+        'resisting_force': resisting_force,
+        'pore_pressure_ratio': pore_pressure_ratio
+    }
+
+def evaluate_sensor_batch(frame, readings, current_time=None):
+    """
+    Vectorized calculate_status_and_risk, calculate_landslide_time and soil stability.
+    :param frame: SensorFrame
+    :param readings: Dictionary of metric arrays, as from sample_sensor_readings
+    :param current_time: Time landslide predictions are counted from, defaults to now
+    :return: Dictionary with 'level' (index into STATUS_LEVELS), 'affected_radius',
+             'predicted_landslide_time', 'trends' and 'soil_stability'
+    """
+    current_time = current_time or datetime.datetime.now()
+    n = len(frame)
+    rainfall = readings['rainfall']
+    soil_saturation = readings['soil_saturation']
+    slope = readings['slope']
+    seismic_activity = readings['seismic_activity']
+
+    trends = analyze_trends_batch(frame.ids)
+
+    limits = {key: frame.soil(key) for key in soil_lookup}
+    high = ((rainfall > limits['rainfall_high']) |
+            (soil_saturation > limits['soil_saturation_high']) |
+            (slope > limits['slope_high']) |
+            (seismic_activity > limits['seismic_activity_high']))
+    medium = ~high & (
+        ((limits['rainfall_medium'] <= rainfall) & (rainfall <= limits['rainfall_high'])) |
+        ((limits['soil_saturation_medium'] <= soil_saturation) & (soil_saturation <= limits['soil_saturation_high'])) |
+        ((limits['slope_medium'] <= slope) & (slope <= limits['slope_high'])) |
+        ((limits['seismic_activity_medium'] <= seismic_activity) & (seismic_activity <= limits['seismic_activity_high'])))
+    level = np.where(high, 2, np.where(medium, 1, 0))
+
+    # Affected radius grows with worsening trends
+    risk_multiplier = _trend_factor(trends, 1.2, 0.8)
+    affected_radius = np.zeros(n, dtype=int)
+    affected_radius[high] = (np.random.randint(5000, 10000, size=int(high.sum())) * risk_multiplier[high]).astype(int)
+    affected_radius[medium] = (np.random.randint(1000, 5000, size=int(medium.sum())) * risk_multiplier[medium]).astype(int)
+
+    # Landslide time shrinks with worsening trends
+    adjustment = _trend_factor(trends, 0.8, 1.2)
+    wet = (rainfall > limits['rainfall_high']) & (soil_saturation > limits['soil_saturation_high'])
+    unstable = (slope > limits['slope_high']) & (seismic_activity > limits['seismic_activity_high'])
+    damp = (rainfall > limits['rainfall_medium']) & (soil_saturation > limits['soil_saturation_medium'])
+    cases = [high & wet, high & ~wet & unstable, high & ~wet & ~unstable, medium & damp, medium & ~damp]
+    horizons = [('1h', 'hours', 1), ('24h', 'hours', 24), ('48h', 'hours', 48), ('72h', 'hours', 72), ('7d', 'days', 7)]
+    predicted_landslide_time = ["No immediate risk"] * n
+    labels = {}
+    for case, (label, unit, amount) in zip(cases, horizons):
+        rows = np.flatnonzero(case)
+        for i, offset in zip(rows, (amount * adjustment[rows]).astype(int)):
+            key = (label, int(offset))
+            if key not in labels:
+                predicted_time = current_time + datetime.timedelta(**{unit: int(offset)})
+                labels[key] = f"{label} - {predicted_time.strftime('%d/%m %H:%M')}"
+            predicted_landslide_time[i] = labels[key]
+
+    return {
+        'level': level,
+        'affected_radius': affected_radius,
+        'predicted_landslide_time': predicted_landslide_time,
+        'trends': trends,
+        'soil_stability': calculate_soil_stability_batch(frame, readings)
+    }
+
+def _trend_dicts(trends):
+    """Rebuilds the analyze_trends dictionaries of every sensor from batch trend arrays."""
+    directions = np.array(["decreasing", "stable", "increasing"])[trends['direction'] + 1].tolist()
+    defined = trends['defined'].tolist()
+    change_rates = trends['change_rate'].tolist()
+    volatilities = trends['volatility'].tolist()
+    result = []
+    for i in range(len(directions)):
+        result.append({
+            metric: {
+                "trend": directions[i][k],
+                "change_rate": change_rates[i][k] if defined[i][k] else 0,
+                "volatility": volatilities[i][k] if defined[i][k] else 0
+            }
+            for k, metric in enumerate(TREND_METRICS)
+        })
+    return result
+
+def generate_sensor_data_batch(sensor_configs):
+    """
+    Generate one reading for every configured sensor at once.
+    Produces the same records as calling generate_sensor_data for each configuration,
+    and adds them to the historical data the same way.
+    :param sensor_configs: List of sensor configuration dictionaries
+    :return: List of sensor data dictionaries for the sensors with valid readings
+    """
+    current_time = datetime.datetime.now()
+    timestamp = current_time.isoformat()
+    frame = SensorFrame(sensor_configs)
+    if not len(frame):
+        return []
+
+    readings = sample_sensor_readings(frame)
+    valid = validate_sensor_batch(frame, readings)
+    results = evaluate_sensor_batch(frame, readings, current_time)
+    stability = results['soil_stability']
+
+    rows = np.flatnonzero(valid)
+    levels = results['level'][rows]
+    metrics = {metric: readings[metric][rows].tolist() for metric in readings}
+    affected_radius = results['affected_radius'][rows].tolist()
+    trends = _trend_dicts({key: values[rows] for key, values in results['trends'].items()})
+    stability = {key: values[rows].tolist() for key, values in results['soil_stability'].items()}
+
+    sensors_data = []
+    for j, i in enumerate(rows.tolist()):
+        config = frame.configs[i]
+        status, risk = STATUS_LEVELS[levels[j]]
+        sensors_data.append({
+            "id": config['id'],
+            "name": config['name'],
+            "latitude": config['latitude'],
+            "longitude": config['longitude'],
+            "soil_type": config['soil_type'],
+            "timestamp": timestamp,
+            "rainfall": metrics['rainfall'][j],
+            "forecasted_rainfall": metrics['forecasted_rainfall'][j],
+            "soil_saturation": metrics['soil_saturation'][j],
+            "slope": metrics['slope'][j],
+            "seismic_activity": metrics['seismic_activity'][j],
+            "operational_status": "Active",
+            "status": status,
+            "risk_level": risk,
+            "affected_radius": affected_radius[j],
+            "predicted_landslide_time": results['predicted_landslide_time'][i],
+            "trends": trends[j],
+            "soil_stability": {key: values[j] for key, values in stability.items()},
+            "last_reading": timestamp
+        })
+
+    # Trends above were computed from the history before this reading, as in the scalar path
+    historical_data.append_batch(
+        [sensor_data['id'] for sensor_data in sensors_data],
+        [{field: sensor_data[field] for field in STATIC_FIELDS} for sensor_data in sensors_data],
+        current_time.timestamp(),
+        np.column_stack([readings[metric][rows] if metric in readings else affected_radius
+                         for metric in METRICS]) if len(rows) else np.empty((0, len(METRICS))),
+        np.column_stack([levels, levels])
+    )
+
+    return sensors_data
+
 def save_sensor_data_to_json(sensors_data):
-    """Save sensor data to a JSON file."""
-    output_file = os.path.join('app', 'static', 'data', 'sensor_data.json')
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    
-    with open(output_file, 'w') as f:
-        json.dump(sensors_data, f, indent=4)
+    """Publish sensor data as a new version of sensor_data.json, replacing the file atomically."""
+    return publish_snapshot(sensors_data)
+
+# Status of every sensor as last published, to detect transitions between publishes
+last_published_statuses = None
+
+def load_published_statuses():
+    """Read the sensor statuses currently in sensor_data.json as the last published statuses."""
+    global last_published_statuses
+    try:
+        with open(SENSOR_DATA_FILE, 'r') as f:
+            last_published_statuses = {sensor.get('id'): sensor.get('status') for sensor in json.load(f)}
+    except (FileNotFoundError, json.JSONDecodeError):
+        last_published_statuses = {}
+
+def publish_status_transitions(sensors_data):
+    """
+    Publish a status_change event for every sensor whose status changed since the last publish.
+    New sensors only produce an event when they are not Normal.
+    :param sensors_data: List of sensor data dictionaries that was just published
+    :return: Number of events published
+    """
+    global last_published_statuses
+    if last_published_statuses is None:
+        load_published_statuses()
+
+    events = []
+    for sensor_data in sensors_data:
+        previous_status = last_published_statuses.get(sensor_data['id'])
+        if sensor_data['status'] != previous_status and (previous_status is not None or sensor_data['status'] != 'Normal'):
+            events.append((SENSOR_CHANNEL, 'status_change',
+                           {'sensor': sensor_data, 'previous_status': previous_status}))
+    last_published_statuses = {sensor_data['id']: sensor_data['status'] for sensor_data in sensors_data}
+
+    try:
+        publish_events(events)
+    except OSError as e:
+        logging.error(f"Error publishing sensor status changes: {str(e)}")
+        return 0
+    return len(events)
 
 def load_sensor_configs():
     """Load sensor configurations from JSON file."""
@@ -481,155 +798,77 @@ def save_sensor_configs(configs):
         json.dump(configs, f, indent=4)
 
 def save_historical_data():
-    """Save historical data to a JSON file."""
-    output_file = os.path.join('app', 'static', 'data', 'historical_data.json')
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    
-    serializable_data = {}
-    for sensor_id, data in historical_data.items():
-        serializable_data[sensor_id] = data
-    
-    with open(output_file, 'w') as f:
-        json.dump(serializable_data, f, indent=4)
+    """Append the readings added since the last save to the history segments."""
+    written = history_segments.append(historical_data.infos(), *historical_data.take_unsaved())
+    logging.debug(f"Appended {written} readings to {HISTORY_DIR}")
 
 def load_historical_data():
-    """Load historical data from JSON file."""
+    """Load historical data from the history segments, importing historical_data.json on first run."""
+    if not history_segments.exists():
+        import_historical_json()
+        return
+
+    try:
+        historical_data.load_records(*history_segments.load())
+    except Exception as e:
+        print(f"Unexpected error loading historical data: {e}")
+
+def import_historical_json():
+    """One-time import of historical_data.json into the history segments."""
     input_file = os.path.join('app', 'static', 'data', 'historical_data.json')
     
     # Check if file exists
     if not os.path.exists(input_file):
         print(f"Historical data file not found: {input_file}")
-        # Create an empty file with valid JSON
-        os.makedirs(os.path.dirname(input_file), exist_ok=True)
-        with open(input_file, 'w') as f:
-            json.dump({}, f)
         return
     
     # Check if file is empty
     if os.path.getsize(input_file) == 0:
         print(f"Historical data file is empty: {input_file}")
-        # Initialize with empty JSON object
-        with open(input_file, 'w') as f:
-            json.dump({}, f)
         return
     
     try:
         with open(input_file, 'r') as f:
-            data = json.load(f)
-            for sensor_id, sensor_data in data.items():
-                historical_data[sensor_id] = sensor_data
+            historical_data.load_json(json.load(f))
+        save_historical_data()
+        logging.info(f"Imported {input_file} into {HISTORY_DIR}")
     except json.JSONDecodeError as e:
         print(f"Error decoding JSON from {input_file}: {e}")
-        # Reset the file with valid JSON
-        with open(input_file, 'w') as f:
-            json.dump({}, f)
     except Exception as e:
-        print(f"Unexpected error loading historical data: {e}")
-
-def calculate_confusion_matrix(y_true, y_pred):
-    """Calculate and visualize confusion matrix."""
-    cm = confusion_matrix(y_true, y_pred)
-    
-    # Calculate metrics
-    accuracy = accuracy_score(y_true, y_pred)
-    precision = precision_score(y_true, y_pred, average='weighted')
-    recall = recall_score(y_true, y_pred, average='weighted')
-    f1 = f1_score(y_true, y_pred, average='weighted')
-    
-    # Create classification report
-    report = classification_report(y_true, y_pred)
-    
-    # Calculate percentages for confusion matrix
-    cm_percentage = cm.astype('float') / cm.sum(axis=1)[:, np.newaxis]
-    
-    # Create visualization
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(cm_percentage, annot=True, fmt='.2%', cmap='Blues',
-                xticklabels=['No Landslide', 'Landslide'],
-                yticklabels=['No Landslide', 'Landslide'])
-    plt.title('Confusion Matrix (Percentage)')
-    plt.ylabel('True Label')
-    plt.xlabel('Predicted Label')
-    
-    # Save the plot
-    plt.savefig('app/static/data/confusion_matrix.png')
-    plt.close()
-    
-    return {
-        'matrix': cm.tolist(),
-        'matrix_percentage': cm_percentage.tolist(),
-        'metrics': {
-            'accuracy': round(accuracy, 4),
-            'precision': round(precision, 4),
-            'recall': round(recall, 4),
-            'f1_score': round(f1, 4)
-        },
-        'report': report
-    }
+        print(f"Unexpected error importing historical data: {e}")
 
 def evaluate_predictions(historical_data):
-    """Evaluate prediction accuracy using historical data."""
-    # Check if there's any data to evaluate
-    if not historical_data:
-        print("No historical data available for evaluation")
-        return {
-            'matrix': [[0, 0], [0, 0]],
-            'matrix_percentage': [[0, 0], [0, 0]],
-            'metrics': {
-                'accuracy': 0,
-                'precision': 0,
-                'recall': 0,
-                'f1_score': 0
-            },
-            'report': "No data available for evaluation"
-        }
-    
-    # Prepare data
-    y_true = []
-    y_pred = []
-    
-    for sensor_id, data in historical_data.items():
-        for reading in data:
-            # True label (actual landslide occurrence)
-            true_label = 1 if reading.get('status') in ['Alert', 'Warning'] else 0
-            
-            # Predicted label (based on risk assessment)
-            predicted_label = 1 if reading.get('risk_level') in ['High', 'Medium'] else 0
-            
-            y_true.append(true_label)
-            y_pred.append(predicted_label)
-    
-    # Check if we have any predictions to evaluate
-    if not y_true or not y_pred:
-        print("No predictions available for evaluation")
-        return {
-            'matrix': [[0, 0], [0, 0]],
-            'matrix_percentage': [[0, 0], [0, 0]],
-            'metrics': {
-                'accuracy': 0,
-                'precision': 0,
-                'recall': 0,
-                'f1_score': 0
-            },
-            'report': "No predictions available for evaluation"
-        }
-    
-    # Calculate confusion matrix and metrics
-    evaluation = calculate_confusion_matrix(y_true, y_pred)
-    
-    # Save evaluation results
-    output_file = os.path.join('app', 'static', 'data', 'evaluation_results.json')
-    with open(output_file, 'w') as f:
-        json.dump(evaluation, f, indent=4)
-    
-    return evaluation
+    """
+    Evaluate prediction accuracy using historical data.
+    scikit-learn and matplotlib are only imported here, by the sensor service, so web
+    workers importing this module for the sensor math do not load them.
+    """
+    try:
+        from app.sensor_evaluation import evaluate_predictions as evaluate
+    except ImportError:
+        from sensor_evaluation import evaluate_predictions as evaluate
+    return evaluate(historical_data)
+
+def setup_logging():
+    """Logs to the service log file and the console; only the sensor service calls this."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(SERVICE_LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
 
 def main():
     """Main function to continuously generate and save sensor data."""
+    setup_logging()
     logging.info("Starting sensor data generation service...")
     
     # Load historical data
     load_historical_data()
+    # Status changes are detected against what the previous run published
+    load_published_statuses()
     
     # Run initial evaluation
     evaluation = evaluate_predictions(historical_data)
@@ -646,17 +885,19 @@ def main():
                 time.sleep(60)  # Wait for 1 minute before checking again
                 continue
             
-            # Generate data for each sensor
-            sensors_data = []
-            for config in sensor_configs:
-                sensor_data = generate_sensor_data(config)
-                if sensor_data:
-                    sensors_data.append(sensor_data)
-                    logging.info(f"Generated data for sensor {config['id']}: {sensor_data['status']} - {sensor_data['risk_level']}")
+            # Generate data for all sensors in one batch
+            sensors_data = generate_sensor_data_batch(sensor_configs)
+            if sensors_data:
+                counts = {status: 0 for status, _ in STATUS_LEVELS}
+                for sensor_data in sensors_data:
+                    counts[sensor_data['status']] += 1
+                logging.info(f"Generated data for {len(sensors_data)} sensors: " +
+                             ", ".join(f"{count} {status}" for status, count in counts.items()))
             
             # Save the generated data
             if sensors_data:
                 save_sensor_data_to_json(sensors_data)
+                publish_status_transitions(sensors_data)
                 save_historical_data()
                 
                 # Evaluate predictions every 5 minutes
@@ -1,8 +1,9 @@
 from datetime import datetime
 from flask import jsonify
-from sqlalchemy import func
+from sqlalchemy import and_, func, or_
 from werkzeug.security import generate_password_hash
-from .models import Camp, CampNotification, Donation, DonationAmount, UserActivity, Volunteer, User, VolunteerHistory, VolunteerRole , Thread, Reply, db, Vehicle
+from .queries import camps_with_heads, threads_with_replies
+from .models import Camp, CampNotification, CampOccupant, Donation, DonationAmount, UserActivity, Volunteer, User, VolunteerHistory, VolunteerRole , Thread, Reply, db, Vehicle
 
 
 def get_table_count():
@@ -33,7 +34,6 @@ class CampManager:
                 num_people_present=0,  # Default value
                 food_stock_quota=0,  # Default value
                 water_stock_litres=0,  # Default value
-                people_list=[],  # Default empty list
             )
             
             db.session.add(new_camp)
@@ -88,7 +88,7 @@ class CampManager:
                 "essentials_stock": camp.essentials_stock if hasattr(camp, 'essentials_stock') else 0,
                 "essentials_capacity": camp.essentials_capacity,
                 "contact_number": camp.contact_number,
-                "people_list": camp.people_list
+                "people_list": CampManager.get_occupants(cid)
             }
         raise CampNotFound(f"Camp with ID {cid} not found.")
 
@@ -103,6 +103,47 @@ class CampManager:
                     "mobile":person.mobile
                 } for person in people]
 
+    @staticmethod
+    def get_occupants(camp_id):
+        """
+        Retrieve the people admitted to a camp, in order of admission.
+        """
+        occupants = CampOccupant.query.filter_by(camp_id=camp_id).order_by(CampOccupant.id).all()
+        return [occupant.to_dict() for occupant in occupants]
+
+    @staticmethod
+    def admit_people(camp, name, phone=None, uid=None, count=1):
+        """
+        Add `count` occupants with the same details to a camp and update its occupancy.
+        The caller commits.
+        """
+        db.session.add_all([CampOccupant(camp_id=camp.cid, uid=uid, name=name, phone=phone) for _ in range(count)])
+        db.session.flush()
+        CampManager.refresh_occupancy(camp)
+
+    @staticmethod
+    def remove_occupants(camp, people):
+        """
+        Remove the occupants of a camp matching any of the given name and phone pairs and
+        update its occupancy. The caller commits.
+        :param people: List of dictionaries with 'name' and 'phone'
+        :return: Number of occupants removed
+        """
+        removed = CampOccupant.query.filter(
+            CampOccupant.camp_id == camp.cid,
+            or_(*[and_(CampOccupant.name == person.get('name'), CampOccupant.phone == person.get('phone'))
+                  for person in people])
+        ).delete(synchronize_session=False)
+        CampManager.refresh_occupancy(camp)
+        return removed
+
+    @staticmethod
+    def refresh_occupancy(camp):
+        """
+        Set a camp's current_occupancy to its number of occupants.
+        """
+        camp.current_occupancy = camp.num_people_present
+
     
     @staticmethod
     def update_camp_data(cid, **kwargs):
@@ -126,7 +167,7 @@ class CampManager:
         """
         Retrieve a list of all camps.
         """
-        camps = Camp.query.all()
+        camps = camps_with_heads()
         return [
             {
                 "cid": camp.cid,
@@ -146,8 +187,7 @@ class CampManager:
                 } if camp.camp_head else None,
                 "coordinates_lat": camp.coordinates_lat,
                 "coordinates_lng": camp.coordinates_lng,
-                "contact_number": camp.contact_number,
-                "people_list": camp.people_list
+                "contact_number": camp.contact_number
             }
             for camp in camps
         ]
@@ -422,7 +462,7 @@ class ForumManager:
         """
         Retrieve all threads.
         """
-        threads = Thread.query.order_by(Thread.timestamp.desc()).all()
+        threads = threads_with_replies()
         return [
             {
                 "tid": thread.tid,
@@ -434,7 +474,7 @@ class ForumManager:
                         "reply_id": reply.rid,
                         "content": reply.content,
                         "user_id": reply.user_id,
-                        "username": (User.query.get(reply.user_id).username if User.query.get(reply.user_id) else ''),
+                        "username": reply.user.username if reply.user else '',
                         "timestamp": reply.timestamp.strftime("%Y-%m-%d %H:%M:%S")
                     }
                     for reply in thread.replies
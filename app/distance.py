@@ -0,0 +1,162 @@
+import numpy as np
+
+# Mean earth radius used by the haversine formula
+EARTH_RADIUS_KM = 6371.0088
+
+# WGS-84 ellipsoid used by the Vincenty formula
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+
+def coordinate_array(points):
+    """
+    Converts a sequence of (latitude, longitude) pairs into a float array and a validity mask.
+    A point is valid when both values are numbers, the latitude is between -90 and 90
+    and the longitude is between -180 and 180.
+    :param points: Sequence of (latitude, longitude) or an (N, 2) array
+    :return: (array of shape (N, 2) with NaN for invalid points, boolean mask of valid points)
+    """
+    try:
+        array = np.asarray(points) if len(points) else np.empty((0, 2))
+    except ValueError:
+        # Ragged input cannot become a 2-D array
+        array = np.empty(0, dtype=object)
+    if array.ndim == 2 and array.shape[1] == 2 and array.dtype.kind in 'iuf':
+        coords = array.astype(float)
+    else:
+        # Mixed input (None, strings, ragged pairs): check each point like the single-pair code does
+        coords = np.full((len(points), 2), np.nan)
+        for i, point in enumerate(points):
+            try:
+                if len(point) == 2 and all(isinstance(x, (int, float)) for x in point):
+                    coords[i] = point
+            except TypeError:
+                continue
+
+    valid = (
+        np.isfinite(coords).all(axis=1) &
+        (coords[:, 0] >= -90) & (coords[:, 0] <= 90) &
+        (coords[:, 1] >= -180) & (coords[:, 1] <= 180)
+    )
+    coords[~valid] = np.nan
+    return coords, valid
+
+def _haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in kilometers between broadcastable arrays of radians."""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def _vincenty(lat1, lng1, lat2, lng2, max_iterations=50, tolerance=1e-12):
+    """
+    WGS-84 distance in kilometers between broadcastable arrays of radians using the
+    Vincenty inverse formula. Pairs that do not converge (nearly antipodal points)
+    fall back to the haversine distance.
+    """
+    L = lng2 - lng1
+    U1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+    sin_U1, cos_U1 = np.sin(U1), np.cos(U1)
+    sin_U2, cos_U2 = np.sin(U2), np.cos(U2)
+
+    lam = L
+    converged = False
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt((cos_U2 * sin_lam) ** 2 +
+                                (cos_U1 * sin_U2 - sin_U1 * cos_U2 * cos_lam) ** 2)
+            cos_sigma = sin_U1 * sin_U2 + cos_U1 * cos_U2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_U1 * cos_U2 * sin_lam / sin_sigma)
+            cos_sq_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos_sq_alpha == 0
+            cos_2sigma_m = np.where(cos_sq_alpha == 0, 0.0, cos_sigma - 2 * sin_U1 * sin_U2 / cos_sq_alpha)
+            C = WGS84_F / 16 * cos_sq_alpha * (4 + WGS84_F * (4 - 3 * cos_sq_alpha))
+            previous = lam
+            lam = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+            converged = np.abs(lam - previous) < tolerance
+            if np.all(converged):
+                break
+
+        u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) -
+            B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        ))
+        distances = WGS84_B * A * (sigma - delta_sigma) / 1000
+
+    if not np.all(converged):
+        distances = np.where(converged, distances, _haversine(lat1, lng1, lat2, lng2))
+    return distances
+
+def _matrix_radians(origins, destinations):
+    """Splits origins into column vectors and destinations into row vectors of radians."""
+    origin_rad = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+    destination_rad = np.radians(np.asarray(destinations, dtype=float).reshape(-1, 2))
+    return (origin_rad[:, 0][:, np.newaxis], origin_rad[:, 1][:, np.newaxis],
+            destination_rad[:, 0][np.newaxis, :], destination_rad[:, 1][np.newaxis, :])
+
+def haversine_matrix(origins, destinations):
+    """
+    Calculates great-circle distances between every origin and destination.
+    :param origins: (N, 2) array of (latitude, longitude) in degrees
+    :param destinations: (M, 2) array of (latitude, longitude) in degrees
+    :return: (N, M) array of distances in kilometers
+    """
+    return _haversine(*_matrix_radians(origins, destinations))
+
+def vincenty_matrix(origins, destinations):
+    """
+    Calculates ellipsoidal (WGS-84) distances between every origin and destination.
+    :param origins: (N, 2) array of (latitude, longitude) in degrees
+    :param destinations: (M, 2) array of (latitude, longitude) in degrees
+    :return: (N, M) array of distances in kilometers
+    """
+    return np.broadcast_to(_vincenty(*_matrix_radians(origins, destinations)),
+                           (len(origins), len(destinations))).copy()
+
+def straight_line_distance_matrix(origins, destinations, method='haversine'):
+    """
+    Calculates straight-line distances between every origin and destination.
+    Pairs involving an invalid coordinate get a distance of 0, matching
+    calculate_straight_line_distance.
+    :param origins: Sequence of (latitude, longitude) for the starting points
+    :param destinations: Sequence of (latitude, longitude) for the ending points
+    :param method: 'haversine' (spherical, fastest) or 'vincenty' (WGS-84 ellipsoid)
+    :return: (N, M) array of distances in kilometers rounded to 2 decimals
+    """
+    origin_coords, origin_valid = coordinate_array(origins)
+    destination_coords, destination_valid = coordinate_array(destinations)
+    distances = np.zeros((len(origin_coords), len(destination_coords)))
+    if not origin_valid.any() or not destination_valid.any():
+        return distances
+
+    formula = vincenty_matrix if method == 'vincenty' else haversine_matrix
+    distances[np.ix_(origin_valid, destination_valid)] = formula(
+        origin_coords[origin_valid], destination_coords[destination_valid]
+    )
+    return np.round(distances, 2)
+
+def pairwise_distances(origins, destinations, method='haversine'):
+    """
+    Calculates the distance between each origin and the destination at the same index.
+    :param origins: Sequence of (latitude, longitude)
+    :param destinations: Sequence of (latitude, longitude), same length as origins
+    :return: Array of distances in kilometers rounded to 2 decimals (0 for invalid pairs)
+    """
+    origin_coords, origin_valid = coordinate_array(origins)
+    destination_coords, destination_valid = coordinate_array(destinations)
+    valid = origin_valid & destination_valid
+    distances = np.zeros(len(origin_coords))
+    if not valid.any():
+        return distances
+
+    formula = _vincenty if method == 'vincenty' else _haversine
+    lat1, lng1 = np.radians(origin_coords[valid]).T
+    lat2, lng2 = np.radians(destination_coords[valid]).T
+    distances[valid] = formula(lat1, lng1, lat2, lng2)
+    return np.round(distances, 2)
@@ -0,0 +1,255 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from flask import Response
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; publishing is then only safe from one process at a time
+    fcntl = None
+
+# Events are appended to one log file shared by the sensor service and every web worker
+EVENT_LOG_FILE = os.environ.get('EVENT_LOG_FILE') or os.path.join('instance', 'events.jsonl')
+EVENT_LOG_MAX_BYTES = int(os.environ.get('EVENT_LOG_MAX_BYTES') or 1024 * 1024)  # rotated to .1 beyond this
+EVENT_POLL_INTERVAL = float(os.environ.get('EVENT_POLL_INTERVAL') or 0.5)  # in seconds
+EVENT_HEARTBEAT = int(os.environ.get('EVENT_HEARTBEAT') or 15)  # in seconds
+SENSOR_CHANNEL = 'sensors'  # status changes published by the sensor service
+RECENT_EVENTS = 1000  # events kept per worker for clients resuming with Last-Event-ID
+SUBSCRIBER_QUEUE_SIZE = 100
+
+def publish_events(events, path=EVENT_LOG_FILE, max_bytes=EVENT_LOG_MAX_BYTES):
+    """
+    Appends events to the event log, giving each a new id.
+    The lock file next to the log holds the last id, so ids keep increasing across
+    processes and log rotations.
+    :param events: List of (channel, event type, data) tuples
+    :return: List of the ids given to the events
+    """
+    if not events:
+        return []
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.lock', 'a+') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            lock.seek(0)
+            last_id = int(lock.read().strip() or 0)
+            if os.path.exists(path) and os.path.getsize(path) > max_bytes:
+                os.replace(path, path + '.1')
+
+            ids = []
+            lines = []
+            for channel, event_type, data in events:
+                last_id += 1
+                ids.append(last_id)
+                lines.append(json.dumps({'id': last_id, 'channel': channel, 'type': event_type,
+                                         'data': data, 'time': time.time()}, separators=(',', ':')))
+            with open(path, 'a') as f:
+                f.write('\n'.join(lines) + '\n')
+
+            lock.seek(0)
+            lock.truncate()
+            lock.write(str(last_id))
+            lock.flush()
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    return ids
+
+def publish_event(channel, event_type, data, path=EVENT_LOG_FILE):
+    """
+    Appends one event to the event log.
+    :return: The id of the event
+    """
+    return publish_events([(channel, event_type, data)], path)[0]
+
+def publish_committed(events):
+    """
+    Publishes events about changes that are already committed to the database.
+    A failure is only logged, since clients can still see the change by fetching it.
+    :param events: List of (channel, event type, data) tuples
+    """
+    try:
+        publish_events(events)
+    except OSError as e:
+        print(f"Error publishing events: {str(e)}")
+
+def camp_channel(camp_id):
+    """Channel of a camp's manager: vehicle dispatch and rejection notifications, new slot requests."""
+    return f'camp:{camp_id}'
+
+def announcement_channel(camp_id):
+    """Channel of a camp's announcements, shown to users viewing the camp."""
+    return f'announcements:{camp_id}'
+
+def warehouse_channel(warehouse_id):
+    """Channel of a warehouse's manager: resource requests assigned to the warehouse."""
+    return f'warehouse:{warehouse_id}'
+
+class Subscription:
+    """Events of some channels delivered to one connected client."""
+
+    def __init__(self, channels):
+        self.channels = set(channels)
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # A client this far behind reconnects and resumes from its Last-Event-ID
+            self.closed = True
+
+class EventBroker:
+    """
+    Fans out events from the event log to the subscribers of one worker process.
+    A single background thread follows the log, so the cost per worker depends on
+    the number of events and not on the number of connected clients. It is started
+    on the first subscription, so processes that only publish never start it.
+    The log must not be rotated twice within one poll interval, or events are missed.
+    """
+
+    def __init__(self, path=EVENT_LOG_FILE, poll_interval=EVENT_POLL_INTERVAL, recent=RECENT_EVENTS):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._recent = deque(maxlen=recent)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._file = None
+        self._inode = None
+
+    def subscribe(self, channels, last_event_id=None):
+        """
+        Registers a subscriber for some channels.
+        :param last_event_id: Id of the last event the client received, to replay the ones after it
+        :return: (Subscription, list of replayed events)
+        """
+        self._start()
+        subscription = Subscription(channels)
+        with self._lock:
+            self._subscribers.add(subscription)
+            replay = []
+            if last_event_id is not None:
+                replay = [event for event in self._recent
+                          if event['id'] > last_event_id and event['channel'] in subscription.channels]
+        return subscription, replay
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                # Events already in the log are only kept for replay, not delivered
+                self._open()
+                self._recent.extend(self._read())
+                self._thread = threading.Thread(target=self._run, name='event-broker', daemon=True)
+                self._thread.start()
+
+    def _open(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._inode = None
+        try:
+            self._file = open(self.path, 'r')
+            self._inode = os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            pass
+
+    def _read(self):
+        """:return: Complete events appended to the log since the last read"""
+        events = []
+        if self._file is None:
+            return events
+        while True:
+            position = self._file.tell()
+            line = self._file.readline()
+            if not line:
+                break
+            if not line.endswith('\n'):
+                # Partly written line, read it again once it is complete
+                self._file.seek(position)
+                break
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                print(f"Skipping malformed event in {self.path}: {e}")
+        return events
+
+    def _rotated(self):
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return False
+
+    def _run(self):
+        while True:
+            try:
+                events = self._read()
+                if self._file is None or self._rotated():
+                    # Finish the old file before following the new one from its start
+                    events += self._read()
+                    self._open()
+                    events += self._read()
+                if events:
+                    self._dispatch(events)
+            except Exception as e:
+                print(f"Error following event log {self.path}: {str(e)}")
+            time.sleep(self.poll_interval)
+
+    def _dispatch(self, events):
+        # Under the lock, so a new subscriber gets each event either replayed or dispatched
+        with self._lock:
+            self._recent.extend(events)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            for event in events:
+                if event['channel'] in subscription.channels:
+                    subscription.put(event)
+
+def format_event(event):
+    """:return: An event in Server-Sent Events wire format"""
+    data = json.dumps(event['data'], separators=(',', ':'))
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+def stream_response(channels, last_event_id=None, broker=None, heartbeat=EVENT_HEARTBEAT):
+    """
+    Streams events of some channels as text/event-stream until the client disconnects.
+    :param last_event_id: Value of the Last-Event-ID header, if the client is resuming
+    """
+    broker = broker or _broker
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    subscription, replay = broker.subscribe(channels, last_event_id)
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            for event in replay:
+                yield format_event(event)
+            while not subscription.closed:
+                try:
+                    event = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield format_event(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+_broker = EventBroker()
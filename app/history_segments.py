@@ -0,0 +1,211 @@
+import glob
+import json
+import os
+import re
+import numpy as np
+
+try:
+    from app.sensor_history import METRICS
+except ImportError:
+    # Running as a script (python app/data.py) puts app/ itself on the path
+    from sensor_history import METRICS
+
+FORMAT_VERSION = 1
+# One packed binary record per reading; sensors are stored by their position in the index file
+RECORD_DTYPE = np.dtype([
+    ('sensor', '<i4'),
+    ('timestamp', '<f8'),
+    ('values', '<f8', (len(METRICS),)),
+    ('status', 'i1'),
+    ('risk', 'i1')
+])
+INDEX_FILE = 'index.json'
+SEGMENT_PATTERN = re.compile(r'^segment-(\d{6})\.bin$')
+SEGMENT_ROWS = 100000  # records per segment before starting a new one
+
+class SegmentStore:
+    """
+    Append-only store of sensor readings split into numbered binary segment files.
+    Every save appends only the new records to the newest segment. Loading memory-maps
+    segments from newest to oldest and stops once every sensor has `retention` readings.
+    Once the segments hold twice as many records as are retained, compaction rewrites
+    the retained readings into one new segment, so its cost stays proportional to the
+    records appended since the previous compaction. The index file records the first
+    segment still in use, so a crash part way through never exposes a reading twice.
+    """
+
+    def __init__(self, directory, retention, segment_rows=SEGMENT_ROWS):
+        self.directory = directory
+        self.retention = retention
+        self.segment_rows = segment_rows
+        self._index = None
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.directory, INDEX_FILE))
+
+    def _read_index(self):
+        if self._index is None:
+            path = os.path.join(self.directory, INDEX_FILE)
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    self._index = json.load(f)
+                if self._index.get('version') != FORMAT_VERSION or self._index.get('metrics') != list(METRICS):
+                    raise ValueError(f"Unsupported history segment format in {self.directory}")
+            else:
+                self._index = {'version': FORMAT_VERSION, 'metrics': list(METRICS), 'first_segment': 1, 'sensors': []}
+            self._positions = {sensor['id']: i for i, sensor in enumerate(self._index['sensors'])}
+        return self._index
+
+    def _write_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, INDEX_FILE)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self._index, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    def _segments(self):
+        """:return: Sorted list of (number, path) of segments in use"""
+        first = self._read_index()['first_segment']
+        segments = []
+        for path in glob.glob(os.path.join(self.directory, 'segment-*.bin')):
+            match = SEGMENT_PATTERN.match(os.path.basename(path))
+            if match and int(match.group(1)) >= first:
+                segments.append((int(match.group(1)), path))
+        return sorted(segments)
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f'segment-{number:06d}.bin')
+
+    def _map(self, path):
+        """Memory-maps the complete records of a segment, ignoring a partly written last record."""
+        rows = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        if rows == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(rows,))
+
+    def append(self, infos, sensor_ids, seconds, values, codes):
+        """
+        Appends readings to the newest segment.
+        :param infos: Dictionary of sensor id to static fields; stored when new or changed
+        :param sensor_ids: Sensor id of each reading
+        :param seconds: Array (n,) of POSIX timestamps
+        :param values: Array (n, len(METRICS))
+        :param codes: Array (n, 2) of status and risk codes
+        :return: Number of records written
+        """
+        index = self._read_index()
+        if len(sensor_ids) == 0:
+            return 0
+
+        # New sensors and changed static fields go into the index before any record refers to them
+        index_changed = False
+        for key in dict.fromkeys(sensor_ids):
+            info = infos.get(key, {})
+            position = self._positions.get(key)
+            if position is None:
+                self._positions[key] = len(index['sensors'])
+                index['sensors'].append({'id': key, 'info': info})
+                index_changed = True
+            elif index['sensors'][position]['info'] != info:
+                index['sensors'][position]['info'] = info
+                index_changed = True
+        if index_changed or not self.exists():
+            self._write_index()
+
+        records = np.empty(len(sensor_ids), dtype=RECORD_DTYPE)
+        records['sensor'] = [self._positions[key] for key in sensor_ids]
+        records['timestamp'] = seconds
+        records['values'] = values
+        records['status'] = np.asarray(codes)[:, 0]
+        records['risk'] = np.asarray(codes)[:, 1]
+
+        segments = self._segments()
+        number, path = segments[-1] if segments else (index['first_segment'], self._segment_path(index['first_segment']))
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size // RECORD_DTYPE.itemsize >= self.segment_rows:
+            number, path, size = number + 1, self._segment_path(number + 1), 0
+            segments.append((number, path))
+
+        with open(path, 'ab') as f:
+            # Drop a record left half written by an interrupted save
+            if size % RECORD_DTYPE.itemsize:
+                f.truncate(size - size % RECORD_DTYPE.itemsize)
+            f.write(records.tobytes())
+
+        if len(segments) > 1:
+            stored = sum(os.path.getsize(segment_path) for _, segment_path in segments) // RECORD_DTYPE.itemsize
+            if stored > 2 * max(self.retention * len(index['sensors']), self.segment_rows):
+                self.compact()
+        return len(records)
+
+    def _retained(self):
+        """
+        Reads segments from newest to oldest until every sensor has `retention` readings.
+        :return: Structured array of the records read, oldest first
+        """
+        sensor_count = len(self._read_index()['sensors'])
+        counts = np.zeros(sensor_count, dtype=int)
+        parts = []
+        for _, path in reversed(self._segments()):
+            records = self._map(path)
+            parts.append(records)
+            counts += np.bincount(records['sensor'], minlength=sensor_count)[:sensor_count]
+            if sensor_count and counts.min() >= self.retention:
+                break
+        if not parts:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.concatenate(parts[::-1])
+
+    def load(self):
+        """
+        Loads the newest `retention` readings of every sensor.
+        :return: (infos, sensor ids, timestamps, values, codes) as accepted by SensorHistoryStore.load_records
+        """
+        index = self._read_index()
+        records = self._retained()
+        keys = np.array([sensor['id'] for sensor in index['sensors']] or [''], dtype=object)
+        infos = {sensor['id']: sensor['info'] for sensor in index['sensors']}
+        return (
+            infos,
+            keys[records['sensor']],
+            np.array(records['timestamp']),
+            np.array(records['values']),
+            np.column_stack([records['status'], records['risk']])
+        )
+
+    def compact(self):
+        """Rewrites the retained readings into one new segment and deletes the older segments."""
+        index = self._read_index()
+        segments = self._segments()
+        if not segments:
+            return
+        records = self._retained()
+
+        # Keep only the newest `retention` records of each sensor
+        keep = np.zeros(len(records), dtype=bool)
+        order = np.argsort(records['sensor'], kind='stable')
+        sensors = records['sensor'][order]
+        bounds = np.flatnonzero(np.diff(sensors)) + 1
+        for group in np.split(order, bounds):
+            keep[group[-self.retention:]] = True
+        records = records[keep]
+
+        number = segments[-1][0] + 1
+        path = self._segment_path(number)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+        index['first_segment'] = number
+        self._write_index()
+        for _, old_path in segments:
+            try:
+                os.remove(old_path)
+            except OSError as e:
+                print(f"Could not remove history segment {old_path}: {e}")
@@ -46,6 +46,9 @@ class User(UserMixin, db.Model):
 
 class Camp(db.Model):
     __tablename__ = 'camps'
+    __table_args__ = (
+        db.Index('ix_camps_camp_head_id', 'camp_head_id'),
+    )
     
     cid = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -69,23 +72,62 @@ class Camp(db.Model):
     coordinates_lat = db.Column(db.Float, nullable=False)
     coordinates_lng = db.Column(db.Float, nullable=False)
     contact_number = db.Column(db.String(20))
-    people_list = db.Column(db.String(1000), default='')  # Changed to String with larger size
     
     # Relationships
     camp_head = db.relationship('User', backref='managed_camp', foreign_keys=[camp_head_id])
+    occupants = db.relationship('CampOccupant', backref='camp', cascade='all, delete-orphan', lazy=True)
     
     @hybrid_property
     def num_people_present(self):
-        if not self.people_list:
-            return 0
-        return len(self.people_list.split('|')) if self.people_list else 0
+        """
+        Number of people admitted to the camp. Reading it on a camp runs a COUNT query,
+        so do not read it for every camp of a list; select Camp.num_people_present in
+        the list query instead, which adds it as a subquery.
+        """
+        # Counted with the camp_id index instead of loading the occupants
+        return db.session.query(func.count(CampOccupant.id)).filter(CampOccupant.camp_id == self.cid).scalar()
+
+    @num_people_present.expression
+    def num_people_present(cls):
+        return db.select(func.count(CampOccupant.id)).where(CampOccupant.camp_id == cls.cid).scalar_subquery()
     
     def __repr__(self):
         return f'<Camp {self.name}>'
 
 
+class CampOccupant(db.Model):
+    """One person admitted to a camp."""
+    __tablename__ = 'camp_occupants'
+    __table_args__ = (
+        db.Index('ix_camp_occupants_camp_phone', 'camp_id', 'phone'),
+        db.Index('ix_camp_occupants_camp_uid', 'camp_id', 'uid'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    camp_id = db.Column(db.Integer, db.ForeignKey('camps.cid', ondelete='CASCADE'), nullable=False)
+    uid = db.Column(db.Integer, db.ForeignKey('users.uid'))  # set when a registered user was added
+    name = db.Column(db.String(100), nullable=False)
+    phone = db.Column(db.String(20))
+    entry_date = db.Column(db.DateTime, default=datetime.now)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'uid': self.uid,
+            'name': self.name,
+            'phone': self.phone,
+            'entry_date': self.entry_date.strftime('%Y-%m-%d %H:%M:%S') if self.entry_date else None
+        }
+
+    def __repr__(self):
+        return f'<CampOccupant {self.name} in camp {self.camp_id}>'
+
+
 class CampNotification(db.Model):
     __tablename__ = 'camp_notifications'
+    __table_args__ = (
+        db.Index('ix_camp_notifications_camp_created', 'camp_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     camp_id = db.Column(db.Integer, db.ForeignKey('camps.cid'), nullable=False)
@@ -177,6 +219,8 @@ class Reply(db.Model):
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+    user = db.relationship('User', lazy=True)
+
 
 class Feedback(db.Model):
     fid = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -228,6 +272,9 @@ class DonationAmount(db.Model):
 
 class UserActivity(db.Model):
     __tablename__ = 'user_activity'
+    __table_args__ = (
+        db.Index('ix_user_activity_user_timestamp', 'user_id', 'timestamp'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(
@@ -263,6 +310,9 @@ class RecentActivity(db.Model):
 
 class Warehouse(db.Model):
     __tablename__ = 'warehouses'
+    __table_args__ = (
+        db.Index('ix_warehouses_manager_id', 'manager_id'),
+    )
     
     wid = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -316,8 +366,59 @@ class Sensor(db.Model):
         return f'<Sensor {self.name}>'
 
 
+class SensorReading(db.Model):
+    """One reading received from a field sensor through the ingestion API."""
+    __tablename__ = 'sensor_readings'
+    __table_args__ = (
+        # Range scans over one sensor's readings
+        db.Index('ix_sensor_readings_sensor_time', 'sensor_id', 'timestamp'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    sensor_id = db.Column(db.Integer, db.ForeignKey('sensor.sid', ondelete='CASCADE'), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Metrics a reading does not include are NULL
+    rainfall = db.Column(db.Float)
+    forecasted_rainfall = db.Column(db.Float)
+    soil_saturation = db.Column(db.Float)
+    slope = db.Column(db.Float)
+    seismic_activity = db.Column(db.Float)
+    moisture_level = db.Column(db.Float)
+    temperature = db.Column(db.Float)
+    battery_level = db.Column(db.Float)
+
+    def __repr__(self):
+        return f'<SensorReading {self.sensor_id} {self.timestamp}>'
+
+
+class SensorReadingRollup(db.Model):
+    """
+    Aggregate of one metric of one sensor's readings over a time bucket.
+    Buckets are `resolution` seconds long (60, 3600 or 86400) and start at `bucket_start`.
+    """
+    __tablename__ = 'sensor_reading_rollups'
+
+    # The primary key doubles as the index for range scans of one series
+    sensor_id = db.Column(db.Integer, db.ForeignKey('sensor.sid', ondelete='CASCADE'), primary_key=True)
+    resolution = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(30), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    min = db.Column(db.Float, nullable=False)
+    max = db.Column(db.Float, nullable=False)
+    mean = db.Column(db.Float, nullable=False)
+    last = db.Column(db.Float, nullable=False)  # value of the newest reading in the bucket
+
+    def __repr__(self):
+        return f'<SensorReadingRollup {self.sensor_id} {self.metric} {self.resolution}s {self.bucket_start}>'
+
+
 class Vehicle(db.Model):
     __tablename__ = 'vehicles'
+    __table_args__ = (
+        db.Index('ix_vehicles_warehouse_status', 'warehouse_id', 'status'),
+    )
     
     vid = db.Column(db.Integer, primary_key=True)
     vehicle_id = db.Column(db.String(50), unique=True, nullable=False)
@@ -333,6 +434,9 @@ class Vehicle(db.Model):
 class UserRequest(db.Model):
     """Model for user requests for camp slots."""
     __tablename__ = 'user_requests'
+    __table_args__ = (
+        db.Index('ix_user_requests_camp_status', 'camp_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -349,6 +453,12 @@ class UserRequest(db.Model):
 class ResourceRequest(db.Model):
     """Model for resource requests from camps to warehouses."""
     __tablename__ = 'resource_requests'
+    __table_args__ = (
+        db.Index('ix_resource_requests_warehouse_status_vehicle', 'warehouse_id', 'status', 'vehicle_id'),
+        db.Index('ix_resource_requests_camp_status', 'camp_id', 'status'),
+        # Pending load of each vehicle
+        db.Index('ix_resource_requests_vehicle_status', 'vehicle_id', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     camp_id = db.Column(db.Integer, db.ForeignKey('camps.cid'), nullable=False)
@@ -389,6 +499,9 @@ class Request(db.Model):
 class Notification(db.Model):
     """Model for storing notifications."""
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.uid'), nullable=False)
@@ -413,4 +526,25 @@ class Notification(db.Model):
         }
 
     def __repr__(self):
-        return f'<Notification {self.id}: {self.type}>'
\ No newline at end of file
+        return f'<Notification {self.id}: {self.type}>'
+
+class RouteCache(db.Model):
+    """Cached road distance and duration between two rounded coordinate pairs."""
+    __tablename__ = 'route_cache'
+    __table_args__ = (
+        db.UniqueConstraint('origin_lat', 'origin_lng', 'destination_lat', 'destination_lng',
+                            name='uq_route_cache_pair'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Coordinates are stored as integers scaled by 10^5 (about 1 m) so lookups never compare floats
+    origin_lat = db.Column(db.Integer, nullable=False)
+    origin_lng = db.Column(db.Integer, nullable=False)
+    destination_lat = db.Column(db.Integer, nullable=False)
+    destination_lng = db.Column(db.Integer, nullable=False)
+    distance_km = db.Column(db.Float, nullable=False)
+    duration_seconds = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<RouteCache {self.id}: {self.distance_km} km>'
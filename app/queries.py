@@ -0,0 +1,102 @@
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import and_, event
+from sqlalchemy.orm import joinedload, selectinload
+from app.models import Camp, Reply, ResourceRequest, Thread, User, Vehicle, Warehouse
+from app.extensions import db
+
+# Queries for list endpoints. Each one loads the related rows its endpoint shows in a
+# fixed number of queries, however many rows are listed.
+
+def camps_with_heads():
+    """:return: All camps, with their camp heads loaded in the same query"""
+    return Camp.query.options(joinedload(Camp.camp_head)).all()
+
+def users_with_warehouses():
+    """:return: All users, with the id and name of the warehouse each one manages"""
+    return User.query.options(
+        joinedload(User.managed_warehouse).load_only(Warehouse.wid, Warehouse.name)
+    ).all()
+
+def warehouses_with_managers():
+    """:return: All warehouses, with their managers' usernames"""
+    return Warehouse.query.options(
+        joinedload(Warehouse.manager).load_only(User.uid, User.username)
+    ).all()
+
+def threads_with_replies():
+    """:return: All threads, newest first, with their replies and the replies' authors"""
+    return Thread.query.options(
+        selectinload(Thread.replies).joinedload(Reply.user).load_only(User.uid, User.username)
+    ).order_by(Thread.timestamp.desc()).all()
+
+def camp_locations(camp_ids):
+    """
+    Loads only the columns needed to show camps next to requests.
+    :return: Dictionary of camp id to a row with cid, name, location, coordinates_lat and coordinates_lng
+    """
+    if not camp_ids:
+        return {}
+    rows = db.session.query(
+        Camp.cid, Camp.name, Camp.location, Camp.coordinates_lat, Camp.coordinates_lng
+    ).filter(Camp.cid.in_(set(camp_ids))).all()
+    return {row.cid: row for row in rows}
+
+def vehicles_with_loads(warehouse_id, status='available', waiting_only=False):
+    """
+    Loads a warehouse's vehicles with the load and number of the pending requests
+    assigned to each, in one grouped query however many vehicles there are.
+    :param status: Vehicle status to list
+    :param waiting_only: Only list vehicles with at least one pending request
+    :return: List of (vehicle, current_load, pending_count)
+    """
+    pending_count = db.func.count(ResourceRequest.id)
+    query = db.session.query(
+        Vehicle,
+        db.func.coalesce(db.func.sum(
+            ResourceRequest.food_quantity +
+            ResourceRequest.water_quantity +
+            ResourceRequest.essentials_quantity +
+            ResourceRequest.clothes_quantity
+        ), 0).label('current_load'),
+        pending_count.label('pending_count')
+    ).outerjoin(
+        ResourceRequest,
+        and_(ResourceRequest.vehicle_id == Vehicle.vid, ResourceRequest.status == 'pending')
+    ).filter(
+        Vehicle.warehouse_id == warehouse_id,
+        Vehicle.status == status
+    ).group_by(Vehicle.vid)
+    if waiting_only:
+        query = query.having(pending_count > 0)
+    return query.all()
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and 'query_count' in g:
+        g.query_count += 1
+
+def query_budget(max_queries):
+    """
+    Counts the SQL statements a view runs and logs a warning when there are more than
+    max_queries, so a list endpoint that starts querying once per row shows up in the logs.
+    Apply it below @login_required, so the current user's query is not counted.
+    tests/test_query_budgets.py checks the same budgets.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not event.contains(db.engine, 'before_cursor_execute', _count_query):
+                event.listen(db.engine, 'before_cursor_execute', _count_query)
+            outer_count = g.pop('query_count', None)
+            g.query_count = 0
+            try:
+                return f(*args, **kwargs)
+            finally:
+                count = g.pop('query_count')
+                if count > max_queries:
+                    current_app.logger.warning(
+                        f"Query budget exceeded: {request.path} ran {count} queries (budget {max_queries})")
+                if outer_count is not None:
+                    g.query_count = outer_count + count
+        return decorated_function
+    return decorator
@@ -1,13 +1,21 @@
-import requests
+import numpy as np
 from datetime import datetime, timedelta
-from geopy.distance import geodesic
-from concurrent.futures import ThreadPoolExecutor
 import heapq
-from app.models import Camp, Warehouse, Vehicle
+from sqlalchemy import or_
+from app.models import Camp, Warehouse
+# Imported under another name: the Vehicle class below is the in-memory delivery planner
+from app.models import Vehicle as VehicleModel
 from app.extensions import db
+from app.route_cache import coordinate_key, get_cached_route, get_cached_routes, store_route
+from app.distance import coordinate_array, straight_line_distance_matrix
+from app.spatial_index import nearest_warehouses, routing_candidate_count
+from app.routing_service import get_routing_service
 
-# Ensure no accidental reassignment of 'requests'
-assert requests.__name__ == 'requests', "The 'requests' library has been overwritten!"
+OSRM_BASE_URL = "http://router.project-osrm.org"
+# Largest number of coordinates the OSRM table service accepts in one request
+OSRM_MAX_TABLE_COORDINATES = 100
+# Timeout for the larger table and multi-stop route requests, in seconds
+OSRM_LONG_TIMEOUT = 10
 
 # Helper function to calculate straight-line distance
 def calculate_straight_line_distance(origin, destination):
@@ -32,99 +40,297 @@ def calculate_straight_line_distance(origin, destination):
             print("Invalid longitude in straight-line calculation: must be between -180 and 180")
             return 0
         
-        return round(geodesic(origin, destination).kilometers, 2)
+        # Ellipsoidal (WGS-84) distance keeps single-pair results as precise as before
+        return float(straight_line_distance_matrix([origin], [destination], method='vincenty')[0, 0])
     except Exception as e:
         print(f"Error calculating straight-line distance: {e}")
         return 0
 
-# Helper function to calculate road distance and duration using OSRM API
-def calculate_road_distance_and_duration(origin, destination):
+class RouteLookup:
     """
-    Fetches the road distance and duration between two points using OSRM API.
-    Falls back to straight-line distance if the API fails.
+    Road distance and duration for one pair of points, possibly still being fetched
+    from the routing server. Calling result() waits for the answer (bounded by the
+    routing timeout) and falls back to the straight-line distance if there is none.
+    """
+
+    def __init__(self, origin, destination, result=None, future=None):
+        self.origin = origin
+        self.destination = destination
+        self._result = result
+        self._future = future
+
+    def result(self):
+        """
+        :return: Road distance in kilometers and duration in seconds
+        """
+        if self._result is None:
+            data = get_routing_service().wait(self._future) if self._future else None
+            self._result = self._parse(data)
+        return self._result
+
+    def _parse(self, data):
+        try:
+            routes = data.get('routes') if data else None
+            if isinstance(routes, list) and len(routes) > 0:
+                route = routes[0]
+                distance_in_kilometers = round(route.get('distance', 0) / 1000, 2)
+                duration_in_seconds = route.get('duration', 0)
+                store_route(self.origin, self.destination, distance_in_kilometers, duration_in_seconds)
+                return distance_in_kilometers, duration_in_seconds
+        except Exception as e:
+            print(f"Error calculating road distance: {e}")
+        return calculate_straight_line_distance(self.origin, self.destination), None
+
+def request_road_distance_and_duration(origin, destination):
+    """
+    Starts a road distance and duration lookup without waiting for it.
+    Cached routes and invalid coordinates are answered immediately; everything else
+    is sent to the routing worker pool.
     :param origin: (latitude, longitude) of the starting point
     :param destination: (latitude, longitude) of the ending point
-    :return: Road distance in kilometers and duration in seconds
+    :return: RouteLookup whose result() gives (distance in kilometers, duration in seconds)
     """
     # Validate coordinates
     try:
         # Check if coordinates are valid numbers
         if not all(isinstance(x, (int, float)) for x in origin + destination):
             print("Invalid coordinates: coordinates must be numbers")
-            return calculate_straight_line_distance(origin, destination), None
+            return RouteLookup(origin, destination, result=(calculate_straight_line_distance(origin, destination), None))
         
         # Check if coordinates are within valid ranges
         if not all(-90 <= lat <= 90 for lat in [origin[0], destination[0]]):
             print("Invalid latitude: must be between -90 and 90")
-            return calculate_straight_line_distance(origin, destination), None
+            return RouteLookup(origin, destination, result=(calculate_straight_line_distance(origin, destination), None))
         
         if not all(-180 <= lng <= 180 for lng in [origin[1], destination[1]]):
             print("Invalid longitude: must be between -180 and 180")
-            return calculate_straight_line_distance(origin, destination), None
+            return RouteLookup(origin, destination, result=(calculate_straight_line_distance(origin, destination), None))
     except Exception as e:
         print(f"Error validating coordinates: {e}")
-        return calculate_straight_line_distance(origin, destination), None
+        return RouteLookup(origin, destination, result=(calculate_straight_line_distance(origin, destination), None))
     
-    base_url = "http://router.project-osrm.org/route/v1/driving/"
-    coords = f"{origin[1]},{origin[0]};{destination[1]},{destination[0]}"
-    url = f"{base_url}{coords}?overview=false"
+    cached = get_cached_route(origin, destination)
+    if cached:
+        return RouteLookup(origin, destination, result=cached)
     
-    try:
-        response = requests.get(url, timeout=5)  # Add timeout to prevent hanging
-        if response.status_code == 200:
-            data = response.json()
-            if isinstance(data, dict) and data.get('code') == 'Ok':
-                routes = data.get('routes')
-                if isinstance(routes, list) and len(routes) > 0:
-                    route = routes[0]
-                    distance_in_kilometers = round(route.get('distance', 0) / 1000, 2)
-                    duration_in_seconds = route.get('duration', 0)
-                    return distance_in_kilometers, duration_in_seconds
-        print(f"OSRM API returned status code {response.status_code}")
-        return calculate_straight_line_distance(origin, destination), None
-    except requests.exceptions.Timeout:
-        print("OSRM API request timed out")
-        return calculate_straight_line_distance(origin, destination), None
-    except requests.exceptions.RequestException as e:
-        print(f"Error making request to OSRM API: {e}")
-        return calculate_straight_line_distance(origin, destination), None
-    except Exception as e:
-        print(f"Error calculating road distance: {e}")
-        return calculate_straight_line_distance(origin, destination), None
+    coords = f"{origin[1]},{origin[0]};{destination[1]},{destination[0]}"
+    url = f"{OSRM_BASE_URL}/route/v1/driving/{coords}?overview=false"
+    return RouteLookup(origin, destination, future=get_routing_service().submit(url))
+
+# Helper function to calculate road distance and duration using OSRM API
+def calculate_road_distance_and_duration(origin, destination):
+    """
+    Fetches the road distance and duration between two points using OSRM API.
+    Results are served from the shared route cache when available.
+    Falls back to straight-line distance if the API fails.
+    :param origin: (latitude, longitude) of the starting point
+    :param destination: (latitude, longitude) of the ending point
+    :return: Road distance in kilometers and duration in seconds
+    """
+    return request_road_distance_and_duration(origin, destination).result()
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
-def find_nearest_warehouse(camp_location, required_items):
+def _submit_osrm_table(origins, destinations):
+    """
+    Starts one OSRM table request on the routing worker pool.
+    :return: Future resolving to the decoded response, or None on failure
+    """
+    points = origins + destinations
+    coords = ";".join(f"{point[1]},{point[0]}" for point in points)
+    sources = ";".join(str(i) for i in range(len(origins)))
+    targets = ";".join(str(i) for i in range(len(origins), len(points)))
+    url = (f"{OSRM_BASE_URL}/table/v1/driving/{coords}"
+           f"?sources={sources}&destinations={targets}&annotations=distance,duration")
+    return get_routing_service().submit(url, timeout=OSRM_LONG_TIMEOUT)
+
+def road_distance_matrix(origins, destinations):
+    """
+    Calculates road distances and durations between every origin and destination.
+    Cached pairs are served from the route cache; the rest are fetched with as few
+    OSRM table requests as the server's coordinate limit allows. Pairs that cannot
+    be routed fall back to the straight-line distance with no duration.
+    :param origins: List of (latitude, longitude) for the starting points
+    :param destinations: List of (latitude, longitude) for the ending points
+    :return: (distances, durations) as lists of rows, distances in kilometers and durations in seconds
+    """
+    origins = [tuple(point) for point in origins]
+    destinations = [tuple(point) for point in destinations]
+    distances = [[None] * len(destinations) for _ in origins]
+    durations = [[None] * len(destinations) for _ in origins]
+    if not origins or not destinations:
+        return distances, durations
+
+    valid_origins = np.flatnonzero(coordinate_array(origins)[1]).tolist()
+    valid_destinations = np.flatnonzero(coordinate_array(destinations)[1]).tolist()
+
+    # Serve whatever the route cache already knows
+    cached = get_cached_routes(
+        (origins[i], destinations[j]) for i in valid_origins for j in valid_destinations
+    )
+    missing = set()
+    for i in valid_origins:
+        origin_key = coordinate_key(origins[i])
+        for j in valid_destinations:
+            hit = cached.get((origin_key, coordinate_key(destinations[j])))
+            if hit:
+                distances[i][j], durations[i][j] = hit
+            else:
+                missing.add((i, j))
+
+    # Fetch the remaining pairs in batches that fit the OSRM table limit
+    if missing:
+        missing_origins = sorted({i for i, _ in missing})
+        missing_destinations = sorted({j for _, j in missing})
+        if len(missing_origins) + len(missing_destinations) <= OSRM_MAX_TABLE_COORDINATES:
+            origin_batch_size = len(missing_origins)
+            destination_batch_size = len(missing_destinations)
+        else:
+            half = OSRM_MAX_TABLE_COORDINATES // 2
+            origin_batch_size = min(len(missing_origins), max(half, OSRM_MAX_TABLE_COORDINATES - len(missing_destinations)))
+            destination_batch_size = OSRM_MAX_TABLE_COORDINATES - origin_batch_size
+
+        # Send every batch before waiting so they run concurrently
+        batches = []
+        for origin_batch in _chunks(missing_origins, origin_batch_size):
+            for destination_batch in _chunks(missing_destinations, destination_batch_size):
+                if not any((i, j) in missing for i in origin_batch for j in destination_batch):
+                    continue
+                future = _submit_osrm_table(
+                    [origins[i] for i in origin_batch],
+                    [destinations[j] for j in destination_batch]
+                )
+                batches.append((origin_batch, destination_batch, future))
+
+        service = get_routing_service()
+        for origin_batch, destination_batch, future in batches:
+            data = service.wait(future, OSRM_LONG_TIMEOUT)
+            table_distances = data.get('distances') if data else None
+            table_durations = data.get('durations') if data else None
+            if not table_distances or not table_durations:
+                continue
+            for row, i in enumerate(origin_batch):
+                for column, j in enumerate(destination_batch):
+                    distance = table_distances[row][column]
+                    duration = table_durations[row][column]
+                    if distance is None or duration is None:
+                        continue
+                    distances[i][j] = round(distance / 1000, 2)
+                    durations[i][j] = duration
+                    store_route(origins[i], destinations[j], distances[i][j], duration)
+                    missing.discard((i, j))
+
+    # Straight-line fallback for everything the router could not answer;
+    # invalid coordinates keep the single-pair behaviour of a zero distance
+    if missing or len(valid_origins) < len(origins) or len(valid_destinations) < len(destinations):
+        fallback = straight_line_distance_matrix(origins, destinations)
+        for i in range(len(origins)):
+            for j in range(len(destinations)):
+                if distances[i][j] is None:
+                    distances[i][j] = float(fallback[i, j])
+    return distances, durations
+
+# Required item name -> Warehouse column holding the stock that can still be sent
+STOCK_COLUMNS = {
+    'food': Warehouse.food_available,
+    'water': Warehouse.water_available,
+    'essentials': Warehouse.essentials_available,
+    'clothes': Warehouse.clothes_available,
+}
+
+def _closest_by_road(camp_location, warehouses):
+    """
+    Orders warehouses by road distance from a camp with one table lookup.
+    :return: List of (warehouse, distance in kilometers), closest first
+    """
+    if not warehouses:
+        return []
+    distances, _ = road_distance_matrix(
+        [camp_location],
+        [(warehouse.coordinates_lat, warehouse.coordinates_lng) for warehouse in warehouses]
+    )
+    ranked = [(warehouse, distance) for warehouse, distance in zip(warehouses, distances[0]) if distance]
+    return sorted(ranked, key=lambda item: item[1])
+
+def find_nearest_warehouse(camp_location, required_items, *criteria):
     """
     Finds the nearest warehouse with sufficient stock using road distances.
+    The stock check runs in SQL against the available stock, candidates are ordered by
+    straight-line distance, and only the closest few are routed.
     :param camp_location: (latitude, longitude) of the camp
     :param required_items: Dictionary of required items and quantities
+    :param criteria: Optional SQLAlchemy filter expressions the warehouse must also match
     :return: Nearest warehouse or None if no warehouse has stock
     """
-    warehouses = Warehouse.query.filter_by(status='Operational').all()
-    nearest_warehouse = None
-    min_distance = float('inf')
-    
-    for warehouse in warehouses:
-        # Check if warehouse has sufficient stock
-        has_sufficient_stock = True
-        if required_items.get('food', 0) > warehouse.food_capacity:
-            has_sufficient_stock = False
-        if required_items.get('water', 0) > warehouse.water_capacity:
-            has_sufficient_stock = False
-        if required_items.get('essentials', 0) > warehouse.essential_capacity:
-            has_sufficient_stock = False
-        if required_items.get('clothes', 0) > warehouse.clothes_capacity:
-            has_sufficient_stock = False
-            
-        if has_sufficient_stock:
-            distance, _ = calculate_road_distance_and_duration(
-                camp_location,
-                (warehouse.coordinates_lat, warehouse.coordinates_lng)
-            )
-            if distance and distance < min_distance:
-                nearest_warehouse = warehouse
-                min_distance = distance
-                
-    return nearest_warehouse
+    candidates = nearest_warehouses(
+        camp_location,
+        routing_candidate_count(),
+        Warehouse.status == 'Operational',
+        *criteria,
+        *[column >= required_items.get(item, 0) for item, column in STOCK_COLUMNS.items()
+          if required_items.get(item, 0) > 0]
+    )
+    ranked = _closest_by_road(camp_location, candidates)
+    return ranked[0][0] if ranked else None
+
+def nearest_operational_warehouse(camp_location, *criteria):
+    """
+    Finds the nearest operational warehouse by road, whatever its stock.
+    :param camp_location: (latitude, longitude) of the camp
+    :param criteria: Optional SQLAlchemy filter expressions the warehouse must also match
+    :return: Nearest warehouse or None if there is no operational warehouse
+    """
+    candidates = nearest_warehouses(
+        camp_location,
+        routing_candidate_count(),
+        Warehouse.status == 'Operational',
+        *criteria
+    )
+    ranked = _closest_by_road(camp_location, candidates)
+    return ranked[0][0] if ranked else None
+
+def split_across_warehouses(camp_location, required_items, *criteria):
+    """
+    Plans partial fulfilment when no single warehouse has enough stock.
+    Takes as much as possible from the nearest warehouse by road, then the next one,
+    until the request is covered or the candidates run out.
+    :param camp_location: (latitude, longitude) of the camp
+    :param required_items: Dictionary of required items and quantities
+    :param criteria: Optional SQLAlchemy filter expressions the warehouses must also match
+    :return: (list of (warehouse, items to take), dictionary of quantities still missing)
+    """
+    remaining = {item: quantity for item, quantity in required_items.items() if quantity > 0}
+    needed = [column > 0 for item, column in STOCK_COLUMNS.items() if item in remaining]
+    if not needed:
+        return [], remaining
+
+    # Any warehouse holding at least one of the needed items can contribute
+    candidates = nearest_warehouses(
+        camp_location,
+        routing_candidate_count() * 2,
+        Warehouse.status == 'Operational',
+        or_(*needed),
+        *criteria
+    )
+
+    shares = []
+    for warehouse, _ in _closest_by_road(camp_location, candidates):
+        items = {}
+        for item, quantity in remaining.items():
+            take = min(quantity, getattr(warehouse, STOCK_COLUMNS[item].key) or 0)
+            if take > 0:
+                items[item] = take
+        if not items:
+            continue
+        shares.append((warehouse, items))
+        for item, take in items.items():
+            remaining[item] -= take
+        remaining = {item: quantity for item, quantity in remaining.items() if quantity > 0}
+        if not remaining:
+            break
+    return shares, remaining
 
 class PriorityQueue:
     def __init__(self):
@@ -199,28 +405,25 @@ def optimize_route(start_location, delivery_points):
     :return: Optimized route as a list of locations and ETAs
     """
     coords = ";".join([f"{loc[1]},{loc[0]}" for loc in [start_location] + delivery_points])
-    base_url = "http://router.project-osrm.org/route/v1/driving/"
-    url = f"{base_url}{coords}?steps=true&geometries=geojson"
+    url = f"{OSRM_BASE_URL}/route/v1/driving/{coords}?steps=true&geometries=geojson"
     
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            if isinstance(data, dict) and data.get('code') == 'Ok':
-                routes = data.get('routes')
-                if isinstance(routes, list) and len(routes) > 0:
-                    route = routes[0]
-                    geometry = route.get('geometry')
-                    if geometry and 'coordinates' in geometry:
-                        route_geometry = geometry['coordinates']
-                        optimized_route = [(coord[1], coord[0]) for coord in route_geometry]
-                        legs = route.get('legs', [])
-                        etas = []
-                        current_time = datetime.now()
-                        for leg in legs:
-                            current_time += timedelta(seconds=leg.get('duration', 0))
-                            etas.append(current_time)
-                        return optimized_route, etas
+        data = get_routing_service().get_json(url, timeout=OSRM_LONG_TIMEOUT)
+        if data:
+            routes = data.get('routes')
+            if isinstance(routes, list) and len(routes) > 0:
+                route = routes[0]
+                geometry = route.get('geometry')
+                if geometry and 'coordinates' in geometry:
+                    route_geometry = geometry['coordinates']
+                    optimized_route = [(coord[1], coord[0]) for coord in route_geometry]
+                    legs = route.get('legs', [])
+                    etas = []
+                    current_time = datetime.now()
+                    for leg in legs:
+                        current_time += timedelta(seconds=leg.get('duration', 0))
+                        etas.append(current_time)
+                    return optimized_route, etas
         return None, None
     except Exception as e:
         print(f"Error optimizing route: {e}")
@@ -250,9 +453,98 @@ def format_eta(duration_in_seconds):
         print(f"Error formatting ETA: {e}")
         return "Calculating..."
 
+def _allocate_from_warehouse(camp, warehouse, items, priority):
+    """
+    Loads items for one camp onto a vehicle of one warehouse and dispatches it.
+    The caller commits the session.
+    :return: Dictionary containing allocation details and ETA
+    """
+    # Get available vehicles from the warehouse
+    vehicles = VehicleModel.query.filter_by(
+        warehouse_id=warehouse.wid,
+        status='available'
+    ).order_by(VehicleModel.capacity).all()
+    
+    if not vehicles:
+        return {
+            'success': False,
+            'message': f'No vehicles available at {warehouse.name}'
+        }
+        
+    # Use the smallest vehicle that can carry the load, or the largest one otherwise
+    total_weight = sum(items.values())
+    chosen = next((v for v in vehicles if v.capacity >= total_weight), vehicles[-1])
+    vehicle = Vehicle(chosen.vid, chosen.capacity)
+    vehicle.add_delivery(camp, items, priority)
+    
+    # Optimize route
+    delivery_points = [(camp.coordinates_lat, camp.coordinates_lng)]
+    optimized_route, etas = optimize_route(
+        (warehouse.coordinates_lat, warehouse.coordinates_lng),
+        delivery_points
+    )
+    
+    if not optimized_route or not etas:
+        return {
+            'success': False,
+            'message': 'Failed to optimize delivery route'
+        }
+        
+    # Process delivery and get ETA
+    if priority == "emergency":
+        delivery_info = vehicle.process_emergency_deliveries(etas)
+    else:
+        delivery_info = vehicle.process_general_deliveries(etas)
+        
+    if not delivery_info:
+        return {
+            'success': False,
+            'message': 'Failed to process delivery'
+        }
+        
+    # Update available and used resources (capacity remains fixed)
+    warehouse.food_available -= items.get('food', 0)
+    warehouse.water_available -= items.get('water', 0)
+    warehouse.essentials_available -= items.get('essentials', 0)
+    warehouse.clothes_available -= items.get('clothes', 0)
+    
+    warehouse.food_used += items.get('food', 0)
+    warehouse.water_used += items.get('water', 0)
+    warehouse.essentials_used += items.get('essentials', 0)
+    warehouse.clothes_used += items.get('clothes', 0)
+    
+    # Update vehicle status
+    chosen.status = 'in_transit'
+    
+    return {
+        'success': True,
+        'warehouse': warehouse.name,
+        'vehicle_id': vehicle.id,
+        'eta': delivery_info['eta'],
+        'items': delivery_info['items']
+    }
+
+def plan_request_warehouses(camp_location, required_items, *criteria):
+    """
+    Chooses where a camp's resource request is sent: the nearest warehouse by road that
+    has all of it in stock, or otherwise a split across the nearest warehouses that
+    together hold as much of it as possible.
+    :param camp_location: (latitude, longitude) of the camp
+    :param required_items: Dictionary of required items and quantities
+    :param criteria: Optional SQLAlchemy filter expressions the warehouses must also match
+    :return: (list of (warehouse, items to request), dictionary of quantities no warehouse has)
+    """
+    required = {item: quantity for item, quantity in required_items.items() if quantity > 0}
+    warehouse = find_nearest_warehouse(camp_location, required, *criteria)
+    if warehouse:
+        return [(warehouse, required)], {}
+    return split_across_warehouses(camp_location, required, *criteria)
+
 def allocate_resources(camp_id, required_items, priority="general"):
     """
     Allocates resources to a camp using real-time data from the database.
+    If no single warehouse has enough stock the request is split across the
+    nearest warehouses that together can cover as much of it as possible.
     :param camp_id: ID of the camp requesting resources
     :param required_items: Dictionary of required items and quantities
     :param priority: Priority of the request ("emergency" or "general")
@@ -265,80 +557,37 @@ def allocate_resources(camp_id, required_items, priority="general"):
         
         # Find nearest warehouse with sufficient stock
         warehouse = find_nearest_warehouse(camp_location, required_items)
-        if not warehouse:
-            return {
-                'success': False,
-                'message': 'No warehouse found with sufficient stock'
-            }
-            
-        # Get available vehicles from the warehouse
-        vehicles = Vehicle.query.filter_by(
-            warehouse_id=warehouse.wid,
-            status='available'
-        ).all()
+        if warehouse:
+            allocation = _allocate_from_warehouse(camp, warehouse, required_items, priority)
+            if not allocation['success']:
+                db.session.rollback()
+                return allocation
+            db.session.commit()
+            return {'message': 'Resources allocated successfully', **allocation}
         
-        if not vehicles:
+        # Partial fulfilment from several warehouses
+        shares, missing = split_across_warehouses(camp_location, required_items)
+        if not shares:
             return {
                 'success': False,
-                'message': 'No vehicles available at the warehouse'
-            }
-            
-        # Create vehicle objects
-        vehicle_objects = [Vehicle(v.vid, v.capacity) for v in vehicles]
-        
-        # Add delivery to the first available vehicle
-        vehicle = vehicle_objects[0]
-        vehicle.add_delivery(camp, required_items, priority)
-        
-        # Optimize route
-        delivery_points = [(camp.coordinates_lat, camp.coordinates_lng)]
-        optimized_route, etas = optimize_route(
-            (warehouse.coordinates_lat, warehouse.coordinates_lng),
-            delivery_points
-        )
-        
-        if not optimized_route or not etas:
-            return {
-                'success': False,
-                'message': 'Failed to optimize delivery route'
-            }
-            
-        # Process delivery and get ETA
-        if priority == "emergency":
-            delivery_info = vehicle.process_emergency_deliveries(etas)
-        else:
-            delivery_info = vehicle.process_general_deliveries(etas)
-            
-        if not delivery_info:
-            return {
-                'success': False,
-                'message': 'Failed to process delivery'
+                'message': 'No warehouse found with sufficient stock'
             }
-            
-        # Update available and used resources (capacity remains fixed)
-        warehouse.food_available -= required_items.get('food', 0)
-        warehouse.water_available -= required_items.get('water', 0)
-        warehouse.essentials_available -= required_items.get('essentials', 0)
-        warehouse.clothes_available -= required_items.get('clothes', 0)
-        
-        warehouse.food_used += required_items.get('food', 0)
-        warehouse.water_used += required_items.get('water', 0)
-        warehouse.essentials_used += required_items.get('essentials', 0)
-        warehouse.clothes_used += required_items.get('clothes', 0)
         
-        # Update vehicle status
-        vehicle_db = Vehicle.query.get(vehicle.id)
-        vehicle_db.status = 'in_transit'
+        allocations = []
+        for share_warehouse, items in shares:
+            allocation = _allocate_from_warehouse(camp, share_warehouse, items, priority)
+            if not allocation['success']:
+                db.session.rollback()
+                return allocation
+            allocations.append(allocation)
         
         db.session.commit()
         
         return {
             'success': True,
-            'message': 'Resources allocated successfully',
-            'warehouse': warehouse.name,
-            'vehicle_id': vehicle.id,
-            'eta': delivery_info['eta'],
-            'items': delivery_info['items']
+            'message': f'Resources allocated from {len(allocations)} warehouses',
+            'allocations': allocations,
+            'missing': missing
         }
         
     except Exception as e:
@@ -346,4 +595,4 @@ def allocate_resources(camp_id, required_items, priority="general"):
         return {
             'success': False,
             'message': f'Error allocating resources: {str(e)}'
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,182 @@
+from datetime import datetime, timedelta
+from flask import current_app, g, has_request_context
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from app.models import RouteCache
+from app.extensions import db
+
+# Coordinates are rounded to 5 decimal places (about 1 m) before being used as cache keys
+COORDINATE_PRECISION = 5
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+def coordinate_key(point):
+    """
+    Converts a (latitude, longitude) pair into the integer key stored in the cache.
+    :param point: (latitude, longitude)
+    :return: (scaled_latitude, scaled_longitude)
+    """
+    scale = 10 ** COORDINATE_PRECISION
+    return int(round(point[0] * scale)), int(round(point[1] * scale))
+
+def _ttl():
+    try:
+        return current_app.config.get('ROUTE_CACHE_TTL', DEFAULT_TTL_SECONDS)
+    except RuntimeError:
+        return DEFAULT_TTL_SECONDS
+
+def _pair_filter(origin_key, destination_key):
+    return and_(
+        RouteCache.origin_lat == origin_key[0],
+        RouteCache.origin_lng == origin_key[1],
+        RouteCache.destination_lat == destination_key[0],
+        RouteCache.destination_lng == destination_key[1]
+    )
+
+def get_cached_route(origin, destination):
+    """
+    Looks up a cached road distance and duration.
+    :param origin: (latitude, longitude) of the starting point
+    :param destination: (latitude, longitude) of the ending point
+    :return: (distance in kilometers, duration in seconds) or None on a miss or expired entry
+    """
+    try:
+        origin_key = coordinate_key(origin)
+        destination_key = coordinate_key(destination)
+
+        pending = getattr(g, '_pending_routes', {}) if has_request_context() else {}
+        if (origin_key, destination_key) in pending:
+            return pending[(origin_key, destination_key)]
+
+        entry = RouteCache.query.filter(_pair_filter(origin_key, destination_key)).first()
+        if not entry:
+            return None
+        if entry.updated_at < datetime.utcnow() - timedelta(seconds=_ttl()):
+            return None
+        return entry.distance_km, entry.duration_seconds
+    except Exception as e:
+        print(f"Error reading route cache: {e}")
+        return None
+
+def get_cached_routes(pairs):
+    """
+    Looks up many cached routes with as few queries as possible.
+    :param pairs: Iterable of (origin, destination) coordinate pairs
+    :return: Dictionary mapping (origin_key, destination_key) to (distance, duration) for every fresh hit
+    """
+    keys = {(coordinate_key(origin), coordinate_key(destination)) for origin, destination in pairs}
+    results = {}
+    if not keys:
+        return results
+
+    if has_request_context():
+        pending = getattr(g, '_pending_routes', {})
+        results.update({key: pending[key] for key in keys if key in pending})
+
+    try:
+        missing = [key for key in keys if key not in results]
+        cutoff = datetime.utcnow() - timedelta(seconds=_ttl())
+        # Keep each OR clause small enough for every database backend
+        for start in range(0, len(missing), 200):
+            chunk = missing[start:start + 200]
+            entries = RouteCache.query.filter(
+                or_(*[_pair_filter(origin_key, destination_key) for origin_key, destination_key in chunk]),
+                RouteCache.updated_at >= cutoff
+            ).all()
+            for entry in entries:
+                key = ((entry.origin_lat, entry.origin_lng), (entry.destination_lat, entry.destination_lng))
+                results[key] = (entry.distance_km, entry.duration_seconds)
+    except Exception as e:
+        print(f"Error reading route cache: {e}")
+    return results
+
+def store_route(origin, destination, distance_km, duration_seconds):
+    """
+    Stores a road distance and duration in the cache.
+    Inside a request the write is deferred until the request ends so it never
+    joins (or blocks on) the handler's own transaction.
+    :param origin: (latitude, longitude) of the starting point
+    :param destination: (latitude, longitude) of the ending point
+    :param distance_km: Road distance in kilometers
+    :param duration_seconds: Road duration in seconds
+    """
+    if distance_km is None or duration_seconds is None:
+        return
+
+    key = (coordinate_key(origin), coordinate_key(destination))
+    if has_request_context():
+        if not hasattr(g, '_pending_routes'):
+            g._pending_routes = {}
+        g._pending_routes[key] = (distance_km, duration_seconds)
+    else:
+        _write_routes({key: (distance_km, duration_seconds)})
+
+def _write_routes(routes):
+    """Upserts cache entries on a dedicated connection."""
+    table = RouteCache.__table__
+    now = datetime.utcnow()
+    for (origin_key, destination_key), (distance_km, duration_seconds) in routes.items():
+        values = {
+            'distance_km': distance_km,
+            'duration_seconds': duration_seconds,
+            'updated_at': now
+        }
+        try:
+            with db.engine.begin() as connection:
+                result = connection.execute(
+                    table.update().where(
+                        table.c.origin_lat == origin_key[0],
+                        table.c.origin_lng == origin_key[1],
+                        table.c.destination_lat == destination_key[0],
+                        table.c.destination_lng == destination_key[1]
+                    ).values(**values)
+                )
+                if result.rowcount == 0:
+                    connection.execute(table.insert().values(
+                        origin_lat=origin_key[0],
+                        origin_lng=origin_key[1],
+                        destination_lat=destination_key[0],
+                        destination_lng=destination_key[1],
+                        **values
+                    ))
+        except IntegrityError:
+            # Another worker inserted the same pair first
+            continue
+        except Exception as e:
+            print(f"Error writing route cache: {e}")
+
+def flush_pending_routes(exception=None):
+    """Writes the routes collected during the current request to the cache."""
+    routes = g.pop('_pending_routes', None)
+    if routes:
+        _write_routes(routes)
+
+def invalidate_routes(point):
+    """
+    Removes every cached route that starts or ends at the given point.
+    Called when a camp or warehouse is moved; the caller commits the session.
+    :param point: (latitude, longitude) of the old location
+    """
+    try:
+        if point[0] is None or point[1] is None:
+            return
+        lat, lng = coordinate_key(point)
+        RouteCache.query.filter(or_(
+            and_(RouteCache.origin_lat == lat, RouteCache.origin_lng == lng),
+            and_(RouteCache.destination_lat == lat, RouteCache.destination_lng == lng)
+        )).delete(synchronize_session=False)
+    except Exception as e:
+        print(f"Error invalidating route cache: {e}")
+
+def purge_expired_routes():
+    """
+    Deletes expired cache entries.
+    :return: Number of deleted entries
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=_ttl())
+    deleted = RouteCache.query.filter(RouteCache.updated_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+def init_route_cache(app):
+    """Registers the end-of-request flush of deferred cache writes."""
+    app.teardown_request(flush_pending_routes)
@@ -0,0 +1,233 @@
+from datetime import datetime, timedelta
+import numpy as np
+from app.resource_allocation import road_distance_matrix
+
+# Speed used to turn a straight-line fallback distance into a duration
+FALLBACK_SPEED_KMH = 40
+# Limits on local search so a large plan still returns quickly
+MAX_IMPROVEMENT_PASSES = 50
+MAX_OR_OPT_SEGMENT = 3
+
+def build_duration_matrix(locations):
+    """
+    Builds a travel time matrix between locations from the cached road network.
+    Pairs the router cannot answer are estimated from their straight-line distance.
+    :param locations: List of (latitude, longitude)
+    :return: NumPy array of durations in seconds, shape (len(locations), len(locations))
+    """
+    # Several requests often come from the same camp; only route each place once
+    unique = list(dict.fromkeys(tuple(location) for location in locations))
+    position = {location: i for i, location in enumerate(unique)}
+    distances, durations = road_distance_matrix(unique, unique)
+
+    unique_matrix = np.zeros((len(unique), len(unique)))
+    for i in range(len(unique)):
+        for j in range(len(unique)):
+            if i == j:
+                continue
+            if durations[i][j] is not None:
+                unique_matrix[i, j] = durations[i][j]
+            else:
+                unique_matrix[i, j] = (distances[i][j] or 0) / FALLBACK_SPEED_KMH * 60 * 60
+
+    index = np.array([position[tuple(location)] for location in locations], dtype=int)
+    return unique_matrix[np.ix_(index, index)]
+
+def _route_duration(route, matrix):
+    """Duration of leaving the depot (node 0), visiting the route in order and returning."""
+    path = [0] + route + [0]
+    return float(matrix[path[:-1], path[1:]].sum())
+
+def _respects_priority(route, emergency):
+    """Emergency stops must all be visited before any general stop."""
+    seen_general = False
+    for node in route:
+        if emergency[node]:
+            if seen_general:
+                return False
+        else:
+            seen_general = True
+    return True
+
+def _savings_routes(nodes, matrix, demand, emergency, max_capacity):
+    """
+    Builds routes with the Clarke-Wright savings heuristic.
+    Every stop starts on its own route; routes are then joined end-to-start in order of
+    the time saved by not returning to the depot in between, as long as the joined
+    route fits the largest vehicle and keeps emergency stops first.
+    """
+    routes = {node: [node] for node in nodes}
+    loads = {node: demand[node] for node in nodes}
+    route_of = {node: node for node in nodes}
+
+    savings = []
+    for i in nodes:
+        for j in nodes:
+            if i != j:
+                savings.append((matrix[i, 0] + matrix[0, j] - matrix[i, j], i, j))
+    savings.sort(key=lambda item: item[0], reverse=True)
+
+    for saving, i, j in savings:
+        if saving <= 0:
+            break
+        first, second = route_of[i], route_of[j]
+        if first == second:
+            continue
+        if routes[first][-1] != i or routes[second][0] != j:
+            continue
+        if loads[first] + loads[second] > max_capacity:
+            continue
+        merged = routes[first] + routes[second]
+        if not _respects_priority(merged, emergency):
+            continue
+
+        routes[first] = merged
+        loads[first] += loads.pop(second)
+        for node in routes.pop(second):
+            route_of[node] = first
+
+    return list(routes.values())
+
+def improve_route(route, matrix, emergency):
+    """
+    Shortens a single route with 2-opt (reversing a section) and or-opt (moving a
+    section of up to MAX_OR_OPT_SEGMENT stops elsewhere), keeping emergency stops first.
+    :param route: List of node indices, depot excluded
+    :param matrix: Duration matrix with the depot at index 0
+    :param emergency: Sequence of booleans indexed by node
+    :return: Improved route
+    """
+    best = list(route)
+    best_duration = _route_duration(best, matrix)
+
+    for _ in range(MAX_IMPROVEMENT_PASSES):
+        improved = False
+
+        for i in range(len(best) - 1):
+            for k in range(i + 1, len(best)):
+                candidate = best[:i] + best[i:k + 1][::-1] + best[k + 1:]
+                duration = _route_duration(candidate, matrix)
+                if duration < best_duration - 1e-6 and _respects_priority(candidate, emergency):
+                    best, best_duration, improved = candidate, duration, True
+
+        for length in range(1, MAX_OR_OPT_SEGMENT + 1):
+            for i in range(len(best) - length + 1):
+                segment = best[i:i + length]
+                rest = best[:i] + best[i + length:]
+                for position in range(len(rest) + 1):
+                    if position == i:
+                        continue
+                    candidate = rest[:position] + segment + rest[position:]
+                    duration = _route_duration(candidate, matrix)
+                    if duration < best_duration - 1e-6 and _respects_priority(candidate, emergency):
+                        best, best_duration, improved = candidate, duration, True
+                        break
+
+        if not improved:
+            break
+    return best
+
+def _schedule(route, stops, matrix, start_time, service_seconds):
+    """Turns a route of node indices into stops with per-leg durations and ETAs."""
+    scheduled = []
+    elapsed = 0
+    previous = 0
+    for node in route:
+        leg = float(matrix[previous, node])
+        elapsed += leg
+        stop = dict(stops[node - 1])
+        stop['leg_duration'] = leg
+        stop['arrival_seconds'] = elapsed
+        stop['eta'] = start_time + timedelta(seconds=elapsed)
+        scheduled.append(stop)
+        elapsed += service_seconds
+        previous = node
+    return scheduled
+
+def plan_routes(depot, stops, vehicles, start_time=None, service_seconds=0, matrix=None):
+    """
+    Solves a capacitated vehicle routing problem for one depot.
+    Routes are built with Clarke-Wright savings and improved with 2-opt and or-opt.
+    Emergency stops are always visited before general stops on the same vehicle, and
+    vehicles carrying emergency stops are assigned first.
+    :param depot: (latitude, longitude) of the warehouse
+    :param stops: List of dictionaries with 'id', 'location', 'demand' and 'emergency'
+    :param vehicles: List of dictionaries with 'id' and 'capacity'
+    :param start_time: Departure time, defaults to now
+    :param service_seconds: Time spent unloading at each stop
+    :param matrix: Optional precomputed duration matrix over [depot] + stop locations
+    :return: Dictionary with 'routes' (one per used vehicle) and 'unassigned' stop ids
+    """
+    start_time = start_time or datetime.now()
+    if not stops:
+        return {'routes': [], 'unassigned': []}
+    if matrix is None:
+        matrix = build_duration_matrix([depot] + [stop['location'] for stop in stops])
+
+    # Node 0 is the depot, node i is stops[i - 1]
+    demand = [0] + [stop['demand'] for stop in stops]
+    emergency = [False] + [bool(stop.get('emergency')) for stop in stops]
+    remaining = list(range(1, len(stops) + 1))
+    free_vehicles = sorted(vehicles, key=lambda vehicle: vehicle['capacity'])
+    planned = []
+
+    # Build routes sized for the largest free vehicle, place them, and repeat for
+    # whatever is left so a mixed fleet is used fully
+    while remaining and free_vehicles:
+        max_capacity = free_vehicles[-1]['capacity']
+        nodes = [node for node in remaining if demand[node] <= max_capacity]
+        if not nodes:
+            break
+        routes = _savings_routes(nodes, matrix, demand, emergency, max_capacity)
+
+        # Emergency routes first, then the heaviest, each on the smallest vehicle that fits
+        routes.sort(key=lambda route: (not any(emergency[node] for node in route),
+                                       -sum(demand[node] for node in route)))
+        for route in routes:
+            load = sum(demand[node] for node in route)
+            vehicle = next((v for v in free_vehicles if v['capacity'] >= load), None)
+            if vehicle is None:
+                continue
+            free_vehicles.remove(vehicle)
+            remaining = [node for node in remaining if node not in route]
+
+            route = improve_route(route, matrix, emergency)
+            planned.append({
+                'vehicle_id': vehicle['id'],
+                'capacity': vehicle['capacity'],
+                'load': load,
+                'stops': _schedule(route, stops, matrix, start_time, service_seconds),
+                'total_duration': _route_duration(route, matrix) + service_seconds * len(route)
+            })
+
+    unassigned = [stops[node - 1]['id'] for node in remaining]
+    return {'routes': planned, 'unassigned': unassigned}
+
+def order_stops(depot, stops, start_time=None, service_seconds=0):
+    """
+    Orders the stops of a single, already loaded vehicle and estimates arrival times.
+    :param depot: (latitude, longitude) of the warehouse
+    :param stops: List of dictionaries with 'id', 'location' and 'emergency'
+    :param start_time: Departure time, defaults to now
+    :param service_seconds: Time spent unloading at each stop
+    :return: The stops in visiting order with 'leg_duration', 'arrival_seconds' and 'eta' added
+    """
+    start_time = start_time or datetime.now()
+    if not stops:
+        return []
+    matrix = build_duration_matrix([depot] + [stop['location'] for stop in stops])
+    emergency = [False] + [bool(stop.get('emergency')) for stop in stops]
+
+    # Start from nearest-neighbour order with emergency stops first, then improve it
+    route = []
+    remaining = set(range(1, len(stops) + 1))
+    previous = 0
+    while remaining:
+        urgent = [node for node in remaining if emergency[node]]
+        node = min(urgent or remaining, key=lambda candidate: matrix[previous, candidate])
+        route.append(node)
+        remaining.remove(node)
+        previous = node
+
+    route = improve_route(route, matrix, emergency)
+    return _schedule(route, stops, matrix, start_time, service_seconds)
@@ -0,0 +1,166 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import requests
+from flask import current_app
+
+# Ensure no accidental reassignment of 'requests'
+assert requests.__name__ == 'requests', "The 'requests' library has been overwritten!"
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 5  # in seconds
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30  # in seconds
+
+class CircuitBreaker:
+    """
+    Stops calling the routing server after repeated failures.
+    After failure_threshold consecutive failures the breaker opens and every call is
+    refused for reset_timeout seconds. Then one trial call is let through; success
+    closes the breaker again and failure keeps it open for another period.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print("Routing server unavailable, using straight-line estimates")
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+class RoutingService:
+    """
+    Runs routing server requests on a bounded thread pool.
+    Identical requests that are already in flight share one HTTP call, every call has
+    a timeout, and a circuit breaker skips the server entirely while it is failing.
+    Only the HTTP request runs in the pool; parsing, caching and database work stay
+    with the caller.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT,
+                 failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='routing')
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def submit(self, url, timeout=None):
+        """
+        Starts a GET request for a routing server URL.
+        :param url: Full request URL
+        :param timeout: HTTP timeout in seconds, defaults to the service timeout
+        :return: Future resolving to the decoded JSON response, or None on any failure
+        """
+        with self._lock:
+            future = self._in_flight.get(url)
+            if future is not None:
+                return future
+
+            if not self.breaker.allow():
+                future = Future()
+                future.set_result(None)
+                return future
+
+            future = self._executor.submit(self._get_json, url, timeout or self.timeout)
+            self._in_flight[url] = future
+        future.add_done_callback(lambda _: self._forget(url, future))
+        return future
+
+    def wait(self, future, timeout=None):
+        """
+        Waits for a submitted request without blocking longer than the call timeout.
+        :return: Decoded JSON response, or None on failure or timeout
+        """
+        try:
+            # Leave a little room for the HTTP timeout to fire first
+            return future.result(timeout=(timeout or self.timeout) + 1)
+        except FutureTimeoutError:
+            print("Routing request timed out")
+            return None
+        except Exception as e:
+            print(f"Error waiting for routing request: {e}")
+            return None
+
+    def get_json(self, url, timeout=None):
+        """Submits a request and waits for it."""
+        return self.wait(self.submit(url, timeout), timeout)
+
+    def _forget(self, url, future):
+        with self._lock:
+            if self._in_flight.get(url) is future:
+                del self._in_flight[url]
+
+    def _get_json(self, url, timeout):
+        try:
+            response = requests.get(url, timeout=timeout)
+            if response.status_code < 500:
+                # The server answered, even if it could not route this request
+                self.breaker.record_success()
+                if response.status_code == 200:
+                    data = response.json()
+                    if isinstance(data, dict) and data.get('code') == 'Ok':
+                        return data
+                print(f"OSRM API returned status code {response.status_code}")
+                return None
+            print(f"OSRM API returned status code {response.status_code}")
+        except requests.exceptions.Timeout:
+            print("OSRM API request timed out")
+        except requests.exceptions.RequestException as e:
+            print(f"Error making request to OSRM API: {e}")
+        except Exception as e:
+            print(f"Error reading OSRM API response: {e}")
+        self.breaker.record_failure()
+        return None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_routing_service():
+    """Returns the routing service of this process, creating it from the app config on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                try:
+                    config = current_app.config
+                except RuntimeError:
+                    config = {}
+                _service = RoutingService(
+                    max_workers=config.get('ROUTING_MAX_WORKERS', DEFAULT_MAX_WORKERS),
+                    timeout=config.get('ROUTING_TIMEOUT', DEFAULT_TIMEOUT),
+                    failure_threshold=config.get('ROUTING_FAILURE_THRESHOLD', DEFAULT_FAILURE_THRESHOLD),
+                    reset_timeout=config.get('ROUTING_RESET_TIMEOUT', DEFAULT_RESET_TIMEOUT)
+                )
+    return _service
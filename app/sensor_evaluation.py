@@ -0,0 +1,102 @@
+"""
+Prediction evaluation of the sensor service. Imports scikit-learn, seaborn and
+matplotlib, so it is only loaded when an evaluation runs (see data.evaluate_predictions).
+"""
+import json
+import os
+import numpy as np
+from sklearn.metrics import confusion_matrix, classification_report, accuracy_score, precision_score, recall_score, f1_score
+import seaborn as sns
+import matplotlib.pyplot as plt
+
+def calculate_confusion_matrix(y_true, y_pred):
+    """Calculate and visualize confusion matrix."""
+    cm = confusion_matrix(y_true, y_pred)
+    
+    # Calculate metrics
+    accuracy = accuracy_score(y_true, y_pred)
+    precision = precision_score(y_true, y_pred, average='weighted')
+    recall = recall_score(y_true, y_pred, average='weighted')
+    f1 = f1_score(y_true, y_pred, average='weighted')
+    
+    # Create classification report
+    report = classification_report(y_true, y_pred)
+    
+    # Calculate percentages for confusion matrix
+    cm_percentage = cm.astype('float') / cm.sum(axis=1)[:, np.newaxis]
+    
+    # Create visualization
+    plt.figure(figsize=(10, 8))
+    sns.heatmap(cm_percentage, annot=True, fmt='.2%', cmap='Blues',
+                xticklabels=['No Landslide', 'Landslide'],
+                yticklabels=['No Landslide', 'Landslide'])
+    plt.title('Confusion Matrix (Percentage)')
+    plt.ylabel('True Label')
+    plt.xlabel('Predicted Label')
+    
+    # Save the plot
+    plt.savefig('app/static/data/confusion_matrix.png')
+    plt.close()
+    
+    return {
+        'matrix': cm.tolist(),
+        'matrix_percentage': cm_percentage.tolist(),
+        'metrics': {
+            'accuracy': round(accuracy, 4),
+            'precision': round(precision, 4),
+            'recall': round(recall, 4),
+            'f1_score': round(f1, 4)
+        },
+        'report': report
+    }
+
+def evaluate_predictions(historical_data):
+    """Evaluate prediction accuracy using historical data."""
+    # Check if there's any data to evaluate
+    if not historical_data:
+        print("No historical data available for evaluation")
+        return {
+            'matrix': [[0, 0], [0, 0]],
+            'matrix_percentage': [[0, 0], [0, 0]],
+            'metrics': {
+                'accuracy': 0,
+                'precision': 0,
+                'recall': 0,
+                'f1_score': 0
+            },
+            'report': "No data available for evaluation"
+        }
+    
+    # Prepare data
+    status_codes, risk_codes = historical_data.status_codes()
+    
+    # True label (actual landslide occurrence): Warning or Alert
+    y_true = (status_codes >= 1).astype(int)
+    
+    # Predicted label (based on risk assessment): Medium or High
+    y_pred = (risk_codes >= 1).astype(int)
+    
+    # Check if we have any predictions to evaluate
+    if len(y_true) == 0 or len(y_pred) == 0:
+        print("No predictions available for evaluation")
+        return {
+            'matrix': [[0, 0], [0, 0]],
+            'matrix_percentage': [[0, 0], [0, 0]],
+            'metrics': {
+                'accuracy': 0,
+                'precision': 0,
+                'recall': 0,
+                'f1_score': 0
+            },
+            'report': "No predictions available for evaluation"
+        }
+    
+    # Calculate confusion matrix and metrics
+    evaluation = calculate_confusion_matrix(y_true, y_pred)
+    
+    # Save evaluation results
+    output_file = os.path.join('app', 'static', 'data', 'evaluation_results.json')
+    with open(output_file, 'w') as f:
+        json.dump(evaluation, f, indent=4)
+    
+    return evaluation
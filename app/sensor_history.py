@@ -0,0 +1,449 @@
+import datetime
+import numpy as np
+
+# Numeric fields kept for every reading, one contiguous array each
+METRICS = ('rainfall', 'forecasted_rainfall', 'soil_saturation', 'slope', 'seismic_activity', 'affected_radius')
+# Status and risk level are stored as small integer codes
+STATUS_CODES = ('Normal', 'Warning', 'Alert')
+RISK_CODES = ('Low', 'Medium', 'High')
+# Fields that describe the sensor rather than a reading
+STATIC_FIELDS = ('id', 'name', 'latitude', 'longitude', 'soil_type')
+
+class RingBuffer:
+    """
+    Fixed-capacity circular buffer of rows of values.
+    Every value is written twice, at position i and i + capacity, so the newest n
+    entries are always one contiguous slice and windows never need to be copied.
+    Appending is O(1) and the oldest entry is overwritten once the buffer is full.
+    """
+
+    def __init__(self, capacity, rows=1, dtype=np.float64):
+        self.capacity = capacity
+        self._data = np.zeros((rows, 2 * capacity), dtype=dtype)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, values):
+        """
+        Adds one entry.
+        :param values: One value per row
+        :return: The entry that was overwritten as an array, or None if the buffer was not full
+        """
+        if self._size < self.capacity:
+            position = (self._start + self._size) % self.capacity
+            evicted = None
+            self._size += 1
+        else:
+            position = self._start
+            evicted = self._data[:, position].copy()
+            self._start = (self._start + 1) % self.capacity
+        self._data[:, position] = values
+        self._data[:, position + self.capacity] = values
+        return evicted
+
+    def extend(self, values):
+        """
+        Adds many entries at once, keeping only the newest `capacity` of them when the buffer is empty.
+        :param values: Array of shape (rows, n), oldest first
+        """
+        values = np.asarray(values)
+        if self._size:
+            for i in range(values.shape[1]):
+                self.append(values[:, i])
+            return
+        values = values[:, -self.capacity:] if self.capacity else values[:, :0]
+        count = values.shape[1]
+        self._data[:, :count] = values
+        self._data[:, self.capacity:self.capacity + count] = values
+        self._start = 0
+        self._size = count
+
+    def window(self, last=None):
+        """
+        Returns the newest entries, oldest first, without copying.
+        :param last: Number of entries, defaults to all of them
+        :return: Read-only array of shape (rows, n)
+        """
+        count = self._size if last is None else max(0, min(last, self._size))
+        end = self._start + self._size
+        view = self._data[:, end - count:end]
+        view.flags.writeable = False
+        return view
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+def _code(labels, value):
+    try:
+        return labels.index(value)
+    except ValueError:
+        return -1
+
+def _label(labels, code):
+    return labels[code] if 0 <= code < len(labels) else None
+
+def split_reading(reading):
+    """
+    Splits a reading dictionary into the parts a history stores.
+    :return: (static sensor fields, POSIX timestamp, metric values, [status code, risk code])
+    """
+    timestamp = reading.get('timestamp')
+    try:
+        seconds = datetime.datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        seconds = datetime.datetime.now().timestamp()
+    return (
+        {field: reading.get(field) for field in STATIC_FIELDS},
+        seconds,
+        [float(reading.get(metric) or 0) for metric in METRICS],
+        [_code(STATUS_CODES, reading.get('status')), _code(RISK_CODES, reading.get('risk_level'))]
+    )
+
+class TrendStats:
+    """
+    Running statistics of every metric over the readings currently in a history.
+    Keeps the sums needed for a least-squares line against reading position
+    (sum of t, t^2, y and t*y) plus a Welford mean and sum of squared deviations.
+    Adding or evicting a reading is O(1). Positions only ever grow, so rebuild()
+    is called once per capacity appends to reset them and drop accumulated
+    floating-point error.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.rebuild(np.zeros((width, 0)))
+
+    def rebuild(self, window):
+        """Recomputes every sum exactly from the readings in a (width, n) window."""
+        n = window.shape[1]
+        t = np.arange(n, dtype=np.float64)
+        self.n = n
+        self.first_position = 0
+        self.next_position = n
+        self.sum_t = float(t.sum())
+        self.sum_tt = float((t * t).sum())
+        self.sum_y = window.sum(axis=1).astype(np.float64)
+        self.sum_ty = (window * t).sum(axis=1).astype(np.float64)
+        self.mean = window.mean(axis=1) if n else np.zeros(self.width)
+        self.m2 = ((window - self.mean[:, np.newaxis]) ** 2).sum(axis=1) if n else np.zeros(self.width)
+
+    def add(self, values):
+        """Adds the newest reading."""
+        values = np.asarray(values, dtype=np.float64)
+        t = float(self.next_position)
+        self.next_position += 1
+        self.n += 1
+        self.sum_t += t
+        self.sum_tt += t * t
+        self.sum_y += values
+        self.sum_ty += t * values
+
+        delta = values - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (values - self.mean)
+
+    def remove(self, values):
+        """Removes the oldest reading."""
+        values = np.asarray(values, dtype=np.float64)
+        t = float(self.first_position)
+        self.first_position += 1
+        self.n -= 1
+        if self.n == 0:
+            self.rebuild(np.zeros((self.width, 0)))
+            self.first_position = self.next_position = 0
+            return
+        self.sum_t -= t
+        self.sum_tt -= t * t
+        self.sum_y -= values
+        self.sum_ty -= t * values
+
+        delta = values - self.mean
+        self.mean -= delta / self.n
+        self.m2 -= delta * (values - self.mean)
+
+    def summaries(self, columns):
+        """
+        :param columns: Positions of metrics in METRICS
+        :return: (count, slopes per reading, means, population standard deviations), one array entry per column
+        """
+        if self.n < 2:
+            zeros = np.zeros(len(columns))
+            return self.n, zeros, self.mean[columns].copy() if self.n else zeros.copy(), zeros.copy()
+        sxx = self.sum_tt - self.sum_t * self.sum_t / self.n
+        sxy = self.sum_ty[columns] - self.sum_t * self.sum_y[columns] / self.n
+        variance = np.maximum(self.m2[columns] / self.n, 0.0)
+        return self.n, sxy / sxx, self.mean[columns].copy(), np.sqrt(variance)
+
+    def summary(self, index):
+        """
+        :param index: Position of the metric in METRICS
+        :return: (count, slope per reading, mean, population standard deviation)
+        """
+        count, slopes, means, stds = self.summaries([index])
+        return count, float(slopes[0]), float(means[0]), float(stds[0])
+
+class SensorHistory:
+    """Readings of one sensor: timestamps, one array per metric, and status and risk codes."""
+
+    def __init__(self, capacity):
+        self.info = {}
+        self.timestamps = RingBuffer(capacity)
+        self.values = RingBuffer(capacity, len(METRICS))
+        self.codes = RingBuffer(capacity, 2, dtype=np.int8)
+        self.stats = TrendStats(len(METRICS))
+        self._appends_since_rebuild = 0
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, reading):
+        """
+        Stores the numeric part of a reading.
+        :param reading: Sensor reading dictionary as produced by generate_sensor_data
+        :return: Metric values of the reading that was overwritten, or None
+        """
+        return self.append_values(*split_reading(reading))
+
+    def append_values(self, info, seconds, values, codes):
+        """
+        Stores a reading that is already split into its parts.
+        :param info: Static sensor fields
+        :param seconds: Reading time as a POSIX timestamp
+        :param values: One value per metric in METRICS
+        :param codes: [status code, risk code]
+        :return: Metric values of the reading that was overwritten, or None
+        """
+        self.info = info
+        self.timestamps.append([seconds])
+        self.codes.append(codes)
+        evicted = self.values.append(values)
+        if evicted is not None:
+            self.stats.remove(evicted)
+        self.stats.add(values)
+
+        self._appends_since_rebuild += 1
+        if self._appends_since_rebuild >= self.values.capacity:
+            self.stats.rebuild(self.values.window())
+            self._appends_since_rebuild = 0
+        return evicted
+
+    def load(self, info, seconds, values, codes):
+        """
+        Replaces the stored readings, keeping the newest `capacity` of them.
+        :param info: Static sensor fields
+        :param seconds: Array (n,) of POSIX timestamps, oldest first
+        :param values: Array (n, len(METRICS))
+        :param codes: Array (n, 2) of status and risk codes
+        """
+        self.info = info
+        for buffer in (self.timestamps, self.values, self.codes):
+            buffer.clear()
+        self.timestamps.extend(np.asarray(seconds, dtype=np.float64)[np.newaxis, :])
+        self.values.extend(np.asarray(values, dtype=np.float64).T)
+        self.codes.extend(np.asarray(codes, dtype=np.int8).T)
+        self.stats.rebuild(self.values.window())
+        self._appends_since_rebuild = 0
+
+    def metric(self, name, last=None):
+        """
+        Returns the values of one metric, oldest first, as a contiguous read-only view.
+        :param name: One of METRICS
+        :param last: Number of newest readings, defaults to all of them
+        """
+        return self.values.window(last)[METRICS.index(name)]
+
+    def readings(self):
+        """Rebuilds the stored readings as dictionaries in the historical_data.json format."""
+        timestamps = self.timestamps.window()[0]
+        values = self.values.window()
+        codes = self.codes.window()
+        readings = []
+        for i in range(len(self)):
+            reading = dict(self.info)
+            reading['timestamp'] = datetime.datetime.fromtimestamp(timestamps[i]).isoformat()
+            for m, metric in enumerate(METRICS):
+                reading[metric] = float(values[m, i])
+            reading['affected_radius'] = int(values[METRICS.index('affected_radius'), i])
+            reading['status'] = _label(STATUS_CODES, int(codes[0, i]))
+            reading['risk_level'] = _label(RISK_CODES, int(codes[1, i]))
+            reading['last_reading'] = reading['timestamp']
+            readings.append(reading)
+        return readings
+
+class SensorHistoryStore:
+    """
+    Per-sensor reading history with a fixed number of readings per sensor.
+    Sensor ids are normalised to strings, matching the keys of historical_data.json.
+    Readings added since the last take_unsaved() are also kept aside so they can be
+    persisted without rewriting the whole history.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._sensors = {}
+        self._unsaved = []
+
+    def __contains__(self, sensor_id):
+        return str(sensor_id) in self._sensors
+
+    def __len__(self):
+        return len(self._sensors)
+
+    def __iter__(self):
+        return iter(self._sensors)
+
+    def items(self):
+        return self._sensors.items()
+
+    def get(self, sensor_id):
+        """:return: SensorHistory of the sensor, or None if it has no readings"""
+        return self._sensors.get(str(sensor_id))
+
+    def append(self, sensor_id, reading):
+        """Adds a reading to a sensor's history, evicting its oldest reading when full."""
+        key = str(sensor_id)
+        if key not in self._sensors:
+            self._sensors[key] = SensorHistory(self.capacity)
+        info, seconds, values, codes = split_reading(reading)
+        self._unsaved.append(([key], [seconds], [values], [codes]))
+        return self._sensors[key].append_values(info, seconds, values, codes)
+
+    def trend_summary(self, sensor_id, name):
+        """
+        Running trend statistics of one metric of one sensor, in O(1).
+        :return: (count, slope per reading, mean, population standard deviation)
+        """
+        history = self.get(sensor_id)
+        if history is None:
+            return 0, 0.0, 0.0, 0.0
+        return history.stats.summary(METRICS.index(name))
+
+    def append_batch(self, sensor_ids, infos, seconds, values, codes):
+        """
+        Adds one reading to each of many sensors.
+        :param sensor_ids: Sensor ids
+        :param infos: Static sensor fields of each sensor
+        :param seconds: Reading time as a POSIX timestamp, shared by all readings
+        :param values: Array of shape (sensors, len(METRICS))
+        :param codes: Array of shape (sensors, 2) of status and risk codes
+        """
+        keys = [str(sensor_id) for sensor_id in sensor_ids]
+        self._unsaved.append((keys, np.full(len(keys), seconds), values, codes))
+        values = np.asarray(values, dtype=np.float64).tolist()
+        codes = np.asarray(codes).tolist()
+        for key, info, row, code in zip(keys, infos, values, codes):
+            history = self._sensors.get(key)
+            if history is None:
+                history = self._sensors[key] = SensorHistory(self.capacity)
+            history.append_values(info, seconds, row, code)
+
+    def take_unsaved(self):
+        """
+        Returns the readings added since the last call and forgets them.
+        :return: (sensor ids, timestamps (n,), values (n, len(METRICS)), codes (n, 2)), oldest first
+        """
+        chunks, self._unsaved = self._unsaved, []
+        if not chunks:
+            return [], np.empty(0), np.empty((0, len(METRICS))), np.empty((0, 2), dtype=np.int8)
+        return (
+            [key for keys, _, _, _ in chunks for key in keys],
+            np.concatenate([np.asarray(seconds, dtype=np.float64) for _, seconds, _, _ in chunks]),
+            np.concatenate([np.asarray(values, dtype=np.float64).reshape(-1, len(METRICS)) for _, _, values, _ in chunks]),
+            np.concatenate([np.asarray(codes, dtype=np.int8).reshape(-1, 2) for _, _, _, codes in chunks])
+        )
+
+    def infos(self):
+        """:return: Dictionary of sensor id to its static fields"""
+        return {key: history.info for key, history in self._sensors.items()}
+
+    def load_records(self, infos, sensor_ids, seconds, values, codes):
+        """
+        Replaces the stored history with readings loaded from storage. Loaded readings
+        are not returned by take_unsaved().
+        :param infos: Dictionary of sensor id to static fields
+        :param sensor_ids: Array (n,) of sensor ids, as strings
+        :param seconds: Array (n,) of POSIX timestamps, oldest first
+        :param values: Array (n, len(METRICS))
+        :param codes: Array (n, 2) of status and risk codes
+        """
+        self._sensors = {}
+        self._unsaved = []
+        sensor_ids = np.asarray(sensor_ids)
+        if len(sensor_ids) == 0:
+            return
+        keys, inverse = np.unique(sensor_ids, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+        for k, key in enumerate(keys.tolist()):
+            rows = order[bounds[k]:bounds[k + 1]][-self.capacity:]
+            history = self._sensors[key] = SensorHistory(self.capacity)
+            history.load(infos.get(key, {}), seconds[rows], values[rows], codes[rows])
+
+    def trend_summaries(self, sensor_ids, names):
+        """
+        Running trend statistics of several metrics for many sensors at once, computed
+        with the same operations as TrendStats.summaries so the results are identical.
+        :return: (counts of shape (sensors,), then slopes, means and standard deviations
+                 of shape (sensors, len(names))); sensors without readings are all zero
+        """
+        columns = [METRICS.index(name) for name in names]
+        empty = TrendStats(len(METRICS))
+        stats = [history.stats if history is not None else empty
+                 for history in map(self.get, sensor_ids)]
+
+        counts = np.array([s.n for s in stats], dtype=int)
+        sum_t = np.array([s.sum_t for s in stats])[:, np.newaxis]
+        sum_tt = np.array([s.sum_tt for s in stats])[:, np.newaxis]
+        sum_y = np.array([s.sum_y for s in stats]).reshape(len(stats), -1)[:, columns]
+        sum_ty = np.array([s.sum_ty for s in stats]).reshape(len(stats), -1)[:, columns]
+        means = np.array([s.mean for s in stats]).reshape(len(stats), -1)[:, columns]
+        m2 = np.array([s.m2 for s in stats]).reshape(len(stats), -1)[:, columns]
+
+        n = counts[:, np.newaxis].astype(np.float64)
+        enough = counts >= 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sxx = sum_tt - sum_t * sum_t / n
+            sxy = sum_ty - sum_t * sum_y / n
+            slopes = np.where(enough[:, np.newaxis], sxy / sxx, 0.0)
+            stds = np.where(enough[:, np.newaxis], np.sqrt(np.maximum(m2 / n, 0.0)), 0.0)
+        return counts, slopes, means, stds
+
+    def metric(self, sensor_id, name, last=None):
+        """
+        Returns one metric of one sensor as a contiguous read-only view, oldest first.
+        :return: Array of values, empty if the sensor has no readings
+        """
+        history = self.get(sensor_id)
+        if history is None:
+            return np.empty(0)
+        return history.metric(name, last)
+
+    def status_codes(self):
+        """
+        Status and risk codes of every stored reading of every sensor.
+        :return: (status codes, risk codes) as integer arrays indexing STATUS_CODES and RISK_CODES
+        """
+        if not self._sensors:
+            return np.empty(0, dtype=np.int8), np.empty(0, dtype=np.int8)
+        codes = np.concatenate([history.codes.window() for history in self._sensors.values()], axis=1)
+        return codes[0], codes[1]
+
+    def to_json(self):
+        """:return: Dictionary of sensor id to list of readings, as stored in historical_data.json"""
+        return {sensor_id: history.readings() for sensor_id, history in self._sensors.items()}
+
+    def load_json(self, data):
+        """
+        Replaces the stored history with readings in the historical_data.json format.
+        Only the newest `capacity` readings of each sensor are kept, and all of them
+        count as unsaved.
+        """
+        self._sensors = {}
+        self._unsaved = []
+        for sensor_id, readings in data.items():
+            for reading in readings[-self.capacity:]:
+                self.append(sensor_id, reading)
@@ -0,0 +1,318 @@
+import atexit
+import json
+import threading
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy import bindparam, func, insert, or_, update
+from app.models import Sensor, SensorReading
+from app.extensions import db
+from app.sensor_snapshot import bump_snapshot_version
+
+try:
+    import msgpack
+except ImportError:
+    # msgpack bodies are only accepted when the package is installed
+    msgpack = None
+
+# Reading fields accepted by the ingestion API, in column order
+READING_FIELDS = ('rainfall', 'forecasted_rainfall', 'soil_saturation', 'slope', 'seismic_activity',
+                  'moisture_level', 'temperature', 'battery_level')
+# Accepted range of every field; the first five match data.validate_sensor_data
+VALID_RANGES = {
+    'rainfall': (0, 300),
+    'forecasted_rainfall': (0, 300),
+    'soil_saturation': (0, 100),
+    'slope': (0, 90),
+    'seismic_activity': (0, 10),
+    'moisture_level': (0, 100),
+    'temperature': (-50, 70),
+    'battery_level': (0, 100)
+}
+# Sensor columns holding the latest value of a reading field
+LATEST_FIELDS = ('moisture_level', 'temperature', 'battery_level')
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack')
+MAX_ERRORS = 20  # rejected readings described in a response
+
+class UnsupportedFormat(Exception):
+    pass
+
+def parse_readings(body, mimetype):
+    """
+    Decodes a batch of readings: a JSON array or object, JSON lines, or msgpack (one
+    array of readings or a stream of readings).
+    :return: List of reading dictionaries, with None for JSON lines that could not be decoded
+    :raises UnsupportedFormat: For msgpack bodies when msgpack is not installed
+    :raises ValueError: If a JSON array or msgpack body cannot be decoded
+    """
+    if mimetype in MSGPACK_TYPES:
+        if msgpack is None:
+            raise UnsupportedFormat('msgpack is not installed on this server')
+        unpacker = msgpack.Unpacker(raw=False)
+        unpacker.feed(body)
+        readings = []
+        try:
+            for item in unpacker:
+                readings.extend(item if isinstance(item, list) else [item])
+        except (msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as e:
+            raise ValueError(f'Invalid msgpack body: {e}')
+        return readings
+
+    if mimetype == 'application/json':
+        data = json.loads(body)
+        return data if isinstance(data, list) else [data]
+
+    # JSON lines; a line that cannot be decoded only rejects that reading
+    readings = []
+    for line in body.splitlines():
+        if line.strip():
+            try:
+                readings.append(json.loads(line))
+            except json.JSONDecodeError:
+                readings.append(None)
+    return readings
+
+def _sensor_id(reading):
+    value = reading.get('sensor_id', reading.get('id'))
+    if isinstance(value, bool):
+        return -1
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+def _value(value):
+    """:return: The value as a float, NaN when missing and infinity when not a number"""
+    if value is None:
+        return np.nan
+    if isinstance(value, bool):
+        return np.inf
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.inf
+
+def parse_timestamp(value, default):
+    """:return: POSIX timestamp of an ISO 8601 string or epoch seconds, `default` when missing, NaN when invalid"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return np.nan
+    if parsed.tzinfo is None:
+        # Timestamps without an offset are taken as UTC, like the rest of the database
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+class ReadingBatch:
+    """
+    Readings stored as columns: sensor ids, POSIX timestamps and an (n, len(READING_FIELDS))
+    array of values with NaN for fields a reading does not include.
+    """
+
+    def __init__(self, sensor_ids, timestamps, values):
+        self.sensor_ids = sensor_ids
+        self.timestamps = timestamps
+        self.values = values
+
+    def __len__(self):
+        return len(self.sensor_ids)
+
+    @classmethod
+    def from_readings(cls, readings):
+        now = datetime.now(timezone.utc).timestamp()
+        readings = [reading if isinstance(reading, dict) else {} for reading in readings]
+        return cls(
+            np.array([_sensor_id(reading) for reading in readings], dtype=np.int64),
+            np.array([parse_timestamp(reading.get('timestamp'), now) for reading in readings], dtype=float),
+            np.array([[_value(reading.get(field)) for field in READING_FIELDS] for reading in readings],
+                     dtype=float).reshape(len(readings), len(READING_FIELDS))
+        )
+
+    @classmethod
+    def concatenate(cls, batches):
+        return cls(
+            np.concatenate([batch.sensor_ids for batch in batches]),
+            np.concatenate([batch.timestamps for batch in batches]),
+            np.concatenate([batch.values for batch in batches])
+        )
+
+    def select(self, mask):
+        return ReadingBatch(self.sensor_ids[mask], self.timestamps[mask], self.values[mask])
+
+def validate_readings(batch, known_sensor_ids):
+    """
+    Vectorized form of data.validate_sensor_data for ingested readings.
+    A reading is valid when it names a known sensor, has a valid timestamp and at least
+    one field, and every field it includes is a number in its VALID_RANGES range.
+    :return: (boolean array of valid readings, list of (index, error) for the first MAX_ERRORS rejected ones)
+    """
+    low = np.array([VALID_RANGES[field][0] for field in READING_FIELDS])
+    high = np.array([VALID_RANGES[field][1] for field in READING_FIELDS])
+    missing = np.isnan(batch.values)
+    with np.errstate(invalid='ignore'):
+        in_range = missing | ((batch.values >= low) & (batch.values <= high))
+
+    checks = [
+        (np.isin(batch.sensor_ids, list(known_sensor_ids)), 'Unknown or missing sensor_id'),
+        (np.isfinite(batch.timestamps), 'Invalid timestamp'),
+        (~missing.all(axis=1), 'No reading fields'),
+        (in_range.all(axis=1), 'Value out of range or not a number')
+    ]
+    valid = np.ones(len(batch), dtype=bool)
+    reasons = np.full(len(batch), '', dtype=object)
+    for passed, reason in checks:
+        reasons[valid & ~passed] = reason
+        valid &= passed
+
+    rejected = np.flatnonzero(~valid)[:MAX_ERRORS]
+    return valid, [(int(i), reasons[i]) for i in rejected]
+
+def _utc(timestamps):
+    return [datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None) for ts in timestamps.tolist()]
+
+def write_readings(batch):
+    """
+    Bulk inserts readings into sensor_readings and moves each sensor's last_reading and
+    latest-value columns forward to its newest reading, in one transaction. A sensor whose
+    last_reading is already newer than the batch keeps its values.
+    :return: Number of readings written
+    """
+    if not len(batch):
+        return 0
+    timestamps = _utc(batch.timestamps)
+    values = [[None if np.isnan(value) else value for value in row] for row in batch.values.tolist()]
+    db.session.execute(insert(SensorReading), [
+        dict(zip(READING_FIELDS, row), sensor_id=sensor_id, timestamp=timestamp)
+        for sensor_id, timestamp, row in zip(batch.sensor_ids.tolist(), timestamps, values)
+    ])
+
+    # Newest timestamp of each sensor, and newest value of each field it reported
+    latest_rows = {}
+    for field in (None,) + LATEST_FIELDS:
+        column = None if field is None else READING_FIELDS.index(field)
+        rows = np.arange(len(batch)) if field is None else np.flatnonzero(~np.isnan(batch.values[:, column]))
+        order = rows[np.lexsort((batch.timestamps[rows], batch.sensor_ids[rows]))]
+        last = order[np.append(np.diff(batch.sensor_ids[order]) != 0, True)] if len(order) else order
+        for i in last.tolist():
+            params = latest_rows.setdefault(int(batch.sensor_ids[i]), {f'b_{name}': None for name in LATEST_FIELDS})
+            if field is None:
+                params.update(b_sid=int(batch.sensor_ids[i]), b_timestamp=timestamps[i])
+            else:
+                params[f'b_{field}'] = values[i][column]
+
+    table = Sensor.__table__
+    latest = update(table).where(
+        table.c.sid == bindparam('b_sid')
+    ).where(
+        or_(table.c.last_reading.is_(None), table.c.last_reading <= bindparam('b_timestamp'))
+    ).values(
+        last_reading=bindparam('b_timestamp'),
+        # A reading without a field keeps the sensor's previous value
+        **{field: func.coalesce(bindparam(f'b_{field}'), table.c[field]) for field in LATEST_FIELDS}
+    )
+    db.session.execute(latest, list(latest_rows.values()))
+    db.session.commit()
+    return len(batch)
+
+class SensorIngestBuffer:
+    """
+    Buffers validated readings in memory and writes them in bulk from a background thread,
+    every `flush_interval` seconds or as soon as `flush_rows` readings are waiting. One
+    transaction covers a whole flush instead of one per reading. The thread is started by
+    the first reading, so processes that never ingest do not run it.
+    """
+
+    def __init__(self, app, flush_interval, flush_rows, max_pending):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.max_pending = max_pending
+        self._pending = []
+        self._pending_rows = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, batch):
+        """
+        Queues readings for the next flush.
+        :return: False if the buffer is full and the readings were not queued
+        """
+        with self._lock:
+            if self._pending_rows + len(batch) > self.max_pending:
+                return False
+            self._pending.append(batch)
+            self._pending_rows += len(batch)
+            if self._pending_rows >= self.flush_rows:
+                self._wakeup.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sensor-ingest', daemon=True)
+                self._thread.start()
+        return True
+
+    def pending(self):
+        return self._pending_rows
+
+    def flush(self):
+        """
+        Writes every queued reading and updates the rollups of their time buckets.
+        If the readings cannot be written they are queued again.
+        :return: Number of readings written
+        """
+        with self._flush_lock:
+            with self._lock:
+                batches, self._pending, self._pending_rows = self._pending, [], 0
+            if not batches:
+                return 0
+            batch = ReadingBatch.concatenate(batches)
+            try:
+                with self.app.app_context():
+                    written = write_readings(batch)
+            except Exception as e:
+                print(f"Error writing {len(batch)} sensor readings: {str(e)}")
+                with self.app.app_context():
+                    db.session.rollback()
+                with self._lock:
+                    self._pending.insert(0, batch)
+                    self._pending_rows += len(batch)
+                return 0
+
+            # Imported here since sensor_rollups uses this module's field list
+            from app.sensor_rollups import update_rollups
+            try:
+                with self.app.app_context():
+                    update_rollups(batch.sensor_ids, batch.timestamps)
+            except Exception as e:
+                # The readings are stored; their buckets are rebuilt with the next readings
+                # of the same sensors, or by rebuild_rollups
+                print(f"Error updating sensor reading rollups: {str(e)}")
+                with self.app.app_context():
+                    db.session.rollback()
+
+            # The sensor read model merges the stored readings; a new version rebuilds it
+            try:
+                bump_snapshot_version()
+            except Exception as e:
+                print(f"Error bumping the sensor data version: {str(e)}")
+            return written
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+def init_sensor_ingest(app):
+    """Creates the ingestion buffer of this process and flushes it when the process exits."""
+    buffer = SensorIngestBuffer(
+        app,
+        app.config['SENSOR_INGEST_FLUSH_MS'] / 1000,
+        app.config['SENSOR_INGEST_FLUSH_ROWS'],
+        app.config['SENSOR_INGEST_MAX_PENDING']
+    )
+    app.extensions['sensor_ingest'] = buffer
+    atexit.register(buffer.flush)
@@ -0,0 +1,305 @@
+from datetime import datetime
+import numpy as np
+from flask import request
+from sqlalchemy import select
+from app.models import Sensor, SensorReading
+from app.extensions import db
+from app.sensor_ingest import LATEST_FIELDS, READING_FIELDS as INGESTED_FIELDS
+from app.sensor_snapshot import get_snapshot
+from app.sensor_responses import snapshot_response
+
+# Reading fields shown as N/A for sensors without a current reading
+READING_FIELDS = ('rainfall', 'forecasted_rainfall', 'soil_saturation', 'slope', 'seismic_activity',
+                  'risk_level', 'affected_radius', 'predicted_landslide_time')
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _newer(timestamp, other):
+    """:return: Whether ISO timestamp is later than other, or other is missing or invalid"""
+    try:
+        return datetime.fromisoformat(timestamp) > datetime.fromisoformat(other)
+    except (TypeError, ValueError):
+        return True
+
+def sensors_with_readings():
+    """
+    Loads every sensor with its newest reading from the ingestion API. The newest
+    reading of each sensor is found with one index seek, not a scan of all readings.
+    :return: List of (Sensor, SensorReading or None), ordered by sensor id
+    """
+    newest_id = select(SensorReading.id).where(
+        SensorReading.sensor_id == Sensor.sid
+    ).order_by(SensorReading.timestamp.desc()).limit(1).correlate(Sensor).scalar_subquery()
+    return db.session.query(Sensor, SensorReading).outerjoin(
+        SensorReading, SensorReading.id == newest_id
+    ).order_by(Sensor.sid).all()
+
+def ingested_reading(sensor, reading):
+    """
+    Fields of the latest reading a sensor sent through the ingestion API: the sensor's
+    latest-value columns, which keep the newest value of each field, and the other
+    fields of its newest stored reading.
+    :return: Dictionary of reading fields, 'timestamp' and 'last_reading', or None without a reading
+    """
+    if sensor.last_reading is None:
+        return None
+    values = {}
+    if reading is not None:
+        values.update({field: getattr(reading, field) for field in INGESTED_FIELDS
+                       if getattr(reading, field) is not None})
+    values.update({field: getattr(sensor, field) for field in LATEST_FIELDS
+                   if getattr(sensor, field) is not None})
+    values['timestamp'] = values['last_reading'] = sensor.last_reading.isoformat()
+    return values
+
+def merge_ingested_readings(json_sensors, rows):
+    """
+    Adds the readings stored by the ingestion API to the published readings. A published
+    entry is updated with a newer stored reading; sensors that only have stored readings
+    are added with N/A for the fields only the sensor service computes.
+    :param json_sensors: List of sensor data dictionaries from sensor_data.json
+    :param rows: List of (Sensor, SensorReading or None) as returned by sensors_with_readings
+    :return: New list of sensor data dictionaries; the published entries are not modified
+    """
+    ingested = {}
+    for sensor, reading in rows:
+        values = ingested_reading(sensor, reading)
+        if values:
+            ingested[sensor.sid] = (sensor, values)
+
+    merged = []
+    published_ids = set()
+    for entry in json_sensors:
+        sensor_id = entry.get('id')
+        published_ids.add(sensor_id)
+        if sensor_id in ingested and _newer(ingested[sensor_id][1]['timestamp'], entry.get('timestamp')):
+            entry = {**entry, **ingested[sensor_id][1]}
+        merged.append(entry)
+
+    for sensor_id, (sensor, values) in ingested.items():
+        if sensor_id in published_ids:
+            continue
+        entry = {
+            'id': sensor.sid,
+            'name': sensor.name,
+            'latitude': sensor.latitude,
+            'longitude': sensor.longitude,
+            'soil_type': sensor.soil_type,
+            'status': sensor.status,
+            'operational_status': sensor.operational_status
+        }
+        entry.update({field: 'N/A' for field in READING_FIELDS})
+        entry.update(values)
+        merged.append(entry)
+    return merged
+
+def latest_active_sensors(sensors):
+    """
+    Latest reading of each active sensor, de-duplicated by name.
+    :param sensors: List of sensor data dictionaries from sensor_data.json
+    """
+    # Create a dictionary to store the latest active sensor for each name
+    sensor_dict = {}
+
+    # Process each sensor
+    for sensor in sensors:
+        name = sensor.get('name')
+        status = sensor.get('operational_status', 'Active')
+
+        # Only process active sensors
+        if status == 'Active':
+            # If this name doesn't exist in our dictionary, or if this sensor is more recent
+            if name not in sensor_dict:
+                sensor_dict[name] = sensor
+            else:
+                # Compare timestamps if available, otherwise keep the first one
+                current_time = sensor.get('last_reading', '')
+                existing_time = sensor_dict[name].get('last_reading', '')
+                if current_time > existing_time:
+                    sensor_dict[name] = sensor
+
+    # Convert dictionary values back to list
+    return list(sensor_dict.values())
+
+def admin_sensors(json_sensors, db_sensors):
+    """
+    Merges published readings with sensors that only exist in the database.
+    Active sensors show their latest published reading, the same data the user map
+    shows; inactive sensors and sensors without a reading yet show N/A values.
+    :param json_sensors: List of sensor data dictionaries from sensor_data.json
+    :param db_sensors: List of Sensor rows
+    :return: List of sensor dictionaries sorted by id
+    """
+    unique_sensors = {}
+    for sensor in json_sensors:
+        sensor_id = sensor.get('id')
+        if sensor_id and sensor_id not in unique_sensors:
+            unique_sensors[sensor_id] = sensor
+    for sensor in db_sensors:
+        if sensor.sid not in unique_sensors:
+            unique_sensors[sensor.sid] = {
+                'id': sensor.sid,
+                'name': sensor.name,
+                'latitude': sensor.latitude,
+                'longitude': sensor.longitude,
+                'soil_type': sensor.soil_type,
+                'status': sensor.status,
+                'operational_status': sensor.operational_status,
+                'is_inactive': (sensor.operational_status or '').lower() != 'active',
+                'has_reading': False
+            }
+
+    result = []
+    for sensor in unique_sensors.values():
+        is_inactive = (sensor.get('operational_status') or '').lower() != 'active' or sensor.get('is_inactive', False)
+        if is_inactive or sensor.get('has_reading') is False:
+            row = {field: sensor.get(field) for field in ('id', 'name', 'latitude', 'longitude', 'soil_type')}
+            row.update({field: 'N/A' for field in READING_FIELDS})
+            row.update({
+                'status': 'Inactive' if is_inactive else 'No data',
+                'operational_status': 'Inactive' if is_inactive else sensor.get('operational_status'),
+                'timestamp': sensor.get('timestamp', ''),
+                'is_inactive': is_inactive
+            })
+            result.append(row)
+        else:
+            result.append(sensor)
+    result.sort(key=lambda x: x['id'])
+    return result
+
+def sensor_list(json_sensors, db_sensors):
+    """
+    Lists every known sensor once, preferring the database row over the published reading.
+    :return: List of dictionaries with the sensor's fields and its 'source'
+    """
+    sensors = [{
+        'id': sensor.sid,
+        'name': sensor.name,
+        'latitude': sensor.latitude,
+        'longitude': sensor.longitude,
+        'soil_type': sensor.soil_type,
+        'status': sensor.status,
+        'operational_status': sensor.operational_status,
+        'source': 'database'
+    } for sensor in db_sensors]
+    seen_ids = {sensor['id'] for sensor in sensors}
+    for sensor in json_sensors:
+        if sensor['id'] not in seen_ids:
+            seen_ids.add(sensor['id'])
+            sensors.append({
+                'id': sensor['id'],
+                'name': sensor['name'],
+                'latitude': sensor['latitude'],
+                'longitude': sensor['longitude'],
+                'soil_type': sensor['soil_type'],
+                'status': sensor['status'],
+                'operational_status': sensor.get('operational_status', 'Active'),
+                'source': 'json'
+            })
+    return sensors
+
+class SensorView:
+    """
+    One list of sensor dictionaries with column arrays of the fields it can be filtered by.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.latitude = np.array([_float(row.get('latitude')) for row in rows], dtype=float)
+        self.longitude = np.array([_float(row.get('longitude')) for row in rows], dtype=float)
+        self.status = np.array([str(row.get('status')).lower() for row in rows], dtype=object)
+        self.soil_type = np.array([str(row.get('soil_type')).lower() for row in rows], dtype=object)
+
+    def select(self, filters):
+        """
+        :param filters: Filters as returned by parse_filters
+        :return: The rows matching every filter, in order
+        """
+        if not filters:
+            return self.rows
+        filters = dict(filters)
+        mask = np.ones(len(self.rows), dtype=bool)
+        if 'status' in filters:
+            mask &= np.isin(self.status, filters['status'])
+        if 'soil_type' in filters:
+            mask &= np.isin(self.soil_type, filters['soil_type'])
+        if 'bbox' in filters:
+            min_lng, min_lat, max_lng, max_lat = filters['bbox']
+            # Sensors without coordinates compare as NaN and are left out
+            mask &= (self.latitude >= min_lat) & (self.latitude <= max_lat)
+            mask &= (self.longitude >= min_lng) & (self.longitude <= max_lng)
+        return [self.rows[i] for i in np.flatnonzero(mask)]
+
+class SensorReadModel:
+    """
+    Latest reading of every sensor merged with the sensor table, built once per published
+    snapshot and shared by the admin and user endpoints. Admin changes to sensors publish
+    a new snapshot and stored ingestion readings bump its version, so the sensor table is
+    read once per version instead of on every poll.
+    Views: 'admin' (every sensor, N/A values without a reading), 'user' (active sensors
+    with a reading, one per name) and 'sensors' (sensor fields only).
+    """
+
+    def __init__(self, json_sensors, db_sensors):
+        """
+        :param json_sensors: Published readings, merged with the stored ones
+        :param db_sensors: List of Sensor rows
+        """
+        self.views = {
+            'admin': SensorView(admin_sensors(json_sensors, db_sensors)),
+            'user': SensorView(latest_active_sensors(json_sensors)),
+            'sensors': SensorView(sensor_list(json_sensors, db_sensors))
+        }
+
+    def view(self, name):
+        return self.views[name]
+
+def _build_read_model(json_sensors):
+    rows = sensors_with_readings()
+    return SensorReadModel(merge_ingested_readings(json_sensors, rows), [sensor for sensor, _ in rows])
+
+def sensor_read_model(snapshot):
+    """:return: The SensorReadModel of a snapshot, built on first use"""
+    return snapshot.cached('read_model', _build_read_model)
+
+def parse_filters(args):
+    """
+    Reads the filter query parameters. status and soil_type take comma-separated values;
+    bbox is min_lng,min_lat,max_lng,max_lat.
+    :raises ValueError: If bbox is not four numbers
+    :return: Tuple of (name, value) pairs, empty without filters
+    """
+    filters = []
+    for name in ('status', 'soil_type'):
+        if args.get(name):
+            filters.append((name, tuple(sorted({value.strip().lower() for value in args[name].split(',') if value.strip()}))))
+    if args.get('bbox'):
+        try:
+            bbox = tuple(float(value) for value in args['bbox'].split(','))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4:
+            raise ValueError('bbox must be min_lng,min_lat,max_lng,max_lat')
+        filters.append(('bbox', bbox))
+    return tuple(filters)
+
+def sensor_response(view, full=None):
+    """
+    Responds with one view of the current read model, filtered by the request's status,
+    bbox and soil_type parameters. Supports If-None-Match, gzip and ?since=<version>.
+    Unfiltered responses are encoded once per snapshot.
+    :param full: Function wrapping the list for the plain response, defaults to the list itself
+    :raises ValueError: If a filter parameter is malformed
+    """
+    filters = parse_filters(request.args)
+    return snapshot_response(
+        get_snapshot(),
+        (view, filters),
+        lambda snapshot: sensor_read_model(snapshot).view(view).select(filters),
+        full,
+        cache=not filters
+    )
@@ -0,0 +1,86 @@
+import gzip
+import hashlib
+import json
+from flask import current_app, request
+from app.sensor_snapshot import find_snapshot
+
+class PreparedBody:
+    """A JSON response body encoded once, together with its gzip encoding and ETag."""
+
+    def __init__(self, data):
+        self.body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        self.gzipped = gzip.compress(self.body, compresslevel=6)
+        # Content hash, so identical data gets the same ETag whatever version it came from
+        self.etag = hashlib.sha1(self.body).hexdigest()
+
+def diff_by_id(old_items, new_items):
+    """
+    Compares two lists of sensor dictionaries by their 'id'.
+    :return: (items that are new or changed, ids that were removed)
+    """
+    old = {item.get('id'): item for item in old_items}
+    new_ids = set()
+    changed = []
+    for item in new_items:
+        new_ids.add(item.get('id'))
+        if old.get(item.get('id')) != item:
+            changed.append(item)
+    removed = [item_id for item_id in old if item_id not in new_ids]
+    return changed, removed
+
+def prepared_response(prepared, version=None):
+    """
+    Sends a PreparedBody, answering If-None-Match with 304 and using the gzip
+    encoding when the client accepts it.
+    :param version: Snapshot version, sent as X-Sensor-Version for use with ?since=
+    """
+    if prepared.etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        use_gzip = request.accept_encodings['gzip'] > 0
+        response = current_app.response_class(prepared.gzipped if use_gzip else prepared.body,
+                                              mimetype='application/json')
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(prepared.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    if version is not None:
+        response.headers['X-Sensor-Version'] = str(version)
+    return response
+
+def snapshot_response(snapshot, key, build, full=None, cache=True):
+    """
+    Responds with data derived from a sensor snapshot, encoded once per snapshot.
+    Without ?since= the response is full(items); with ?since=<version> it is
+    {"version", "full", "changed", "removed"} holding only the sensors that differ from
+    that version, or every sensor with "full": true when that version is not available.
+    :param snapshot: Current SensorSnapshot
+    :param key: Cache key for the derived data within the snapshot
+    :param build: Function of a SensorSnapshot returning a list of sensor dictionaries
+    :param full: Function wrapping the list for the plain response, defaults to the list itself
+    :param cache: Whether to keep the result with the snapshot; False for one-off queries
+    """
+    def cached(target, name, function):
+        if cache:
+            return target.cached((name, key), lambda _: function(target))
+        return function(target)
+
+    items = cached(snapshot, 'items', build)
+    version = snapshot.version if snapshot.consistent else None
+    since = request.args.get('since', type=int)
+    if since is None:
+        prepared = cached(snapshot, 'full', lambda _: PreparedBody(full(items) if full else items))
+        return prepared_response(prepared, version)
+
+    # A snapshot that does not match its version file gets no version to resume from
+    previous = find_snapshot(since) if snapshot.consistent else None
+
+    def build_delta(_):
+        if previous is None:
+            return PreparedBody({'version': version, 'full': True, 'changed': items, 'removed': []})
+        changed, removed = diff_by_id(cached(previous, 'items', build), items)
+        return PreparedBody({'version': version, 'full': False, 'changed': changed, 'removed': removed})
+
+    prepared = cached(snapshot, ('delta', since if previous is not None else None), build_delta)
+    return prepared_response(prepared, version)
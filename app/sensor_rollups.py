@@ -0,0 +1,227 @@
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy import and_, delete, insert, or_, select
+from app.models import SensorReading, SensorReadingRollup
+from app.extensions import db
+from app.sensor_ingest import READING_FIELDS
+
+# Rollup resolutions in seconds, finest first; each one is built from the one before it
+RESOLUTIONS = {'1m': 60, '1h': 3600, '1d': 86400}
+DEFAULT_MAX_POINTS = 500
+MAX_POINTS_LIMIT = 5000
+
+def _seconds(timestamps):
+    """:return: Array of POSIX timestamps of naive UTC datetimes"""
+    return np.array([ts.replace(tzinfo=timezone.utc).timestamp() for ts in timestamps], dtype=float)
+
+def _datetime(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+def _aggregate(parts, resolution):
+    """
+    Groups partial aggregates into buckets of `resolution` seconds.
+    :param parts: Dictionary of equal-length arrays: sensor_id, metric (index into
+                  READING_FIELDS), time, count, min, max, sum and last
+    :return: Dictionary of arrays with one entry per (sensor_id, metric, bucket)
+    """
+    bucket = np.floor(parts['time'] / resolution) * resolution
+    order = np.lexsort((parts['time'], bucket, parts['metric'], parts['sensor_id']))
+    sensor_id, metric, bucket = parts['sensor_id'][order], parts['metric'][order], bucket[order]
+    change = np.ones(len(order), dtype=bool)
+    change[1:] = (np.diff(sensor_id) != 0) | (np.diff(metric) != 0) | (np.diff(bucket) != 0)
+    starts = np.flatnonzero(change)
+    ends = np.append(starts[1:], len(order)) - 1
+    return {
+        'sensor_id': sensor_id[starts],
+        'metric': metric[starts],
+        'time': bucket[starts],
+        'count': np.add.reduceat(parts['count'][order], starts),
+        'min': np.minimum.reduceat(parts['min'][order], starts),
+        'max': np.maximum.reduceat(parts['max'][order], starts),
+        'sum': np.add.reduceat(parts['sum'][order], starts),
+        # Sorted by time within a group, so its last entry is the newest
+        'last': parts['last'][order][ends]
+    }
+
+def _raw_parts(spans):
+    """:return: Readings in the spans as one partial aggregate per metric value"""
+    rows = db.session.execute(
+        select(SensorReading.sensor_id, SensorReading.timestamp,
+               *[getattr(SensorReading, field) for field in READING_FIELDS]).where(
+            or_(*[and_(SensorReading.sensor_id == sensor_id,
+                       SensorReading.timestamp >= _datetime(start),
+                       SensorReading.timestamp < _datetime(end))
+                  for sensor_id, start, end in spans]))
+    ).all()
+    if not rows:
+        return None
+    sensor_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    times = _seconds([row[1] for row in rows])
+    values = np.array([row[2:] for row in rows], dtype=float)  # None becomes NaN
+    present = ~np.isnan(values)
+    row_index, metric = np.nonzero(present)
+    value = values[present]
+    return {
+        'sensor_id': sensor_ids[row_index],
+        'metric': metric,
+        'time': times[row_index],
+        'count': np.ones(len(value), dtype=np.int64),
+        'min': value, 'max': value, 'sum': value, 'last': value
+    }
+
+def _rollup_parts(resolution, spans):
+    """:return: Rollups of one resolution in the spans as partial aggregates"""
+    rows = db.session.execute(
+        select(SensorReadingRollup.sensor_id, SensorReadingRollup.metric, SensorReadingRollup.bucket_start,
+               SensorReadingRollup.count, SensorReadingRollup.min, SensorReadingRollup.max,
+               SensorReadingRollup.mean, SensorReadingRollup.last).where(
+            SensorReadingRollup.resolution == resolution,
+            or_(*[and_(SensorReadingRollup.sensor_id == sensor_id,
+                       SensorReadingRollup.bucket_start >= _datetime(start),
+                       SensorReadingRollup.bucket_start < _datetime(end))
+                  for sensor_id, start, end in spans]))
+    ).all()
+    if not rows:
+        return None
+    counts = np.array([row[3] for row in rows], dtype=np.int64)
+    means = np.array([row[6] for row in rows], dtype=float)
+    return {
+        'sensor_id': np.array([row[0] for row in rows], dtype=np.int64),
+        'metric': np.array([READING_FIELDS.index(row[1]) for row in rows], dtype=np.int64),
+        'time': _seconds([row[2] for row in rows]),
+        'count': counts,
+        'min': np.array([row[4] for row in rows], dtype=float),
+        'max': np.array([row[5] for row in rows], dtype=float),
+        'sum': means * counts,
+        'last': np.array([row[7] for row in rows], dtype=float)
+    }
+
+def _merge(spans):
+    """:return: The spans sorted, with overlapping or adjacent spans of a sensor joined"""
+    merged = []
+    for sensor_id, start, end in sorted(spans):
+        if merged and merged[-1][0] == sensor_id and start <= merged[-1][2]:
+            merged[-1][2] = max(merged[-1][2], end)
+        else:
+            merged.append([sensor_id, start, end])
+    return [tuple(span) for span in merged]
+
+def _align(spans, resolution):
+    """:return: The spans widened to whole buckets of `resolution` seconds"""
+    return _merge([(sensor_id, np.floor(start / resolution) * resolution, np.ceil(end / resolution) * resolution)
+                   for sensor_id, start, end in spans])
+
+def rebuild_rollups(spans):
+    """
+    Recomputes every rollup bucket overlapping the spans, in one transaction. Minute
+    buckets are computed from the readings, hour buckets from minute buckets and day
+    buckets from hour buckets. Each level reads only the buckets of its source inside
+    the spans widened to its own buckets, so far apart spans stay separate.
+    :param spans: List of (sensor id, start, end) POSIX timestamps, end excluded
+    """
+    if not spans:
+        return
+    source = None
+    for resolution in RESOLUTIONS.values():
+        aligned = _align(spans, resolution)
+        parts = _raw_parts(aligned) if source is None else _rollup_parts(source, aligned)
+        db.session.execute(delete(SensorReadingRollup).where(
+            SensorReadingRollup.resolution == resolution,
+            or_(*[and_(SensorReadingRollup.sensor_id == sensor_id,
+                       SensorReadingRollup.bucket_start >= _datetime(start),
+                       SensorReadingRollup.bucket_start < _datetime(end))
+                  for sensor_id, start, end in aligned])))
+        if parts is not None:
+            buckets = _aggregate(parts, resolution)
+            db.session.execute(insert(SensorReadingRollup), [{
+                'sensor_id': sensor_id,
+                'resolution': resolution,
+                'metric': READING_FIELDS[metric],
+                'bucket_start': _datetime(start),
+                'count': count,
+                'min': low,
+                'max': high,
+                'mean': total / count,
+                'last': last
+            } for sensor_id, metric, start, count, low, high, total, last in zip(
+                buckets['sensor_id'].tolist(), buckets['metric'].tolist(), buckets['time'].tolist(),
+                buckets['count'].tolist(), buckets['min'].tolist(), buckets['max'].tolist(),
+                buckets['sum'].tolist(), buckets['last'].tolist())])
+        source = resolution
+    db.session.commit()
+
+def update_rollups(sensor_ids, timestamps):
+    """
+    Rebuilds the rollup buckets touched by newly written readings. Each sensor's
+    touched minute buckets become spans, joining only buckets next to each other, so
+    a late reading does not rebuild everything between it and the newest readings.
+    :param sensor_ids: Array of the readings' sensor ids
+    :param timestamps: Array of the readings' POSIX timestamps
+    """
+    if not len(sensor_ids):
+        return
+    minute = RESOLUTIONS['1m']
+    touched = np.unique(np.column_stack((
+        np.asarray(sensor_ids, dtype=np.int64),
+        np.floor(np.asarray(timestamps, dtype=float) / minute).astype(np.int64)
+    )), axis=0)
+    sensor_id, bucket = touched[:, 0], touched[:, 1]
+    # Sorted by sensor, then bucket: a span starts at a new sensor or after a gap
+    change = np.ones(len(touched), dtype=bool)
+    change[1:] = (np.diff(sensor_id) != 0) | (np.diff(bucket) != 1)
+    starts = np.flatnonzero(change)
+    ends = np.append(starts[1:], len(touched)) - 1
+    rebuild_rollups([(sensor, first * minute, (last + 1) * minute) for sensor, first, last
+                     in zip(sensor_id[starts].tolist(), bucket[starts].tolist(), bucket[ends].tolist())])
+
+def choose_resolution(start, end, max_points):
+    """
+    Picks the finest resolution giving at most max_points buckets over the window,
+    or the coarsest one for windows longer than that.
+    :return: (name, seconds)
+    """
+    for name, seconds in RESOLUTIONS.items():
+        if (end - start) / seconds <= max_points:
+            return name, seconds
+    return name, seconds
+
+def query_history(sensor_id, metric, start, end, max_points=DEFAULT_MAX_POINTS, resolution=None):
+    """
+    History of one metric of a sensor between two POSIX timestamps. Without a resolution
+    the raw readings are returned if there are at most max_points of them, otherwise
+    the rollup chosen by choose_resolution. Every query is a range scan of one index.
+    :param resolution: 'raw' or a key of RESOLUTIONS to skip the choice
+    :return: (resolution name, list of points with time, count, min, max, mean and last)
+    """
+    column = getattr(SensorReading, metric)
+    if resolution in (None, 'raw') and (end - start) / RESOLUTIONS['1m'] <= max_points:
+        # Only windows short enough for minute buckets can have few enough readings
+        rows = db.session.execute(
+            select(SensorReading.timestamp, column).where(
+                SensorReading.sensor_id == sensor_id,
+                SensorReading.timestamp >= _datetime(start),
+                SensorReading.timestamp < _datetime(end),
+                column.is_not(None)
+            ).order_by(SensorReading.timestamp).limit(max_points + 1)
+        ).all()
+        if len(rows) <= max_points or resolution == 'raw':
+            return 'raw', [{'time': timestamp.isoformat(), 'count': 1, 'min': value, 'max': value,
+                            'mean': value, 'last': value} for timestamp, value in rows[:max_points]]
+    elif resolution == 'raw':
+        raise ValueError(f'Raw readings are limited to windows of {max_points} minutes')
+
+    if resolution in RESOLUTIONS:
+        name, seconds = resolution, RESOLUTIONS[resolution]
+    else:
+        name, seconds = choose_resolution(start, end, max_points)
+    rows = db.session.execute(
+        select(SensorReadingRollup).where(
+            SensorReadingRollup.sensor_id == sensor_id,
+            SensorReadingRollup.resolution == seconds,
+            SensorReadingRollup.metric == metric,
+            SensorReadingRollup.bucket_start >= _datetime(np.floor(start / seconds) * seconds),
+            SensorReadingRollup.bucket_start < _datetime(end)
+        ).order_by(SensorReadingRollup.bucket_start).limit(max_points)
+    ).scalars().all()
+    return name, [{'time': row.bucket_start.isoformat(), 'count': row.count, 'min': row.min, 'max': row.max,
+                   'mean': row.mean, 'last': row.last} for row in rows]
@@ -0,0 +1,199 @@
+import datetime
+import json
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; publishing is then only safe from one process at a time
+    fcntl = None
+
+SENSOR_DATA_FILE = os.path.join('app', 'static', 'data', 'sensor_data.json')
+RECENT_SNAPSHOTS = 16  # versions kept per worker for computing deltas
+
+def _version_file(path):
+    return os.path.splitext(path)[0] + '.version.json'
+
+def _write_atomic(path, data, **dump_kwargs):
+    """Writes JSON to a temporary file next to path and renames it over path."""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def _read_version(path):
+    try:
+        with open(_version_file(path), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def publish_snapshot(sensors_data, path=SENSOR_DATA_FILE):
+    """
+    Replaces the sensor data file atomically and bumps its version.
+    Readers see either the old or the new file, never a partly written one. The version
+    file written afterwards records the data file's mtime and size so readers can tell
+    which data file a version number belongs to.
+    :param sensors_data: List of sensor data dictionaries
+    :return: The new version number
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'a') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            version = int(_read_version(path).get('version', 0)) + 1
+            _write_atomic(path, sensors_data, indent=4)
+            stat = os.stat(path)
+            _write_atomic(_version_file(path), {
+                'version': version,
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'published_at': datetime.datetime.now().isoformat()
+            })
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    return version
+
+def bump_snapshot_version(path=SENSOR_DATA_FILE):
+    """
+    Gives the current sensor data file a new version without rewriting it, so the
+    responses derived from it are rebuilt. Called when data merged into those responses
+    from elsewhere changes, such as readings stored by the ingestion API.
+    :return: The new version number, or None if there is no data file yet
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path + '.lock', 'a') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            version_info = _read_version(path)
+            version = int(version_info.get('version', 0)) + 1
+            stat = os.stat(path)
+            _write_atomic(_version_file(path), {
+                'version': version,
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'published_at': version_info.get('published_at') or datetime.datetime.now().isoformat()
+            })
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    return version
+
+class SensorSnapshot:
+    """
+    One published version of the sensor data, parsed once per worker.
+    Responses derived from it are built on first use and kept with the snapshot, so
+    they are dropped together when a new version arrives. `consistent` is False when
+    the data file does not match its version file (written before versioning existed,
+    or read between the two renames of a publish); its version number is then not a
+    reliable name for its contents.
+    """
+
+    def __init__(self, version, sensors, published_at, consistent=True):
+        self.version = version
+        self.sensors = sensors
+        self.published_at = published_at
+        self.consistent = consistent
+        self._cache = {}
+        # Reentrant, since building one derived value may use another
+        self._lock = threading.RLock()
+
+    def cached(self, key, build):
+        """
+        Returns build(self.sensors), computing it only once per snapshot.
+        :param key: Name of the derived value
+        :param build: Function of the sensor list
+        """
+        value = self._cache.get(key)
+        if value is None:
+            with self._lock:
+                value = self._cache.get(key)
+                if value is None:
+                    value = self._cache[key] = build(self.sensors)
+        return value
+
+class SnapshotReader:
+    """
+    Keeps the latest snapshot of a sensor data file in memory.
+    Every get() costs two stat calls; the file is parsed again only when its mtime or
+    size changes, and a new version of an unchanged file reuses the parsed list. If the
+    file cannot be parsed the last good snapshot is kept.
+    The last few consistent snapshots stay available by version for computing deltas.
+    """
+
+    def __init__(self, path=SENSOR_DATA_FILE, recent=RECENT_SNAPSHOTS):
+        self.path = path
+        self.recent = recent
+        self._snapshot = None
+        self._key = None
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()
+
+    def find(self, version):
+        """:return: The consistent snapshot with this version if this worker still has it, else None"""
+        return self._recent.get(version)
+
+    def get(self):
+        """:return: The current SensorSnapshot"""
+        stat = os.stat(self.path)
+        version_stat = self._stat(_version_file(self.path))
+        key = (stat.st_mtime_ns, stat.st_size, version_stat)
+        if self._snapshot is not None and key == self._key:
+            return self._snapshot
+
+        with self._lock:
+            if self._snapshot is not None and key == self._key:
+                return self._snapshot
+            version_info = _read_version(self.path)
+            if self._snapshot is not None and key[:2] == self._key[:2]:
+                # Only the version changed; the data file is the one already parsed
+                sensors = self._snapshot.sensors
+            else:
+                try:
+                    with open(self.path, 'r') as f:
+                        sensors = json.load(f)
+                except json.JSONDecodeError as e:
+                    if self._snapshot is None:
+                        raise
+                    print(f"Error decoding {self.path}, keeping version {self._snapshot.version}: {e}")
+                    return self._snapshot
+
+            consistent = (version_info.get('mtime_ns'), version_info.get('size')) == (stat.st_mtime_ns, stat.st_size)
+            if consistent:
+                published_at = version_info.get('published_at')
+            else:
+                published_at = datetime.datetime.fromtimestamp(stat.st_mtime).isoformat()
+
+            self._snapshot = SensorSnapshot(int(version_info.get('version', 0)), sensors, published_at, consistent)
+            self._key = key
+            if consistent:
+                self._recent[self._snapshot.version] = self._snapshot
+                while len(self._recent) > self.recent:
+                    self._recent.popitem(last=False)
+            return self._snapshot
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+_reader = SnapshotReader()
+
+def get_snapshot():
+    """:return: The current sensor data snapshot of this process"""
+    return _reader.get()
+
+def find_snapshot(version):
+    """:return: An earlier snapshot of this process by version, or None if it is no longer kept"""
+    return _reader.find(version)
@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+import numpy as np
+from scipy.spatial import cKDTree
+from flask import current_app
+from app.models import Camp, Warehouse
+from app.extensions import db
+from app.distance import EARTH_RADIUS_KM, coordinate_array
+
+DEFAULT_TTL_SECONDS = 60
+VERSION_DIR = 'instance'
+
+def _unit_vectors(coords):
+    """Converts (latitude, longitude) degrees into 3-D points on the unit sphere."""
+    lat = np.radians(coords[:, 0])
+    lng = np.radians(coords[:, 1])
+    return np.column_stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)))
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+def _km_to_chord(distance_km):
+    return 2 * np.sin(min(distance_km / EARTH_RADIUS_KM, np.pi) / 2)
+
+class SpatialIndex:
+    """
+    KD-tree over the coordinates of one model (camps or warehouses).
+    Points are stored as unit vectors so Euclidean (chord) distance orders points
+    exactly like great-circle distance. mark_dirty() replaces a version file shared by
+    every worker process, and each worker rebuilds its tree on the next query after the
+    file changes; the tree is also rebuilt at least every ttl seconds, for changes made
+    without mark_dirty(). The tree and its ids are swapped as one tuple, so a query never
+    pairs a new tree with old ids.
+    """
+
+    def __init__(self, name, id_column, lat_column, lng_column):
+        self.id_column = id_column
+        self.lat_column = lat_column
+        self.lng_column = lng_column
+        self.version_path = os.path.join(VERSION_DIR, f'spatial_index_{name}.version')
+        self._lock = threading.Lock()
+        self._index = (None, np.empty(0, dtype=int))  # (tree, ids)
+        self._built_at = 0
+        self._built_version = None
+        self._dirty = True
+
+    def mark_dirty(self):
+        """Forces a rebuild on the next query in every worker. Call after a point is added, moved or removed."""
+        self._dirty = True
+        os.makedirs(os.path.dirname(self.version_path), exist_ok=True)
+        temp_path = f"{self.version_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(str(time.time_ns()))
+        # The rename gives the file a new inode, so the change shows even within one mtime tick
+        os.replace(temp_path, self.version_path)
+
+    def _version(self):
+        try:
+            stat = os.stat(self.version_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _ttl(self):
+        try:
+            return current_app.config.get('SPATIAL_INDEX_TTL', DEFAULT_TTL_SECONDS)
+        except RuntimeError:
+            return DEFAULT_TTL_SECONDS
+
+    def _is_current(self, version):
+        return (not self._dirty and self._index[0] is not None and version == self._built_version
+                and time.monotonic() - self._built_at < self._ttl())
+
+    def _ensure_built(self):
+        """:return: The current (tree, ids) tuple"""
+        version = self._version()
+        if self._is_current(version):
+            return self._index
+        with self._lock:
+            if self._is_current(version):
+                return self._index
+            # Clear the flag first so a change committed during the rebuild is not lost
+            self._dirty = False
+            rows = db.session.query(self.id_column, self.lat_column, self.lng_column).all()
+            coords, valid = coordinate_array([(row[1], row[2]) for row in rows])
+            ids = np.array([row[0] for row in rows], dtype=int)[valid]
+            tree = cKDTree(_unit_vectors(coords[valid])) if valid.any() else None
+            self._index = (tree, ids)
+            self._built_version = version
+            self._built_at = time.monotonic()
+            return self._index
+
+    def nearest(self, point, k=1):
+        """
+        Finds the k points closest to a location.
+        :param point: (latitude, longitude)
+        :param k: Number of neighbours to return
+        :return: List of (id, straight-line distance in kilometers), closest first
+        """
+        tree, ids = self._ensure_built()
+        coords, valid = coordinate_array([point])
+        if tree is None or not valid[0] or k <= 0:
+            return []
+
+        k = min(k, len(ids))
+        chords, positions = tree.query(_unit_vectors(coords)[0], k=k)
+        chords, positions = np.atleast_1d(chords), np.atleast_1d(positions)
+        return [(int(ids[p]), round(float(d), 2)) for p, d in zip(positions, _chord_to_km(chords))]
+
+    def within(self, point, radius_km):
+        """
+        Finds every point within a straight-line radius of a location.
+        :param point: (latitude, longitude)
+        :param radius_km: Search radius in kilometers
+        :return: List of (id, straight-line distance in kilometers), closest first
+        """
+        tree, ids = self._ensure_built()
+        coords, valid = coordinate_array([point])
+        if tree is None or not valid[0] or radius_km < 0:
+            return []
+
+        center = _unit_vectors(coords)[0]
+        positions = tree.query_ball_point(center, _km_to_chord(radius_km))
+        if not positions:
+            return []
+        positions = np.asarray(positions)
+        distances = _chord_to_km(np.linalg.norm(tree.data[positions] - center, axis=1))
+        order = np.argsort(distances)
+        return [(int(ids[positions[i]]), round(float(distances[i]), 2)) for i in order]
+
+warehouse_index = SpatialIndex('warehouses', Warehouse.wid, Warehouse.coordinates_lat, Warehouse.coordinates_lng)
+camp_index = SpatialIndex('camps', Camp.cid, Camp.coordinates_lat, Camp.coordinates_lng)
+
+def mark_warehouses_changed():
+    warehouse_index.mark_dirty()
+
+def mark_camps_changed():
+    camp_index.mark_dirty()
+
+def _nearest_rows(index, model, id_column, point, k, criteria):
+    """
+    Returns the k nearest rows that also match the SQL criteria. The search widens
+    until enough rows match or every indexed point has been considered.
+    """
+    if k <= 0:
+        return []
+    search_size = k
+    while True:
+        neighbours = index.nearest(point, search_size)
+        if not neighbours:
+            return []
+        rows = model.query.filter(id_column.in_([i for i, _ in neighbours]), *criteria).all()
+        if len(rows) >= k or len(neighbours) < search_size:
+            rank = {i: position for position, (i, _) in enumerate(neighbours)}
+            rows.sort(key=lambda row: rank[getattr(row, id_column.key)])
+            return rows[:k]
+        search_size *= 4
+
+def nearest_warehouses(point, k, *criteria):
+    """
+    Finds the k warehouses closest to a location in straight-line distance.
+    :param point: (latitude, longitude)
+    :param k: Number of warehouses to return
+    :param criteria: Optional SQLAlchemy filter expressions the warehouses must match
+    :return: List of Warehouse objects, closest first
+    """
+    return _nearest_rows(warehouse_index, Warehouse, Warehouse.wid, point, k, criteria)
+
+def nearest_camps(point, k, *criteria):
+    """
+    Finds the k camps closest to a location in straight-line distance.
+    :param point: (latitude, longitude)
+    :param k: Number of camps to return
+    :param criteria: Optional SQLAlchemy filter expressions the camps must match
+    :return: List of Camp objects, closest first
+    """
+    return _nearest_rows(camp_index, Camp, Camp.cid, point, k, criteria)
+
+def routing_candidate_count():
+    """Number of straight-line nearest candidates that are sent to road routing."""
+    try:
+        return current_app.config.get('ROUTING_CANDIDATES', 5)
+    except RuntimeError:
+        return 5
@@ -433,8 +433,6 @@ async function fetchSensorData() {
   }
 }
 
-// Update sensor data every 30 seconds
-setInterval(fetchSensorData, 30000);
 
 // Initial data update
 fetchSensorData();
@@ -522,14 +520,21 @@ window.addEventListener('click', e => {
     }
 });
 
-// Set up periodic data refresh with optimized interval
-setInterval(async () => {
-    const newSensors = await fetchSensorData();
-    if (newSensors !== lastSensorData) {
-        updateAlerts(newSensors);
-        updateSensorStatusChart(newSensors);
-    }
-}, 60000);
+// Refresh sensors and alerts, at most once per burst of status changes
+let refreshTimer = null;
+function scheduleSensorRefresh() {
+    if (refreshTimer) return;
+    refreshTimer = setTimeout(async () => {
+        refreshTimer = null;
+        const newSensors = await fetchSensorData();
+        if (newSensors) {
+            updateAlerts(newSensors);
+        }
+    }, 500);
+}
+
+// The server pushes sensor status changes as they are published
+subscribeWithFallback('/admin/sensor_events', {status_change: scheduleSensorRefresh}, scheduleSensorRefresh, 30000);
 
 // Update alerts based on sensor data
 function updateAlerts(sensors) {
@@ -60,8 +60,8 @@ window.addEventListener('load', async function() {
         // Set up event listeners
         setupEventListeners();
 
-        // Set up periodic updates
-        setInterval(fetchUserRequests, 30000); // Refresh requests every 30 seconds
+        // Refresh when the server pushes new requests and notifications
+        subscribeToCampEvents();
 
         // Initialize notification system
         initNotificationSystem();
@@ -255,7 +255,11 @@ async function sendResourceRequest() {
       const data = await response.json();
 
       if (data.success) {
-            alert('Resource request sent successfully');
+            const missing = Object.entries(data.missing || {})
+                .map(([item, quantity]) => `${item}: ${quantity}`);
+            alert(missing.length
+                ? `${data.message}\nNot in stock at any warehouse yet (${missing.join(', ')})`
+                : data.message);
 
         // Clear form
         document.getElementById('food').value = '';
@@ -942,6 +946,20 @@ updateResourceForm.addEventListener('submit', async (e) => {
     }
 });
 
+// Subscribe to pushed camp events
+function subscribeToCampEvents() {
+    subscribeWithFallback('/camp_manager/notification_events', {
+        user_request: () => fetchUserRequests(),
+        notification: () => {
+            // Refresh the open delivery popup right away
+            const deliveryPopup = document.getElementById('delivery-popup');
+            if (deliveryPopup && deliveryPopup.style.display === 'block') {
+                checkNotifications();
+            }
+        }
+    }, fetchUserRequests, 30000);
+}
+
 // Function to check for notifications
 async function checkNotifications() {
     try {
@@ -0,0 +1,30 @@
+// Subscribes to a server-sent event stream, calling poll every ms milliseconds only while
+// the stream is unavailable. EventSource reconnects by itself and resumes from the last
+// event it received, so polling stops again once the stream reopens.
+// handlers maps event names to listeners. Returns a function that stops both.
+function subscribeWithFallback(url, handlers, poll, ms) {
+    let pollTimer = null;
+    const startPolling = () => {
+        if (!pollTimer) {
+            pollTimer = setInterval(poll, ms);
+        }
+    };
+    const stopPolling = () => {
+        clearInterval(pollTimer);
+        pollTimer = null;
+    };
+
+    if (!window.EventSource) {
+        startPolling();
+        return stopPolling;
+    }
+
+    const events = new EventSource(url);
+    Object.entries(handlers).forEach(([name, handler]) => events.addEventListener(name, handler));
+    events.onopen = stopPolling;
+    events.onerror = startPolling;
+    return () => {
+        events.close();
+        stopPolling();
+    };
+}
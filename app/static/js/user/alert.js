@@ -665,12 +665,17 @@ document.addEventListener('click', e => {
     }
 });
 
-// Set up periodic data refresh with optimized interval
-setInterval(async () => {
-    const newSensors = await fetchSensorData();
-    if (newSensors !== lastSensorData) {
+// Refresh the map and alerts, at most once per burst of status changes
+let refreshTimer = null;
+function scheduleSensorRefresh() {
+    if (!map || refreshTimer) return;
+    refreshTimer = setTimeout(() => {
+        refreshTimer = null;
         initializeSensorData(map.getCenter().lat, map.getCenter().lng);
-    }
-}, 60000);
+    }, 500);
+}
+
+// The server pushes sensor status changes as they are published
+subscribeWithFallback("/user/sensor_events", {status_change: scheduleSensorRefresh}, scheduleSensorRefresh, 60000);
 
 
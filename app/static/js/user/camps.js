@@ -218,35 +218,12 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     }
 
-    // Function to start periodic notification refresh with retry logic
+    // Refresh notifications when the server pushes a camp announcement;
+    // returns a function that stops the refresh
     function startNotificationRefresh(camp_id) {
-        let retryCount = 0;
-        const maxRetries = 3;
-        const retryDelay = 5000; // 5 seconds
-
-        // Initial fetch
-        fetchAndDisplayNotifications(camp_id);
-        
-        // Set up periodic refresh every 10 seconds (reduced from 30 seconds)
-        const interval = setInterval(async () => {
-            try {
-                await fetchAndDisplayNotifications(camp_id);
-                retryCount = 0; // Reset retry count on success
-            } catch (error) {
-                console.error("Error in notification refresh:", error);
-                retryCount++;
-                
-                if (retryCount >= maxRetries) {
-                    console.error("Max retries reached, stopping notification refresh");
-                    clearInterval(interval);
-                } else {
-                    console.log(`Retrying in ${retryDelay/1000} seconds... (Attempt ${retryCount}/${maxRetries})`);
-                    setTimeout(() => fetchAndDisplayNotifications(camp_id), retryDelay);
-                }
-            }
-        }, 10000); // 10 seconds (reduced from 30 seconds)
-
-        return interval;
+        const refresh = () => fetchAndDisplayNotifications(camp_id);
+        refresh();
+        return subscribeWithFallback(`/user/camp_events/${camp_id}`, {announcement: refresh}, refresh, 10000);
     }
 
     // Update Camp Details
@@ -255,9 +232,9 @@ document.addEventListener("DOMContentLoaded", () => {
 
         const currentCamp = camps[currentCampIndex];
 
-        // Clear existing notification refresh if any
+        // Stop the notification refresh of the previous camp if any
         if (notificationRefreshInterval) {
-            clearInterval(notificationRefreshInterval);
+            notificationRefreshInterval();
             notificationRefreshInterval = null;
         }
 
@@ -1,6 +1,6 @@
 let camp_index = 0; // Start with index 0 for easier array access
 let all_camps = []; // Store all camps data fetched from the server
-let notificationIntervalId = null; // To store the interval ID for notifications
+let stopNotificationRefresh = null; // Stops the selected camp's announcement refresh
 
 document.addEventListener("DOMContentLoaded", initializePage);
 
@@ -165,10 +165,11 @@ function updateCampDetailsAndChart(camp) {
     startNotificationRefresh(camp.cid);
 }
 
-// Clear the previous notification interval
+// Stop the previous camp's notification refresh
 function clearNotificationInterval() {
-    if (notificationIntervalId) {
-        clearInterval(notificationIntervalId);
+    if (stopNotificationRefresh) {
+        stopNotificationRefresh();
+        stopNotificationRefresh = null;
     }
 }
 
@@ -205,9 +206,10 @@ async function fetchAndDisplayNotifications(camp_id) {
     }
 }
 
-// Start periodic notification refresh
+// Refresh notifications when the server pushes a camp announcement
 function startNotificationRefresh(camp_id) {
-    notificationIntervalId = setInterval(() => fetchAndDisplayNotifications(camp_id), 10000);
+    const refresh = () => fetchAndDisplayNotifications(camp_id);
+    stopNotificationRefresh = subscribeWithFallback(`/user/camp_events/${camp_id}`, {announcement: refresh}, refresh, 10000);
 }
 
 // Fetch donation summary and update the chart
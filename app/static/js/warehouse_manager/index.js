@@ -625,15 +625,22 @@ document.addEventListener('DOMContentLoaded', () => {
       // Set up event listeners
       setupEventListeners();
 
-      // Set up periodic updates if requests list exists
+      // Refresh when the server pushes new requests if requests list exists
       if (requestsList) {
-        setInterval(fetchResourceRequests, 30000); // Refresh requests every 30 seconds
+        subscribeToRequestEvents();
       }
     } catch (error) {
       console.error('Error during initialization:', error);
     }
   });
 
+  // Subscribe to pushed resource requests
+  function subscribeToRequestEvents() {
+    subscribeWithFallback('/warehouse_manager/request_events', {
+      resource_request: () => fetchResourceRequests()
+    }, fetchResourceRequests, 30000);
+  }
+
   // Function to set up event listeners
   function setupEventListeners() {
     // Add event listener for the process request button
@@ -0,0 +1,84 @@
+import threading
+import time
+from flask import current_app, g
+from flask_login import current_user
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from app.models import User
+from app.extensions import db
+
+# The current user's row is cached across requests for a few seconds, so most requests
+# load it without a query. The camp or warehouse the user manages is never cached across
+# requests: their stock and occupancy change with every request, and a stale copy would
+# be written back over newer values.
+DEFAULT_TTL_SECONDS = 10
+MAX_CACHED_USERS = 10000
+
+_cache = {}  # uid -> (expiry time, detached copy of the user)
+_lock = threading.Lock()
+
+def _ttl():
+    try:
+        return current_app.config.get('USER_CONTEXT_TTL', DEFAULT_TTL_SECONDS)
+    except RuntimeError:
+        return DEFAULT_TTL_SECONDS
+
+def _detached_copy(user):
+    """:return: A detached User holding the column values of `user`, safe to share between requests"""
+    copy = User.__mapper__.class_manager.new_instance()
+    for attribute in inspect(User).column_attrs:
+        setattr(copy, attribute.key, getattr(user, attribute.key))
+    make_transient_to_detached(copy)
+    return copy
+
+def load_user_context(uid):
+    """
+    Loads a user for Flask-Login. A cached copy is merged into the session without a
+    query; otherwise the user is loaded together with the camp or warehouse they manage
+    in one joined query, and the copy is cached for USER_CONTEXT_TTL seconds.
+    :param uid: User id
+    :return: User or None
+    """
+    now = time.monotonic()
+    entry = _cache.get(uid)
+    if entry and entry[0] > now:
+        return db.session.merge(entry[1], load=False)
+
+    user = User.query.options(
+        joinedload(User.managed_camp),
+        joinedload(User.managed_warehouse)
+    ).filter_by(uid=uid).first()
+    if user is None:
+        return None
+
+    with _lock:
+        if len(_cache) >= MAX_CACHED_USERS:
+            for key in [key for key, (expiry, _) in _cache.items() if expiry <= now]:
+                del _cache[key]
+            if len(_cache) >= MAX_CACHED_USERS:
+                _cache.clear()
+        _cache[uid] = (now + _ttl(), _detached_copy(user))
+    return user
+
+def invalidate_user_context(*uids):
+    """
+    Drops cached users. Call after a user's row is changed or deleted. Other worker
+    processes pick the change up once their copy expires.
+    """
+    with _lock:
+        for uid in uids:
+            if uid is not None:
+                _cache.pop(int(uid), None)
+
+def get_managed_camp():
+    """:return: The camp the current user heads, or None; queried at most once per request"""
+    if '_managed_camp' not in g:
+        camps = current_user.managed_camp if current_user.is_authenticated else []
+        g._managed_camp = camps[0] if camps else None
+    return g._managed_camp
+
+def get_managed_warehouse():
+    """:return: The warehouse the current user manages, or None; queried at most once per request"""
+    if '_managed_warehouse' not in g:
+        g._managed_warehouse = current_user.managed_warehouse if current_user.is_authenticated else None
+    return g._managed_warehouse
@@ -0,0 +1,70 @@
+"""
+Import-time benchmark of a web worker.
+
+Imports the app the way a gunicorn worker does, in fresh interpreters, and exits
+nonzero if the import is slower or larger than the budget, or if it loads a module
+that only the sensor service needs (scikit-learn, seaborn, matplotlib, pandas).
+
+Usage: python benchmarks/import_time.py [--module app] [--repeat 5] [--max-seconds 2.0] [--max-rss-mb 160]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules a web worker must not import
+FORBIDDEN_MODULES = ('sklearn', 'seaborn', 'matplotlib', 'pandas')
+
+CHILD = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'loaded': sorted(name for name in {forbidden!r} if name in sys.modules)
+}}))
+'''
+
+def measure(module):
+    """Imports a module in a new interpreter and returns its import time, peak RSS and forbidden modules."""
+    env = dict(os.environ)
+    # An in-memory database, so create_app has no side effects
+    env['DATABASE_URL'] = 'sqlite://'
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD.format(module=module, forbidden=FORBIDDEN_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app', help='module a worker imports')
+    parser.add_argument('--repeat', type=int, default=5, help='runs; the fastest one is reported')
+    parser.add_argument('--max-seconds', type=float, default=2.0, help='import time budget')
+    parser.add_argument('--max-rss-mb', type=float, default=160, help='peak RSS budget after import')
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    seconds = min(run['seconds'] for run in runs)
+    rss_mb = min(run['rss_mb'] for run in runs)
+    loaded = sorted({name for run in runs for name in run['loaded']})
+    print(f"import {args.module}: {seconds:.3f}s (budget {args.max_seconds}s), "
+          f"peak RSS {rss_mb:.0f} MB (budget {args.max_rss_mb:.0f} MB)")
+
+    failures = []
+    if loaded:
+        failures.append(f"loads {', '.join(loaded)}")
+    if seconds > args.max_seconds:
+        failures.append(f"import takes {seconds:.3f}s")
+    if rss_mb > args.max_rss_mb:
+        failures.append(f"peak RSS is {rss_mb:.0f} MB")
+    if failures:
+        print("Regression: " + "; ".join(failures))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Query plan benchmark of the filter column indexes.
+
+Seeds a temporary SQLite database with realistic volumes, then runs the queries the
+endpoints use with and without the indexes of migration c47a1e2f9b83, printing the
+EXPLAIN QUERY PLAN and median time of each. Exits nonzero if any query still scans
+its table or sorts in a temporary B-tree once the indexes exist.
+
+Usage: python benchmarks/index_plans.py [--scale 1.0] [--repeat 20]
+"""
+import argparse
+import importlib.util
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATION = os.path.join(ROOT, 'migrations', 'versions', 'c47a1e2f9b83_filter_column_indexes.py')
+
+# Rows per table at scale 1
+VOLUMES = {
+    'users': 5000,
+    'warehouses': 50,
+    'camps': 500,
+    'vehicles': 1000,
+    'resource_requests': 200000,
+    'user_requests': 100000,
+    'notifications': 200000,
+    'camp_notifications': 100000,
+    'user_activity': 200000,
+}
+RESOURCE_STATUSES = ['delivered'] * 80 + ['in_transit'] * 8 + ['rejected'] * 7 + ['pending'] * 5
+USER_REQUEST_STATUSES = ['Approved'] * 70 + ['Rejected'] * 20 + ['Pending'] * 10
+
+def load_indexes():
+    spec = importlib.util.spec_from_file_location('filter_column_indexes', MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.INDEXES
+
+def seed(db, models, scale, rng):
+    """Bulk inserts the benchmark rows with Core executemany."""
+    counts = {table: max(1, int(count * scale)) for table, count in VOLUMES.items()}
+    counts['warehouses'] = max(2, counts['warehouses'])
+    now = datetime(2026, 1, 1)
+
+    def when(i):
+        return now - timedelta(minutes=i)
+
+    def insert(model, rows):
+        for start in range(0, len(rows), 10000):
+            db.session.execute(db.insert(model.__table__), rows[start:start + 10000])
+
+    insert(models.User, [{'uid': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': '',
+                          'role': 'user', 'created_at': when(i)} for i in range(1, counts['users'] + 1)])
+    insert(models.Warehouse, [{
+        'wid': i, 'name': f'Warehouse {i}', 'location': 'L', 'coordinates_lat': 10 + rng.random(),
+        'coordinates_lng': 76 + rng.random(), 'food_capacity': 1000, 'water_capacity': 1000,
+        'essential_capacity': 1000, 'clothes_capacity': 1000, 'manager_id': i, 'created_at': when(i)
+    } for i in range(1, counts['warehouses'] + 1)])
+    insert(models.Camp, [{
+        'cid': i, 'name': f'Camp {i}', 'location': 'L', 'capacity': 500, 'coordinates_lat': 10 + rng.random(),
+        'coordinates_lng': 76 + rng.random(), 'camp_head_id': counts['warehouses'] + i
+    } for i in range(1, counts['camps'] + 1)])
+    insert(models.Vehicle, [{
+        'vid': i, 'vehicle_id': f'V{i}', 'capacity': 500, 'status': rng.choice(['available', 'available', 'in_transit']),
+        'warehouse_id': rng.randint(1, counts['warehouses']), 'created_at': when(i)
+    } for i in range(1, counts['vehicles'] + 1)])
+    insert(models.ResourceRequest, [{
+        'camp_id': rng.randint(1, counts['camps']), 'warehouse_id': rng.randint(1, counts['warehouses']),
+        'food_quantity': 10, 'water_quantity': 10, 'essentials_quantity': 10, 'clothes_quantity': 10,
+        'priority': 'general', 'status': status, 'created_at': when(i), 'updated_at': when(i),
+        'vehicle_id': None if status == 'pending' and rng.random() < 0.5 else rng.randint(1, counts['vehicles'])
+    } for i, status in enumerate(rng.choice(RESOURCE_STATUSES) for _ in range(counts['resource_requests']))])
+    insert(models.UserRequest, [{
+        'name': 'Person', 'phone': '0', 'number_slots': 1, 'camp_id': rng.randint(1, counts['camps']),
+        'priority': 1, 'status': rng.choice(USER_REQUEST_STATUSES), 'created_at': when(i)
+    } for i in range(counts['user_requests'])])
+    insert(models.Notification, [{
+        'user_id': rng.randint(1, counts['users']), 'type': 'vehicle_dispatch', 'message': 'm', 'data': {},
+        'created_at': when(i)
+    } for i in range(counts['notifications'])])
+    insert(models.CampNotification, [{
+        'camp_id': rng.randint(1, counts['camps']), 'message': 'm', 'created_at': when(i), 'is_read': False
+    } for i in range(counts['camp_notifications'])])
+    insert(models.UserActivity, [{
+        'user_id': rng.randint(1, counts['users']), 'action': 'login', 'timestamp': when(i)
+    } for i in range(counts['user_activity'])])
+    db.session.commit()
+    return counts
+
+def endpoint_queries(db, models):
+    """:return: List of (endpoint, query) pairs, matching the filters the endpoints use"""
+    m = models
+    return [
+        ('warehouse_manager.get_resource_requests',
+         m.ResourceRequest.query.filter_by(warehouse_id=3, status='pending', vehicle_id=None)),
+        ('camp_manager in-transit requests', m.ResourceRequest.query.filter_by(camp_id=7, status='in_transit')),
+        ('pending load of a vehicle',
+         m.ResourceRequest.query.filter_by(vehicle_id=11, status='pending').with_entities(db.func.count())),
+        ('available vehicles of a warehouse', m.Vehicle.query.filter_by(warehouse_id=3, status='available')),
+        ('camp of the camp manager', m.Camp.query.filter_by(camp_head_id=60).limit(1)),
+        ('warehouse of the warehouse manager', m.Warehouse.query.filter_by(manager_id=3).limit(1)),
+        ('camp_manager pending slot requests', m.UserRequest.query.filter_by(camp_id=7, status='Pending')),
+        ('notifications of a user',
+         m.Notification.query.filter_by(user_id=42).order_by(m.Notification.created_at.desc())),
+        ('camp announcements',
+         m.CampNotification.query.filter_by(camp_id=7).order_by(m.CampNotification.created_at.desc())),
+        ('admin user activity',
+         m.UserActivity.query.filter_by(user_id=42).order_by(m.UserActivity.timestamp.desc())),
+    ]
+
+def measure(db, queries, repeat):
+    """:return: Dictionary of endpoint to (plan lines, median milliseconds)"""
+    results = {}
+    with db.engine.connect() as connection:
+        for name, query in queries:
+            sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+            plan = [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                connection.exec_driver_sql(sql).fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = (plan, statistics.median(timings))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier of the seeded row counts')
+    parser.add_argument('--repeat', type=int, default=20, help='runs of each query; the median is reported')
+    args = parser.parse_args()
+
+    database = os.path.join(tempfile.mkdtemp(prefix='index-plans-'), 'benchmark.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from app import app, db, models
+
+    with app.app_context():
+        started = time.perf_counter()
+        counts = seed(db, models, args.scale, random.Random(0))
+        print(f"Seeded {sum(counts.values())} rows in {time.perf_counter() - started:.1f}s into {database}")
+        indexes = load_indexes()
+        queries = endpoint_queries(db, models)
+
+        # db.create_all() created the indexes with the tables; measure without them first
+        for name, table, columns in indexes:
+            db.session.execute(db.text(f'DROP INDEX IF EXISTS {name}'))
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        before = measure(db, queries, args.repeat)
+
+        for name, table, columns in indexes:
+            db.session.execute(db.text(f'CREATE INDEX {name} ON {table} ({", ".join(columns)})'))
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        after = measure(db, queries, args.repeat)
+
+    regressions = []
+    for name, _ in queries:
+        before_plan, before_ms = before[name]
+        after_plan, after_ms = after[name]
+        print(f"\n{name}: {before_ms:.2f} ms -> {after_ms:.2f} ms")
+        print(f"  without indexes: {'; '.join(before_plan)}")
+        print(f"  with indexes:    {'; '.join(after_plan)}")
+        if any(line.startswith('SCAN') or 'TEMP B-TREE' in line for line in after_plan):
+            regressions.append(name)
+
+    os.remove(database)
+    if regressions:
+        print(f"\nStill scanning or sorting with the indexes: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
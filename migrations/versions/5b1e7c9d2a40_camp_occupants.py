@@ -0,0 +1,149 @@
+"""Move camp people lists into the camp_occupants table
+
+Revision ID: 5b1e7c9d2a40
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+import json
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c9d2a40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+camps = sa.table(
+    'camps',
+    sa.column('cid', sa.Integer),
+    sa.column('people_list', sa.String)
+)
+camp_occupants = sa.table(
+    'camp_occupants',
+    sa.column('id', sa.Integer),
+    sa.column('camp_id', sa.Integer),
+    sa.column('uid', sa.Integer),
+    sa.column('name', sa.String),
+    sa.column('phone', sa.String),
+    sa.column('entry_date', sa.DateTime)
+)
+users = sa.table(
+    'users',
+    sa.column('uid', sa.Integer),
+    sa.column('mobile', sa.String)
+)
+
+
+def _uid(value, mobiles):
+    try:
+        uid = int(value)
+    except (TypeError, ValueError):
+        return None
+    return uid if uid in mobiles else None
+
+
+def _entry_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_people_list(camp_id, people_list, mobiles):
+    """
+    Reads a people_list value in either stored format: a JSON array of objects with
+    name, phone, entry_date and/or uid, or the older 'uid:name|uid:name' string.
+    :param mobiles: Dictionary of user id to mobile number
+    :return: List of camp_occupants rows
+    """
+    if not people_list:
+        return []
+    try:
+        people = json.loads(people_list)
+    except json.JSONDecodeError:
+        people = []
+        for person in people_list.split('|'):
+            if ':' in person:
+                uid, name = person.split(':', 1)
+                people.append({'uid': uid, 'name': name})
+    if not isinstance(people, list):
+        print(f"Skipping people_list of camp {camp_id}: not a list")
+        return []
+
+    rows = []
+    for person in people:
+        if not isinstance(person, dict):
+            continue
+        uid = _uid(person.get('uid'), mobiles)
+        rows.append({
+            'camp_id': camp_id,
+            'uid': uid,
+            'name': str(person.get('name') or 'Unknown')[:100],
+            'phone': person.get('phone') or (mobiles.get(uid) if uid is not None else None),
+            'entry_date': _entry_date(person.get('entry_date'))
+        })
+    return rows
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # db.create_all() in create_app may already have created the table
+    if 'camp_occupants' not in inspector.get_table_names():
+        op.create_table(
+            'camp_occupants',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('camp_id', sa.Integer(), nullable=False),
+            sa.Column('uid', sa.Integer(), nullable=True),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('phone', sa.String(length=20), nullable=True),
+            sa.Column('entry_date', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['camp_id'], ['camps.cid'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['uid'], ['users.uid']),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_camp_occupants_camp_phone', 'camp_occupants', ['camp_id', 'phone'])
+        op.create_index('ix_camp_occupants_camp_uid', 'camp_occupants', ['camp_id', 'uid'])
+
+    if 'people_list' not in [column['name'] for column in inspector.get_columns('camps')]:
+        return
+
+    mobiles = dict(bind.execute(sa.select(users.c.uid, users.c.mobile)).all())
+    rows = []
+    for camp_id, people_list in bind.execute(sa.select(camps.c.cid, camps.c.people_list)).all():
+        rows.extend(parse_people_list(camp_id, people_list, mobiles))
+    if rows:
+        op.bulk_insert(camp_occupants, rows)
+
+    with op.batch_alter_table('camps') as batch_op:
+        batch_op.drop_column('people_list')
+
+
+def downgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table('camps') as batch_op:
+        batch_op.add_column(sa.Column('people_list', sa.String(length=1000), nullable=True))
+
+    people = {}
+    for camp_id, uid, name, phone, entry_date in bind.execute(
+            sa.select(camp_occupants.c.camp_id, camp_occupants.c.uid, camp_occupants.c.name,
+                      camp_occupants.c.phone, camp_occupants.c.entry_date).order_by(camp_occupants.c.id)).all():
+        person = {'name': name, 'phone': phone,
+                  'entry_date': entry_date.strftime('%Y-%m-%d %H:%M:%S') if entry_date else None}
+        if uid is not None:
+            person['uid'] = uid
+        people.setdefault(camp_id, []).append(person)
+    for camp_id, camp_people in people.items():
+        value = json.dumps(camp_people)
+        if len(value) > 1000:
+            print(f"people_list of camp {camp_id} is longer than the column; extra characters may be lost")
+        bind.execute(camps.update().where(camps.c.cid == camp_id).values(people_list=value))
+
+    op.drop_index('ix_camp_occupants_camp_uid', table_name='camp_occupants')
+    op.drop_index('ix_camp_occupants_camp_phone', table_name='camp_occupants')
+    op.drop_table('camp_occupants')
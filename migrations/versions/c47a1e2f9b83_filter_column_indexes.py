@@ -0,0 +1,49 @@
+"""Add indexes on frequently filtered columns
+
+Revision ID: c47a1e2f9b83
+Revises: 5b1e7c9d2a40
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47a1e2f9b83'
+down_revision = '5b1e7c9d2a40'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_resource_requests_warehouse_status_vehicle', 'resource_requests', ['warehouse_id', 'status', 'vehicle_id']),
+    ('ix_resource_requests_camp_status', 'resource_requests', ['camp_id', 'status']),
+    ('ix_resource_requests_vehicle_status', 'resource_requests', ['vehicle_id', 'status']),
+    ('ix_vehicles_warehouse_status', 'vehicles', ['warehouse_id', 'status']),
+    ('ix_camps_camp_head_id', 'camps', ['camp_head_id']),
+    ('ix_warehouses_manager_id', 'warehouses', ['manager_id']),
+    ('ix_user_requests_camp_status', 'user_requests', ['camp_id', 'status']),
+    ('ix_notifications_user_created', 'notifications', ['user_id', 'created_at']),
+    ('ix_camp_notifications_camp_created', 'camp_notifications', ['camp_id', 'created_at']),
+    ('ix_user_activity_user_timestamp', 'user_activity', ['user_id', 'timestamp']),
+]
+
+
+def _existing_indexes(inspector, table):
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        # db.create_all() in create_app creates these on new databases
+        if name not in _existing_indexes(inspector, table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in reversed(INDEXES):
+        if name in _existing_indexes(inspector, table):
+            op.drop_index(name, table_name=table)
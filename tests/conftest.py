@@ -0,0 +1,4 @@
+import os
+
+# The app is created on import; every test module runs it against an in-memory database
+os.environ['DATABASE_URL'] = 'sqlite://'
@@ -0,0 +1,96 @@
+"""
+Batch allocation solver and how a solved plan is written back.
+
+The solver tests call the functions with arrays directly. The _apply_plan tests use
+unsaved requests and only look at what the plan adds to the session, which is rolled
+back afterwards.
+"""
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from app import app as flask_app
+from app.batch_allocation import ITEMS, _apply_plan, _solve_item, solve_batch_allocation
+from app.extensions import db
+from app.models import ResourceRequest
+
+WAREHOUSES = [SimpleNamespace(wid=wid) for wid in (1, 2, 3)]
+
+@pytest.fixture
+def session():
+    with flask_app.app_context():
+        yield db.session
+        db.session.rollback()
+
+def make_request(warehouse_id=1, food=0, water=0, priority='general'):
+    return ResourceRequest(camp_id=1, warehouse_id=warehouse_id, food_quantity=food, water_quantity=water,
+                           essentials_quantity=0, clothes_quantity=0, priority=priority, status='pending',
+                           created_at=datetime(2024, 1, 1))
+
+def make_plan(n_requests, shipments):
+    """:param shipments: Dictionary of (request, warehouse position) -> [food, water, essentials, clothes]"""
+    plan = np.zeros((n_requests, len(WAREHOUSES), len(ITEMS)))
+    for (r, w), quantities in shipments.items():
+        plan[r, w] = quantities
+    return plan
+
+def quantities(req):
+    return [getattr(req, quantity) for quantity, _ in ITEMS.values()]
+
+def test_solve_item_ships_from_the_cheapest_stock_first():
+    flow = _solve_item(np.array([[1.0, 2.0, 3.0]]), np.array([8.0]), np.array([5.0, 5.0, 5.0]), np.array([100.0]))
+
+    assert flow.tolist() == [[5, 3, 0]]
+
+def test_solve_item_without_stock_ships_nothing():
+    flow = _solve_item(np.array([[1.0, 2.0]]), np.array([8.0]), np.zeros(2), np.array([100.0]))
+
+    assert flow.tolist() == [[0, 0]]
+
+def test_emergency_demand_gets_scarce_stock_first():
+    # The emergency camp is further away, but there is only enough food for one request
+    requests = [SimpleNamespace(priority='general', food_quantity=10, water_quantity=0,
+                                essentials_quantity=0, clothes_quantity=0),
+                SimpleNamespace(priority='emergency', food_quantity=10, water_quantity=0,
+                                essentials_quantity=0, clothes_quantity=0)]
+    stock = np.zeros((1, len(ITEMS)))
+    stock[0, 0] = 10
+
+    plan = solve_batch_allocation(requests, WAREHOUSES[:1], np.array([[5.0], [50.0]]), stock)
+
+    assert plan[:, 0, 0].tolist() == [0, 10]
+
+def test_split_request_gets_one_extra_row_per_extra_share(session):
+    req = make_request(warehouse_id=1, food=10, water=4)
+    plan = make_plan(1, {(0, 1): [6, 4, 0, 0], (0, 2): [4, 0, 0, 0]})
+
+    changed, notify = _apply_plan([req], WAREHOUSES, plan)
+
+    # The largest share keeps the original row
+    assert changed == 1
+    assert (req.warehouse_id, quantities(req)) == (2, [6, 4, 0, 0])
+    added = [row for row in session.new if isinstance(row, ResourceRequest)]
+    assert [(row.warehouse_id, quantities(row)) for row in added] == [(3, [4, 0, 0, 0])]
+    # The warehouse the request left hears about it too
+    assert notify == [(1, req), (2, req), (3, added[0])]
+    assert (added[0].camp_id, added[0].priority, added[0].status) == (1, 'general', 'pending')
+
+def test_unmet_remainder_stays_on_the_original_warehouse(session):
+    req = make_request(warehouse_id=1, food=10)
+    plan = make_plan(1, {(0, 1): [4, 0, 0, 0]})
+
+    assert _apply_plan([req], WAREHOUSES, plan)[0] == 1
+
+    assert (req.warehouse_id, quantities(req)) == (2, [4, 0, 0, 0])
+    added = [row for row in session.new if isinstance(row, ResourceRequest)]
+    assert [(row.warehouse_id, quantities(row)) for row in added] == [(1, [6, 0, 0, 0])]
+
+def test_request_without_stock_is_left_unchanged(session):
+    req = make_request(warehouse_id=1, food=10, water=5)
+    plan = make_plan(1, {})
+
+    assert _apply_plan([req], WAREHOUSES, plan) == (0, [])
+
+    assert (req.warehouse_id, quantities(req)) == (1, [10, 5, 0, 0])
+    assert req.updated_at is None
+    assert not [row for row in session.new if isinstance(row, ResourceRequest)]
@@ -0,0 +1,120 @@
+"""
+Query budgets of the list endpoints.
+
+Each endpoint runs against an in-memory SQLite database seeded with several rows of
+everything it lists, so an endpoint that starts querying once per row goes over its
+budget. The budgets match the @query_budget decorators on the views.
+"""
+import pytest
+from sqlalchemy import event
+from app import app as flask_app
+from app.extensions import db
+from app.models import Camp, ResourceRequest, Reply, Thread, User, Vehicle, Warehouse
+from app.route_cache import store_route
+from app.user_context import invalidate_user_context, load_user_context
+
+ROWS = 5
+
+@pytest.fixture(scope='module')
+def seeded():
+    """:return: Dictionary of the ids the endpoints are called with"""
+    flask_app.config['USER_CONTEXT_TTL'] = 3600
+    with flask_app.app_context():
+        db.create_all()
+
+        admin = User(username='admin', email='admin@example.com', role='admin')
+        manager = User(username='manager', email='manager@example.com', role='warehouse_manager')
+        heads = [User(username=f'head{i}', email=f'head{i}@example.com', role='camp_manager') for i in range(ROWS)]
+        others = [User(username=f'manager{i}', email=f'manager{i}@example.com', role='warehouse_manager')
+                  for i in range(ROWS)]
+        for user in [admin, manager] + heads + others:
+            user.set_password('password')
+        db.session.add_all([admin, manager] + heads + others)
+        db.session.flush()
+
+        warehouse = Warehouse(name='Main', location='L', coordinates_lat=11.0, coordinates_lng=75.0,
+                              food_capacity=1000, water_capacity=1000, essential_capacity=1000,
+                              clothes_capacity=1000, food_available=500, water_available=500,
+                              essentials_available=500, clothes_available=500, manager_id=manager.uid)
+        warehouses = [Warehouse(name=f'W{i}', location='L', coordinates_lat=11.0 + i, coordinates_lng=75.0,
+                                food_capacity=1000, water_capacity=1000, essential_capacity=1000,
+                                clothes_capacity=1000, manager_id=others[i].uid) for i in range(ROWS)]
+        camps = [Camp(name=f'C{i}', location='L', capacity=100, coordinates_lat=11.1 + i / 10,
+                      coordinates_lng=75.1, camp_head_id=heads[i].uid, food_stock_quota=0,
+                      water_stock_litres=0, essentials_stock=0, clothes_stock=0) for i in range(ROWS)]
+        db.session.add_all([warehouse] + warehouses + camps)
+        db.session.flush()
+
+        vehicles = [Vehicle(vehicle_id=f'V{i}', capacity=500, status='available', warehouse_id=warehouse.wid)
+                    for i in range(ROWS)]
+        db.session.add_all(vehicles)
+        db.session.flush()
+
+        # Unassigned requests from every camp, and requests already waiting on each vehicle
+        requests = []
+        for i, camp in enumerate(camps):
+            for vehicle_id in (None, vehicles[i].vid):
+                requests.append(ResourceRequest(camp_id=camp.cid, warehouse_id=warehouse.wid, food_quantity=10,
+                                                water_quantity=10, essentials_quantity=0, clothes_quantity=0,
+                                                priority='general', status='pending', vehicle_id=vehicle_id))
+        db.session.add_all(requests)
+
+        for i in range(ROWS):
+            thread = Thread(title=f'T{i}', content='c', user_id=heads[i].uid)
+            db.session.add(thread)
+            db.session.flush()
+            db.session.add_all([Reply(thread_id=thread.tid, user_id=user.uid, content='r') for user in heads])
+        db.session.commit()
+
+        # Cached road distances, so no endpoint calls the routing service
+        for camp in camps:
+            store_route((camp.coordinates_lat, camp.coordinates_lng),
+                        (warehouse.coordinates_lat, warehouse.coordinates_lng), 10.0, 600.0)
+
+        ids = {'admin': admin.uid, 'manager': manager.uid, 'request': requests[0].id}
+    yield ids
+    with flask_app.app_context():
+        invalidate_user_context(*ids.values())
+        db.session.remove()
+
+def count_queries(client, uid, url):
+    """
+    Counts the SQL statements of one request, the way @query_budget does. The user is
+    loaded beforehand, so the request reads them from the user cache and only the view's
+    queries are counted.
+    :return: (response, number of statements)
+    """
+    with client.session_transaction() as session:
+        session['_user_id'] = str(uid)
+        session['_fresh'] = True
+    with flask_app.app_context():
+        load_user_context(uid)
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with flask_app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return response, len(statements)
+
+@pytest.mark.parametrize('user, url, budget', [
+    ('admin', '/admin/get_all_users', 1),
+    ('admin', '/admin/get_all_camps', 1),
+    ('admin', '/admin/get_all_warehouses', 1),
+    ('admin', '/user/list_all_camps', 1),
+    ('admin', '/user/forums/get_threads', 2),
+    ('manager', '/warehouse_manager/get_resource_requests', 5),
+    ('manager', '/warehouse_manager/get_available_vehicles/{request}', 3),
+])
+def test_query_budget(seeded, user, url, budget):
+    client = flask_app.test_client()
+    response, queries = count_queries(client, seeded[user], url.format(**seeded))
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert queries <= budget, f'{url} ran {queries} queries (budget {budget})'
@@ -0,0 +1,67 @@
+"""
+Vehicle routing of app.route_optimizer.plan_routes.
+
+Every plan is given its duration matrix, so no routing service is called. The stops lie
+on a line and the travel time between two places is the distance between them.
+"""
+import numpy as np
+from app.route_optimizer import plan_routes
+
+def line_matrix(positions):
+    """:return: Duration matrix over [depot at 0] + stops at `positions`"""
+    points = np.array([0] + list(positions), dtype=float)
+    return np.abs(points[:, None] - points[None, :])
+
+def make_stops(positions, demands, emergency=()):
+    return [{'id': f'S{i}', 'location': (0, position), 'demand': demand, 'emergency': i in emergency}
+            for i, (position, demand) in enumerate(zip(positions, demands))]
+
+def visited(route):
+    return [stop['id'] for stop in route['stops']]
+
+def test_routes_respect_vehicle_capacity():
+    positions = [1, 2, 3, 4, 5, 6]
+    stops = make_stops(positions, [40, 30, 30, 50, 20, 30])
+    vehicles = [{'id': 'small', 'capacity': 60}, {'id': 'large', 'capacity': 100}, {'id': 'spare', 'capacity': 60}]
+
+    plan = plan_routes((0, 0), stops, vehicles, matrix=line_matrix(positions))
+
+    assert plan['unassigned'] == []
+    assert sorted(i for route in plan['routes'] for i in visited(route)) == sorted(s['id'] for s in stops)
+    demand = {stop['id']: stop['demand'] for stop in stops}
+    capacity = {vehicle['id']: vehicle['capacity'] for vehicle in vehicles}
+    for route in plan['routes']:
+        assert route['load'] == sum(demand[i] for i in visited(route))
+        assert route['load'] <= capacity[route['vehicle_id']] == route['capacity']
+
+def test_emergency_stops_come_first():
+    # The general stop is on the way to the emergency one, so the shortest route visits it first
+    positions = [1, 10, 2]
+    stops = make_stops(positions, [10, 10, 10], emergency={1})
+
+    plan = plan_routes((0, 0), stops, [{'id': 'truck', 'capacity': 100}], matrix=line_matrix(positions))
+
+    assert len(plan['routes']) == 1
+    assert visited(plan['routes'][0])[0] == 'S1'
+    arrivals = [stop['arrival_seconds'] for stop in plan['routes'][0]['stops']]
+    assert arrivals == sorted(arrivals)
+
+def test_emergency_route_gets_a_vehicle_first():
+    # Two routes are needed but only one vehicle is free; the emergency route takes it
+    positions = [1, 2]
+    stops = make_stops(positions, [80, 80], emergency={1})
+
+    plan = plan_routes((0, 0), stops, [{'id': 'truck', 'capacity': 100}], matrix=line_matrix(positions))
+
+    assert [visited(route) for route in plan['routes']] == [['S1']]
+    assert plan['unassigned'] == ['S0']
+
+def test_oversized_stops_are_unassigned():
+    positions = [1, 2, 3]
+    stops = make_stops(positions, [30, 500, 40])
+    vehicles = [{'id': 'small', 'capacity': 50}, {'id': 'large', 'capacity': 100}]
+
+    plan = plan_routes((0, 0), stops, vehicles, matrix=line_matrix(positions))
+
+    assert plan['unassigned'] == ['S1']
+    assert sorted(i for route in plan['routes'] for i in visited(route)) == ['S0', 'S2']